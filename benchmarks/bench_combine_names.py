@@ -0,0 +1,39 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.data_clean import combine_names, combine_names_vectorized
+
+def make_patients(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    first = np.array(['Joshua658', 'Bennie663', ' Ann12 ', 'Maria4'], dtype=object)
+    middle = np.array(['Alvin56', None, 'Lee7', None], dtype=object)
+    last = np.array(['Kunde533', 'Ebert178', 'Smith9 ', 'Doe1'], dtype=object)
+    return pd.DataFrame({
+        'FIRST': first[rng.integers(0, len(first), n_rows)],
+        'MIDDLE': middle[rng.integers(0, len(middle), n_rows)],
+        'LAST': last[rng.integers(0, len(last), n_rows)],
+    })
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    patients = make_patients(n_rows)
+
+    expected, apply_seconds = timed(patients.apply, combine_names, axis=1)
+    result, vectorized_seconds = timed(combine_names_vectorized, patients)
+
+    assert result.equals(expected)
+    print(f"rows: {n_rows}")
+    print(f"apply(combine_names): {apply_seconds:.2f}s")
+    print(f"combine_names_vectorized: {vectorized_seconds:.2f}s")
+    print(f"speedup: {apply_seconds / vectorized_seconds:.1f}x")
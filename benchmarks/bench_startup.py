@@ -0,0 +1,59 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+base_dir = Path(__file__).parent.parent
+app_path = base_dir / 'scripts' / 'streamlit_app.py'
+
+HEAVY_MODULES = ['matplotlib', 'google.cloud.bigquery', 'streamlit_lottie']
+
+IMPORT_PROBE = f"""
+import json, sys, time
+sys.path.insert(0, {str(base_dir)!r})
+start = time.perf_counter()
+import scripts.streamlit_app
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def cold_import(runs):
+    # Each run is a fresh interpreter, so nothing is already imported or cached.
+    results = []
+    env = dict(os.environ, DASHBOARD_QUERY_BACKEND='local')
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_PROBE], capture_output=True, text=True, check=True, env=env
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return statistics.median(r['seconds'] for r in results), results[-1]['loaded']
+
+def timed_run(app):
+    start = time.perf_counter()
+    app.run()
+    return time.perf_counter() - start
+
+def first_render():
+    from streamlit.testing.v1 import AppTest
+    os.environ['DASHBOARD_QUERY_BACKEND'] = 'local'
+    app = AppTest.from_file(str(app_path), default_timeout=120)
+    login = timed_run(app)
+    app.session_state['authenticated'] = True
+    app.session_state['user_type'] = 'user'
+    dashboard_first = timed_run(app)
+    dashboard_warm = timed_run(app)
+    return login, dashboard_first, dashboard_warm
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    import_seconds, loaded = cold_import(runs)
+    login, dashboard_first, dashboard_warm = first_render()
+
+    print(f"cold import (median of {runs}): {import_seconds:.2f}s")
+    print(f"heavy modules loaded at import: {', '.join(loaded) or 'none'}")
+    print(f"login page first render: {login:.2f}s")
+    print(f"dashboard first render: {dashboard_first:.2f}s")
+    print(f"dashboard warm rerun: {dashboard_warm:.2f}s")
@@ -0,0 +1,169 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+base_dir = Path(__file__).parent.parent
+sample_dir = base_dir / 'data' / 'synthea_dataset'
+sample_cms_path = base_dir / 'data' / 'cms_dataset' / 'hospital_readmissions_reduction_program_hospital.csv'
+
+PATIENTS_FILE = 'patients.csv'
+APPOINTMENTS_FILE = 'appointments.csv'
+DOCTORS_FILE = 'doctors.csv'
+CMS_FILE = 'hospital_readmissions_reduction_program_hospital.csv'
+
+# Ratios of the bundled Synthea sample (7049 appointments, 106 patients,
+# 272 doctors) and the CMS release (6 measures per facility).
+APPOINTMENTS_PER_PATIENT = 66
+DOCTORS_PER_PATIENT = 2.5
+APPOINTMENTS_PER_FACILITY = 2000
+MEASURES = [
+    'READM-30-AMI-HRRP', 'READM-30-CABG-HRRP', 'READM-30-HF-HRRP',
+    'READM-30-HIP-KNEE-HRRP', 'READM-30-PN-HRRP', 'READM-30-COPD-HRRP',
+]
+FIRST_DATE = np.datetime64('2000-01-01T00:00:00', 's')
+LAST_DATE = np.datetime64('2024-12-31T00:00:00', 's')
+UUID_POSITIONS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+def uuids(rng, n):
+    # Random UUID-shaped strings, built as a byte matrix instead of one
+    # uuid.uuid4() call per row.
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    digits = np.empty((n, 32), dtype=np.uint8)
+    digits[:, 0::2] = HEX_DIGITS[raw >> 4]
+    digits[:, 1::2] = HEX_DIGITS[raw & 15]
+    out = np.full((n, 36), ord('-'), dtype=np.uint8)
+    out[:, UUID_POSITIONS] = digits
+    return out.view('S36').ravel().astype(str)
+
+def synthea_names(rng, names):
+    # Synthea appends digits to every name part ("Joshua658"); nulls stay null.
+    stems = names.str.rstrip('0123456789')
+    numbered = stems + pd.Series(rng.integers(1, 1000, len(names)), index=names.index).astype(str)
+    return numbered.where(names.notna())
+
+def sample_rows(rng, sample, n):
+    # Whole rows of the real file, read as text, so null rates, formats and
+    # quirks ("Too Few to Report", zero-padded IDs) carry over unchanged.
+    return sample.iloc[rng.integers(0, len(sample), n)].reset_index(drop=True)
+
+def random_times(rng, n, first=FIRST_DATE, last=LAST_DATE):
+    span = int((last - first) / np.timedelta64(1, 's'))
+    return first + rng.integers(0, span, n).astype('timedelta64[s]')
+
+def read_sample(path):
+    return pd.read_csv(path, dtype=str)
+
+def generate_patients(rng, n, sample):
+    patients = sample_rows(rng, sample, n)
+    patients['Id'] = uuids(rng, n)
+    birth = random_times(rng, n, np.datetime64('1920-01-01T00:00:00', 's'), np.datetime64('2020-01-01T00:00:00', 's'))
+    patients['BIRTHDATE'] = pd.to_datetime(birth).strftime('%Y-%m-%d')
+    died = patients['DEATHDATE'].notna().to_numpy()
+    death = birth + rng.integers(1, 365 * 60, n).astype('timedelta64[D]')
+    death = np.minimum(death, LAST_DATE)
+    patients['DEATHDATE'] = pd.Series(pd.to_datetime(death).strftime('%Y-%m-%d')).where(died)
+    for column in ('FIRST', 'MIDDLE', 'LAST'):
+        patients[column] = synthea_names(rng, patients[column])
+    patients['SSN'] = [f'999-{a:02d}-{b:04d}' for a, b in zip(rng.integers(10, 100, n), rng.integers(0, 10000, n))]
+    patients['INCOME'] = rng.integers(10_000, 250_000, n).astype(str)
+    return patients[sample.columns]
+
+def generate_doctors(rng, n, sample):
+    doctors = sample_rows(rng, sample, n)
+    doctors['Id'] = uuids(rng, n)
+    first = doctors['NAME'].str.split(' ').str[0]
+    last = doctors['NAME'].str.split(' ').str[-1]
+    doctors['NAME'] = synthea_names(rng, first) + ' ' + synthea_names(rng, last)
+    return doctors[sample.columns]
+
+def generate_appointments(rng, n, sample, patient_ids, doctors, path, chunksize=1_000_000):
+    durations = (pd.to_datetime(sample['STOP']) - pd.to_datetime(sample['START'])).dt.total_seconds().to_numpy()
+    provider_ids = doctors['Id'].to_numpy()
+    organizations = doctors['ORGANIZATION'].to_numpy()
+    written = 0
+    while written < n:
+        size = min(chunksize, n - written)
+        chunk = sample_rows(rng, sample, size)
+        chunk['Id'] = uuids(rng, size)
+        start = random_times(rng, size)
+        chunk['START'] = pd.to_datetime(start)
+        chunk['STOP'] = pd.to_datetime(start + durations[rng.integers(0, len(durations), size)].astype('timedelta64[s]'))
+        chunk['PATIENT'] = patient_ids[rng.integers(0, len(patient_ids), size)]
+        provider = rng.integers(0, len(provider_ids), size)
+        chunk['PROVIDER'] = provider_ids[provider]
+        chunk['ORGANIZATION'] = organizations[provider]
+        chunk[sample.columns].to_csv(path, index=False, mode='w' if written == 0 else 'a', header=written == 0,
+                                     date_format='%Y-%m-%dT%H:%M:%SZ')
+        written += size
+    return written
+
+def generate_cms(rng, n_facilities, sample):
+    n = n_facilities * len(MEASURES)
+    cms = sample_rows(rng, sample, n)
+    facility = np.repeat(np.arange(n_facilities), len(MEASURES))
+    names = sample['Facility Name'].drop_duplicates().to_numpy()
+    cms['Facility Name'] = [
+        names[i % len(names)] if i < len(names) else f'{names[i % len(names)]} {i // len(names) + 1}'
+        for i in facility
+    ]
+    cms['Facility ID'] = [f'{i:06d}' for i in facility + 10001]
+    cms['Measure Name'] = np.tile(MEASURES, n_facilities)
+    return cms[sample.columns]
+
+def generate(output_dir, n_appointments, seed=0, n_patients=None, n_doctors=None, n_facilities=None,
+             chunksize=1_000_000):
+    output_dir = Path(output_dir)
+    (output_dir / 'synthea_dataset').mkdir(parents=True, exist_ok=True)
+    (output_dir / 'cms_dataset').mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    n_patients = n_patients or max(1, n_appointments // APPOINTMENTS_PER_PATIENT)
+    n_doctors = n_doctors or max(1, int(n_patients * DOCTORS_PER_PATIENT))
+    n_facilities = n_facilities or max(10, n_appointments // APPOINTMENTS_PER_FACILITY)
+
+    started = time.perf_counter()
+    patients = generate_patients(rng, n_patients, read_sample(sample_dir / PATIENTS_FILE))
+    patients.to_csv(output_dir / 'synthea_dataset' / PATIENTS_FILE, index=False)
+    doctors = generate_doctors(rng, n_doctors, read_sample(sample_dir / DOCTORS_FILE))
+    doctors.to_csv(output_dir / 'synthea_dataset' / DOCTORS_FILE, index=False)
+    generate_appointments(
+        rng, n_appointments, read_sample(sample_dir / APPOINTMENTS_FILE), patients['Id'].to_numpy(), doctors,
+        output_dir / 'synthea_dataset' / APPOINTMENTS_FILE, chunksize
+    )
+    cms = generate_cms(rng, n_facilities, read_sample(sample_cms_path))
+    cms.to_csv(output_dir / 'cms_dataset' / CMS_FILE, index=False)
+    return {
+        'appointments': n_appointments,
+        'patients': n_patients,
+        'doctors': n_doctors,
+        'cms_rows': len(cms),
+        'seed': seed,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+def source_paths(data_dir):
+    data_dir = Path(data_dir)
+    return {
+        'patients_path': data_dir / 'synthea_dataset' / PATIENTS_FILE,
+        'appointments_path': data_dir / 'synthea_dataset' / APPOINTMENTS_FILE,
+        'doctors_path': data_dir / 'synthea_dataset' / DOCTORS_FILE,
+        'cms_path': data_dir / 'cms_dataset' / CMS_FILE,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate Synthea/CMS-shaped source files at a chosen scale.')
+    parser.add_argument('output_dir', type=Path)
+    parser.add_argument('--appointments', type=int, default=100_000,
+                        help='Number of appointments, e.g. 100000, 1000000 or 10000000.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=1_000_000,
+                        help='Appointments are generated and written this many rows at a time.')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    print(json.dumps(generate(args.output_dir, args.appointments, args.seed, chunksize=args.chunksize), indent=2))
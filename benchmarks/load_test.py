@@ -0,0 +1,286 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+base_dir = Path(__file__).parent.parent
+sys.path.append(str(base_dir))
+
+app_path = base_dir / 'scripts' / 'streamlit_app.py'
+processed_dir = base_dir / 'data' / 'processed'
+
+ANALYSES = ['Doctor Appointment Volume', 'Patient Appointment Patterns', 'Facility Readmission Rates']
+SEARCH_LABELS = {
+    'Doctor Appointment Volume': 'Search by Doctor Name',
+    'Patient Appointment Patterns': 'Search by Patient Name',
+    'Facility Readmission Rates': 'Search by Facility Name',
+}
+# The most backend round trips one interaction may cost. The first login
+# prefetches every analysis (and checks for the summary tables); after that,
+# reruns that only change what is shown must be served from the caches.
+QUERY_BUDGETS = {
+    'open': 0,
+    'login': 9,
+    'switch_analysis': 0,
+    'search': 2,
+    'clear_search': 0,
+    'page': 2,
+    'rerun': 0,
+    'logout': 0,
+    'admin_login': 1,
+    'show_schema': 1,
+    'preview_data': 1,
+    'admin_query': 2,
+}
+ADMIN_QUERY = "SELECT NAME, COUNT(*) AS n FROM `healthcare_analytics.appointments_data` GROUP BY NAME ORDER BY n DESC"
+
+def rss_mb():
+    # Current resident set size; peak RSS where /proc isn't available.
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        from scripts.data_clean import peak_rss_mb
+        return peak_rss_mb()
+
+class LatencyBackend:
+    """Stands in for the BigQuery backend: answers from the local SQLite copy
+    of data/processed after a fixed delay per round trip, and counts every
+    query the app sends."""
+
+    def __init__(self, backend, latency=0.0):
+        self.backend = backend
+        self.dialect = backend.dialect
+        self.latency = latency
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        with self._lock:
+            self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def run(self, query, params=None):
+        self._round_trip()
+        return self.backend.run(query, params)
+
+    def execute(self, query, params=None):
+        self._round_trip()
+        return self.backend.execute(query, params)
+
+    def dry_run(self, query, params=None):
+        self._round_trip()
+        return self.backend.dry_run(query, params)
+
+    def iter_batches(self, query, params=None, batch_size=10_000, stats=None):
+        self._round_trip()
+        return self.backend.iter_batches(query, params, batch_size, stats)
+
+    def has_table(self, table_name):
+        self._round_trip()
+        return self.backend.has_table(table_name)
+
+def by_label(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"No widget labelled {label!r}")
+
+def search_terms(data_dir, rng, n):
+    # Short fragments of real names, the way someone types into a search box.
+    import pandas as pd
+    names = []
+    for source, column in (('doctor_appointment_volume.csv', 'doctor_name'),
+                           ('patient_appointment_gaps.csv', 'patient_name'),
+                           ('facility_readmissions.csv', 'facility_name')):
+        path = Path(data_dir) / source
+        if path.exists():
+            names.extend(pd.read_csv(path, usecols=[column])[column].dropna().astype(str).tolist())
+    names = names or ['a']
+    terms = []
+    for _ in range(n):
+        name = rng.choice(names)
+        start = rng.randrange(max(1, len(name) - 3))
+        terms.append(name[start:start + rng.randint(2, 4)])
+    return terms
+
+def user_steps(rng, terms):
+    steps = [('open', lambda at: at), ('login', lambda at: by_label(at.button, 'Login as User').click())]
+    for analysis in rng.sample(ANALYSES, len(ANALYSES)):
+        label = SEARCH_LABELS[analysis]
+        term = terms.pop()
+        steps += [
+            ('switch_analysis', lambda at, analysis=analysis: by_label(at.sidebar.selectbox, 'Choose Analysis')
+             .select(analysis)),
+            ('search', lambda at, label=label, term=term: by_label(at.text_input, label).input(term)),
+            ('clear_search', lambda at, label=label: by_label(at.text_input, label).input('')),
+            ('page', lambda at: by_label(at.number_input, 'Page Number').set_value(2)),
+            ('rerun', lambda at: at),
+        ]
+    steps.append(('logout', lambda at: by_label(at.sidebar.button, 'Logout').click()))
+    return steps
+
+def admin_login(at):
+    by_label(at.text_input, 'Admin Password').input('admin123')
+    return by_label(at.button, 'Login as Admin').click()
+
+def admin_query(at):
+    by_label(at.text_area, 'Enter your SQL query:').input(ADMIN_QUERY)
+    return by_label(at.button, 'Execute Query').click()
+
+def admin_steps():
+    return [
+        ('open', lambda at: at),
+        ('admin_login', admin_login),
+        ('show_schema', lambda at: by_label(at.button, 'Show Schema').click()),
+        ('preview_data', lambda at: by_label(at.button, 'Preview Data').click()),
+        ('admin_query', admin_query),
+        ('rerun', lambda at: at),
+        ('logout', lambda at: by_label(at.sidebar.button, 'Logout').click()),
+    ]
+
+def settle(at, timeout=60):
+    # Queries a login starts in the background belong to that interaction.
+    prefetch = at.session_state['prefetch'] if 'prefetch' in at.session_state else None
+    deadline = time.perf_counter() + timeout
+    while prefetch is not None and not prefetch.done() and time.perf_counter() < deadline:
+        time.sleep(0.005)
+
+def percentiles(values):
+    values = np.asarray(values, dtype=float)
+    return {
+        'count': len(values),
+        'p50_ms': round(float(np.percentile(values, 50)), 1),
+        'p90_ms': round(float(np.percentile(values, 90)), 1),
+        'p99_ms': round(float(np.percentile(values, 99)), 1),
+        'max_ms': round(float(values.max()), 1),
+    }
+
+def summarize(interactions):
+    by_step = {}
+    for entry in interactions:
+        by_step.setdefault(entry['step'], []).append(entry)
+    summary = {}
+    for step, entries in sorted(by_step.items()):
+        summary[step] = percentiles([entry['ms'] for entry in entries])
+        summary[step]['queries_per_interaction'] = round(sum(entry['queries'] for entry in entries) / len(entries), 2)
+        summary[step]['max_queries'] = max(entry['queries'] for entry in entries)
+    return summary
+
+def over_budget(results):
+    return {
+        step: stats['max_queries'] for step, stats in results['steps'].items()
+        if stats['max_queries'] > QUERY_BUDGETS.get(step, 0)
+    }
+
+def run_load_test(sessions=10, admin_sessions=1, latency=0.05, data_dir=processed_dir, seed=0, timeout=60):
+    """Drives `sessions` user and `admin_sessions` admin sessions through the
+    dashboard with AppTest, against a LatencyBackend over data_dir.
+
+    AppTest swaps process-wide Streamlit state on every run, so reruns can't
+    overlap; the sessions are all live at once and take turns, one rerun
+    each, sharing the process's caches and backend the way a server's
+    sessions do. Background prefetch threads still run concurrently.
+    """
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    from scripts import query_backend
+
+    rng = random.Random(seed)
+    backend = LatencyBackend(query_backend.SQLiteBackend(data_dir), latency)
+    terms = search_terms(data_dir, rng, sessions * len(ANALYSES))
+    plans = [('user', user_steps(rng, terms)) for _ in range(sessions)]
+    plans += [('admin', admin_steps()) for _ in range(admin_sessions)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir, mock.patch.object(
+        query_backend, 'create_backend', lambda *args, **kwargs: backend
+    ), mock.patch.dict(os.environ, {
+        'QUERY_METRICS_PATH': str(Path(tmp_dir) / 'query_metrics.jsonl'),
+        'LOCAL_DATA_DIR': str(data_dir),
+        'ADMIN_EXPORT_DIR': tmp_dir,
+    }):
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        gc.collect()
+        baseline = rss_mb()
+        apps = [AppTest.from_file(str(app_path), default_timeout=timeout) for _ in plans]
+        interactions = []
+        started = time.perf_counter()
+        for turn in range(max(len(steps) for _, steps in plans)):
+            for session, (kind, steps) in enumerate(plans):
+                if turn >= len(steps):
+                    continue
+                step, action = steps[turn]
+                at = apps[session]
+                queries = backend.queries
+                step_started = time.perf_counter()
+                action(at).run()
+                ms = (time.perf_counter() - step_started) * 1000
+                settle(at, timeout)
+                if at.exception:
+                    raise RuntimeError(f"Session {session} {step}: {at.exception[0].message}")
+                interactions.append({'session': session, 'kind': kind, 'step': step, 'ms': ms,
+                                     'queries': backend.queries - queries})
+        seconds = time.perf_counter() - started
+        gc.collect()
+        after = rss_mb()
+        st.cache_resource.clear()
+
+    return {
+        'sessions': sessions,
+        'admin_sessions': admin_sessions,
+        'latency_ms': latency * 1000,
+        'seconds': round(seconds, 2),
+        'interactions': len(interactions),
+        'backend_queries': backend.queries,
+        'queries_per_interaction': round(backend.queries / len(interactions), 2),
+        'latency': percentiles([entry['ms'] for entry in interactions]),
+        'steps': summarize(interactions),
+        'rss_mb': {
+            'baseline': round(baseline, 1),
+            'after': round(after, 1),
+            'growth_per_session': round((after - baseline) / len(plans), 2),
+        },
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the dashboard headlessly with simulated sessions.')
+    parser.add_argument('--sessions', type=int, default=10, help='User sessions (login, analyses, search, paging).')
+    parser.add_argument('--admin-sessions', type=int, default=1)
+    parser.add_argument('--latency-ms', type=float, default=50,
+                        help='Delay added to every backend round trip, standing in for BigQuery.')
+    parser.add_argument('--data-dir', type=Path, default=processed_dir)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds a single rerun may take.')
+    parser.add_argument('--output', type=Path, default=None, help='Write the JSON results here as well as stdout.')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # The app logs every rerun at INFO; keep stdout to the results.
+    logging.basicConfig(level=logging.WARNING)
+    results = run_load_test(args.sessions, args.admin_sessions, args.latency_ms / 1000, args.data_dir, args.seed,
+                            args.timeout)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(output + '\n')
+    print(output)
+    exceeded = over_budget(results)
+    if exceeded:
+        print(f"Query budget exceeded: {exceeded}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
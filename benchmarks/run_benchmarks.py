@@ -0,0 +1,246 @@
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+base_dir = Path(__file__).parent.parent
+sys.path.append(str(base_dir))
+from benchmarks.generate_data import generate, source_paths
+
+SCALES = {'100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+CLEAN_STAGES = ['clean_patients', 'clean_appointments', 'clean_appointments_streaming', 'clean_cms', 'summaries']
+UPLOAD_STAGES = ['upload_parquet', 'upload_csv', 'upload_csv_chunked']
+STAGES = CLEAN_STAGES + UPLOAD_STAGES + ['queries']
+UPLOAD_TABLES = ['patients_data', 'appointments_data', 'cms_data']
+
+class FakeLoadJob:
+    def result(self):
+        return self
+
+class FakeClient:
+    """Stands in for bigquery.Client: does the client-side serialization a real
+    load would (frames to Parquet, files read in upload-sized pieces) and
+    sends nothing."""
+
+    def __init__(self):
+        self.bytes_sent = 0
+        self.rows = 0
+
+    def load_table_from_dataframe(self, df, table_ref, job_config=None):
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        self.bytes_sent += buffer.tell()
+        self.rows += len(df)
+        return FakeLoadJob()
+
+    def load_table_from_file(self, f, table_ref, job_config=None):
+        for block in iter(lambda: f.read(1 << 20), b''):
+            self.bytes_sent += len(block)
+        return FakeLoadJob()
+
+    def get_table(self, table_ref):
+        return SimpleNamespace(schema=[])
+
+def point_data_clean(data_dir):
+    from scripts import data_clean
+    for name, path in source_paths(data_dir).items():
+        setattr(data_clean, name, path)
+    return data_clean
+
+def csv_rows(path):
+    with open(path, 'rb') as f:
+        return sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b'')) - 1
+
+def run_clean_stage(stage, data_dir, work_dir, chunksize):
+    data_clean = point_data_clean(data_dir)
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            if stage == 'clean_patients':
+                data_clean.patients_stage(work_dir)
+                output = data_clean.patients_output
+            elif stage == 'clean_appointments':
+                data_clean.appointments_stage(work_dir)
+                output = data_clean.appointments_output
+            elif stage == 'clean_appointments_streaming':
+                data_clean.appointments_stage(work_dir, chunksize)
+                output = data_clean.appointments_output
+            elif stage == 'clean_cms':
+                data_clean.cms_stage(work_dir)
+                output = data_clean.cms_output
+            else:
+                from scripts import summarize
+                (Path(work_dir) / summarize.summary_state_name).unlink(missing_ok=True)
+                summarize.run_summaries(work_dir)
+                output = data_clean.appointments_output
+        finally:
+            sys.stdout = stdout
+    return {'rows': csv_rows(Path(work_dir) / output)}
+
+def run_upload_stage(stage, work_dir, chunksize):
+    from google.cloud import bigquery
+    from scripts import bigquery_upload
+    for table_name in UPLOAD_TABLES:
+        bigquery_upload.table_paths[table_name] = Path(work_dir) / bigquery_upload.table_paths[table_name].name
+    client = FakeClient()
+    dataset_ref = bigquery.DatasetReference('benchmark', bigquery_upload.dataset_id)
+    source_format = 'parquet' if stage == 'upload_parquet' else 'csv'
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            for table_name in UPLOAD_TABLES:
+                bigquery_upload.upload_table(
+                    client, dataset_ref, table_name, source_format, chunksize if stage == 'upload_csv_chunked' else None
+                )
+        finally:
+            sys.stdout = stdout
+    rows = sum(csv_rows(bigquery_upload.table_paths[name]) for name in UPLOAD_TABLES)
+    return {'rows': rows, 'bytes_serialized': client.bytes_sent}
+
+def run_queries(work_dir):
+    # The dashboard's own query builders against the local SQLite backend,
+    # once over the raw tables and once over the summary tables.
+    from scripts import streamlit_app as app
+    from scripts.query_backend import SQLiteBackend
+    started = time.perf_counter()
+    backend = SQLiteBackend(work_dir)
+    results = {'load_seconds': round(time.perf_counter() - started, 4), 'queries': {}}
+    builders = {
+        'doctor_volume': (app.doctor_volume_query, 'Doctor Name', 'Appointments Count'),
+        'patient_gaps': (lambda: app.patient_gaps_query(backend.dialect), 'Patient Name',
+                         'Average Days Between Appointments'),
+        'facility_readmissions': (app.facility_readmissions_query, 'Facility Name', 'Total Readmissions'),
+    }
+    summary_available = app.summary_available
+    try:
+        for use_summary in (False, True):
+            app.summary_available = lambda table_name: use_summary
+            for name, (builder, name_column, metric_column) in builders.items():
+                base_query = builder()
+                timings = {}
+                for label, (query, params) in {
+                    'count': app.count_query(base_query, name_column, ''),
+                    'first_page': app.page_query(base_query, name_column, metric_column, '', 1),
+                    'search': app.page_query(base_query, name_column, metric_column, 'a', 1),
+                }.items():
+                    started = time.perf_counter()
+                    backend.run(query, params)
+                    timings[label] = round(time.perf_counter() - started, 4)
+                results['queries'][f"{name}_{'summary' if use_summary else 'raw'}"] = timings
+    finally:
+        app.summary_available = summary_available
+    return results
+
+def run_stage(stage, data_dir, work_dir, chunksize):
+    # Runs one stage in this process and reports its wall time and how far
+    # it pushed peak RSS above what the interpreter and imports already used.
+    # Imports pandas up front too, so it counts toward the baseline.
+    from scripts.data_clean import peak_rss_mb
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    if stage in CLEAN_STAGES:
+        result = run_clean_stage(stage, data_dir, work_dir, chunksize)
+    elif stage in UPLOAD_STAGES:
+        result = run_upload_stage(stage, work_dir, chunksize)
+    elif stage == 'queries':
+        result = run_queries(work_dir)
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+    seconds = time.perf_counter() - started
+    result.update({
+        'seconds': round(seconds, 4),
+        'baseline_rss_mb': round(baseline, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    })
+    if 'rows' in result:
+        result['rows_per_second'] = round(result['rows'] / seconds) if seconds else None
+    return result
+
+def run_stage_subprocess(stage, data_dir, work_dir, chunksize):
+    # A fresh interpreter per stage, so one stage's peak memory isn't
+    # hidden under an earlier, larger one.
+    output = subprocess.run(
+        [sys.executable, __file__, '--stage', stage, '--data-dir', str(data_dir), '--work-dir', str(work_dir),
+         '--chunksize', str(chunksize)],
+        capture_output=True, text=True, check=True, env=dict(os.environ, DASHBOARD_QUERY_BACKEND='local')
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def environment():
+    import numpy
+    import pandas
+    import pyarrow
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'pandas': pandas.__version__,
+        'numpy': numpy.__version__,
+        'pyarrow': pyarrow.__version__,
+    }
+
+def run_benchmarks(n_appointments, data_dir=None, work_dir=None, chunksize=100_000, stages=None, seed=0,
+                   in_process=False):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = Path(data_dir or Path(tmp_dir) / 'source')
+        work_dir = Path(work_dir or Path(tmp_dir) / 'processed')
+        work_dir.mkdir(parents=True, exist_ok=True)
+        if source_paths(data_dir)['appointments_path'].exists():
+            generated = {'appointments': csv_rows(source_paths(data_dir)['appointments_path']), 'reused': True}
+        else:
+            generated = generate(data_dir, n_appointments, seed)
+
+        # Later stages read what the earlier ones wrote, so they always run
+        # in STAGES order.
+        results = {}
+        for stage in STAGES:
+            if stages and stage not in stages:
+                continue
+            run = run_stage if in_process else run_stage_subprocess
+            results[stage] = run(stage, data_dir, work_dir, chunksize)
+        return {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'environment': environment(),
+            'data': generated,
+            'chunksize': chunksize,
+            'stages': results,
+        }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark cleaning, upload serialization and dashboard queries '
+                                                 'on generated data.')
+    parser.add_argument('--scale', default='100k',
+                        help=f"Appointments to generate: one of {', '.join(SCALES)} or a row count.")
+    parser.add_argument('--data-dir', type=Path, default=None,
+                        help='Reuse (or keep) generated source files here instead of a temporary directory.')
+    parser.add_argument('--work-dir', type=Path, default=None,
+                        help='Where the processed outputs are written; a temporary directory by default.')
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, default=None, help='Write the JSON results here as well as stdout.')
+    parser.add_argument('--stage', choices=STAGES, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.stage:
+        print(json.dumps(run_stage(args.stage, args.data_dir, args.work_dir, args.chunksize)))
+        return
+    n_appointments = SCALES.get(args.scale.lower()) or int(args.scale)
+    results = run_benchmarks(n_appointments, args.data_dir, args.work_dir, args.chunksize, args.stages, args.seed)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(output + '\n')
+    print(output)
+
+if __name__ == '__main__':
+    main()
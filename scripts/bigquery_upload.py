@@ -1,41 +1,393 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 from google.cloud.bigquery import DatasetReference
 from pathlib import Path
 
-base_dir = Path(__file__).parent.parent
-patients_path = base_dir / 'data' / 'processed' / 'patients_data_cleaned.csv'
-appointments_path = base_dir / 'data' / 'processed' / 'appointments_data_cleaned.csv'
-cms_path = base_dir / 'data' / 'processed' / 'cms_data_cleaned.csv'
+sys.path.append(str(Path(__file__).parent.parent))
+from scripts.data_clean import APPOINTMENTS_SCHEMA, CMS_SCHEMA, PATIENTS_SCHEMA, read_compact, text_dtypes, to_arrow
+from scripts.file_hashes import file_sha256
+from scripts.query_cache import mark_upload_finished
 
-patients_data = pd.read_csv(patients_path)
-appointments_data = pd.read_csv(appointments_path)
-cms_data = pd.read_csv(cms_path)
+base_dir = Path(__file__).parent.parent
+processed_dir = base_dir / 'data' / 'processed'
+patients_path = processed_dir / 'patients_data_cleaned.csv'
+appointments_path = processed_dir / 'appointments_data_cleaned.csv'
+cms_path = processed_dir / 'cms_data_cleaned.csv'
+doctor_volume_path = processed_dir / 'doctor_appointment_volume.csv'
+patient_gaps_path = processed_dir / 'patient_appointment_gaps.csv'
+facility_readmissions_path = processed_dir / 'facility_readmissions.csv'
 
 dataset_id = 'healthcare_analytics'
-tables = {
-    'patients_data': patients_data,
-    'appointments_data': appointments_data,
-    'cms_data': cms_data,
+table_paths = {
+    'patients_data': patients_path,
+    'appointments_data': appointments_path,
+    'cms_data': cms_path,
+    'doctor_appointment_volume': doctor_volume_path,
+    'patient_appointment_gaps': patient_gaps_path,
+    'facility_readmissions': facility_readmissions_path,
 }
+upload_state_dir = processed_dir / '.upload_state'
 
-client = bigquery.Client()
-dataset_ref = DatasetReference(client.project, dataset_id)
-try:
-    client.get_dataset(dataset_ref)
-    print(f"Dataset {dataset_id} Already Exists.")
-except Exception:
-    dataset = bigquery.Dataset(dataset_ref)
-    dataset.location = 'US'
-    client.create_dataset(dataset)
-    print(f"Dataset {dataset_id} Created.")
-
-for table_name, df in tables.items():
-    table_ref = dataset_ref.table(table_name)
+# Declared column types of the processed tables, the same ones the Parquet
+# copies are written with. CSV sources are parsed into these types before
+# loading, and every load job sends them as its schema, so START/STOP land
+# as TIMESTAMP and BIRTHDATE/DEATHDATE as DATE whichever file is loaded.
+table_schemas = {
+    'patients_data': PATIENTS_SCHEMA,
+    'appointments_data': APPOINTMENTS_SCHEMA,
+    'cms_data': CMS_SCHEMA,
+}
+timestamp_columns = ['last_start', 'last_stop']
+
+# Keys the incremental upload MERGEs on, and the physical layout of tables
+# that benefit from one (the dashboard joins and windows appointments by
+# patient and provider, usually over a date range). Appointments span
+# decades, more START days than one load job may write (4,000) or one table
+# may hold (10,000), so they are partitioned by month.
+merge_keys = {
+    'patients_data': ['patient_id'],
+    'appointments_data': ['Id'],
+    'cms_data': ['Facility ID', 'Measure Name'],
+    'doctor_appointment_volume': ['doctor_name'],
+    'patient_appointment_gaps': ['patient_id'],
+    'facility_readmissions': ['facility_name'],
+}
+table_layouts = {
+    'appointments_data': {
+        'partition_field': 'START',
+        'partition_type': 'MONTH',
+        'clustering_fields': ['patient_id', 'provider_id'],
+    },
+}
+
+def __getattr__(name):
+    # The processed frames (and the tables dict built from them) used to be
+    # read at import time; keep them reachable without paying for the read
+    # until something asks for them.
+    if name in table_paths:
+        value = pd.read_csv(table_paths[name])
+    elif name == 'tables':
+        value = {
+            table_name: globals()[table_name] if table_name in globals() else __getattr__(table_name)
+            for table_name in table_paths
+        }
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+def get_dataset(client):
+    dataset_ref = DatasetReference(client.project, dataset_id)
+    try:
+        client.get_dataset(dataset_ref)
+        print(f"Dataset {dataset_id} Already Exists.")
+    except Exception:
+        dataset = bigquery.Dataset(dataset_ref)
+        dataset.location = 'US'
+        client.create_dataset(dataset)
+        print(f"Dataset {dataset_id} Created.")
+    return dataset_ref
+
+def bigquery_type(arrow_type):
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    if pa.types.is_timestamp(arrow_type):
+        return 'TIMESTAMP'
+    if pa.types.is_date(arrow_type):
+        return 'DATE'
+    if pa.types.is_integer(arrow_type):
+        return 'INT64'
+    if pa.types.is_floating(arrow_type):
+        return 'FLOAT64'
+    return 'STRING'
+
+def arrow_schema(table_name, columns):
+    # Declared types for the columns the file actually has, in file order.
+    # A column the schema doesn't know is loaded as text.
+    declared = table_schemas.get(table_name)
+    if declared is None:
+        return None
+    return pa.schema([
+        declared.field(column) if column in declared.names else pa.field(column, pa.string())
+        for column in columns
+    ])
+
+def schema_config(table_name, columns):
+    schema = arrow_schema(table_name, columns)
+    if schema is None:
+        return {'autodetect': True}
+    return {'schema': [bigquery.SchemaField(field.name, bigquery_type(field.type)) for field in schema]}
+
+def to_frame(table):
+    # Dictionary columns stay dictionary-encoded as categoricals; the client
+    # converts them to the STRING fields they load into, and they hash the
+    # same as plain strings, so the incremental upload state still matches.
+    return table.to_pandas()
+
+def source_columns(path):
+    if path.suffix == '.parquet':
+        return pq.read_schema(path).names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def read_csv_frames(path, table_name, chunksize=None):
+    schema = arrow_schema(table_name, source_columns(path))
+    if schema is None:
+        frames = pd.read_csv(path, chunksize=chunksize) if chunksize else [pd.read_csv(path)]
+        for df in frames:
+            for column in timestamp_columns:
+                if column in df.columns:
+                    df[column] = pd.to_datetime(df[column], utc=True)
+            yield df
+        return
+    dtypes = text_dtypes(schema)
+    frames = read_compact(path, dtypes, chunksize=chunksize) if chunksize else [read_compact(path, dtypes)]
+    for df in frames:
+        yield to_frame(to_arrow(df, schema))
+
+def upload_csv(client, table_ref, path):
+    df = next(read_csv_frames(path, table_ref.table_id))
+    job_config = bigquery.LoadJobConfig(
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        **layout_config(table_ref.table_id),
+        **schema_config(table_ref.table_id, df.columns)
+    )
+    return client.load_table_from_dataframe(df, table_ref, job_config=job_config)
+
+def load_frames(client, table_ref, frames, **first_config):
+    # Loads an iterable of frames while only ever holding one of them: the
+    # first replaces the table, the rest are appended with the schema the
+    # first load settled on, so a chunk whose types infer differently can't
+    # drift the table schema.
+    rows = 0
+    schema = None
+    for df in frames:
+        if schema is None:
+            job_config = bigquery.LoadJobConfig(
+                write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+                **first_config
+            )
+        else:
+            job_config = bigquery.LoadJobConfig(
+                schema=schema,
+                write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+            )
+        client.load_table_from_dataframe(df, table_ref, job_config=job_config).result()
+        if schema is None:
+            schema = client.get_table(table_ref).schema
+        rows += len(df)
+    return rows
+
+def upload_csv_chunked(client, table_ref, path, chunksize):
+    frames = read_csv_frames(path, table_ref.table_id, chunksize)
+    return load_frames(client, table_ref, frames, **layout_config(table_ref.table_id),
+                       **schema_config(table_ref.table_id, source_columns(path)))
+
+def upload_parquet(client, table_ref, path):
+    # The Parquet copies carry their own schema (DATE/TIMESTAMP columns,
+    # string IDs with leading zeros), so nothing is re-inferred here. The
+    # file object is sent in upload-sized pieces, never read whole.
     job_config = bigquery.LoadJobConfig(
-        autodetect=True,
-        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE  
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        **layout_config(table_ref.table_id),
+        **schema_config(table_ref.table_id, source_columns(path))
     )
-    job = client.load_table_from_dataframe(df, table_ref, job_config=job_config)
-    job.result()  
-    print(f"Table {table_name} Created and Data Uploaded.")
\ No newline at end of file
+    with open(path, 'rb') as f:
+        return client.load_table_from_file(f, table_ref, job_config=job_config)
+
+def source_path(table_name, source_format='parquet'):
+    csv_path = table_paths[table_name]
+    parquet_path = csv_path.with_suffix('.parquet')
+    if source_format == 'parquet':
+        if parquet_path.exists():
+            return parquet_path
+        print(f"No Parquet file for {table_name}, loading {csv_path.name} instead.")
+    return csv_path
+
+def upload_table(client, dataset_ref, table_name, source_format='parquet', chunksize=None):
+    started = time.perf_counter()
+    table_ref = dataset_ref.table(table_name)
+    path = source_path(table_name, source_format)
+    if path.suffix == '.parquet':
+        upload_parquet(client, table_ref, path).result()
+    elif chunksize:
+        rows = upload_csv_chunked(client, table_ref, path, chunksize)
+        print(f"Table {table_name} Loaded {rows} Rows in Chunks of {chunksize}.")
+    else:
+        upload_csv(client, table_ref, path).result()
+    elapsed = time.perf_counter() - started
+    print(f"Table {table_name} Created and Data Uploaded in {elapsed:.2f}s.")
+    return elapsed
+
+def load_upload_state(table_name):
+    state_path = upload_state_dir / f'{table_name}.json'
+    hashes_path = upload_state_dir / f'{table_name}.npy'
+    if not state_path.exists() or not hashes_path.exists():
+        return None, np.array([], dtype='uint64')
+    with open(state_path, 'r') as f:
+        fingerprint = json.load(f)['fingerprint']
+    return fingerprint, np.load(hashes_path)
+
+def save_upload_state(table_name, fingerprint, row_hashes):
+    # One file pair per table, so concurrent uploads never share a file.
+    upload_state_dir.mkdir(parents=True, exist_ok=True)
+    np.save(upload_state_dir / f'{table_name}.npy', np.sort(row_hashes))
+    with open(upload_state_dir / f'{table_name}.json', 'w') as f:
+        json.dump({'fingerprint': fingerprint}, f)
+
+def iter_upload_frames(table_name, path, chunksize=None):
+    if path.suffix == '.parquet':
+        if chunksize:
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+                yield to_frame(pa.Table.from_batches([batch]))
+        else:
+            yield to_frame(pq.read_table(path))
+        return
+    yield from read_csv_frames(path, table_name, chunksize)
+
+def row_hashes(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def layout_config(table_name):
+    # Every load that creates or replaces a table sends its layout, so the
+    # full and incremental uploads leave the same table behind.
+    layout = table_layouts.get(table_name)
+    if not layout:
+        return {}
+    return {
+        'time_partitioning': bigquery.TimePartitioning(type_=layout['partition_type'], field=layout['partition_field']),
+        'clustering_fields': layout['clustering_fields'],
+    }
+
+def needs_full_load(client, table_ref, table_name):
+    try:
+        table = client.get_table(table_ref)
+    except NotFound:
+        return True
+    layout = table_layouts.get(table_name)
+    if layout and (table.time_partitioning is None or table.time_partitioning.type_ != layout['partition_type']):
+        # Tables from older uploads (unpartitioned, or partitioned by day)
+        # can't be repartitioned in place, so they are dropped and reloaded
+        # once with the layout.
+        print(f"Table {table_name} is not partitioned by {layout['partition_type'].lower()}, recreating it.")
+        client.delete_table(table_ref, not_found_ok=True)
+        return True
+    return False
+
+def merge_sql(table_name, columns):
+    target = f"`{dataset_id}.{table_name}`"
+    staging = f"`{dataset_id}.{table_name}_staging`"
+    keys = merge_keys[table_name]
+    on = ' AND '.join(f"T.`{key}` = S.`{key}`" for key in keys)
+    updates = ', '.join(f"`{column}` = S.`{column}`" for column in columns if column not in keys)
+    return f"""
+        MERGE {target} T
+        USING {staging} S
+        ON {on}
+        WHEN MATCHED THEN UPDATE SET {updates}
+        WHEN NOT MATCHED THEN INSERT ROW
+    """
+
+def upload_table_incremental(client, dataset_ref, table_name, source_format='parquet', chunksize=None):
+    started = time.perf_counter()
+    path = source_path(table_name, source_format)
+    fingerprint = file_sha256(path)
+    previous_fingerprint, previous_hashes = load_upload_state(table_name)
+    if fingerprint == previous_fingerprint:
+        print(f"Table {table_name} Unchanged Since Last Upload, Skipped.")
+        return time.perf_counter() - started
+
+    table_ref = dataset_ref.table(table_name)
+    hashes = []
+    frames = iter_upload_frames(table_name, path, chunksize)
+
+    if needs_full_load(client, table_ref, table_name):
+        def hashed(frames):
+            for df in frames:
+                hashes.append(row_hashes(df))
+                yield df
+        rows = load_frames(client, table_ref, hashed(frames), **layout_config(table_name),
+                           **schema_config(table_name, source_columns(path)))
+        print(f"Table {table_name} Created With {rows} Rows.")
+    else:
+        # Only rows whose hash wasn't in the last upload are kept, so memory
+        # here scales with the delta, not the table.
+        deltas = []
+        for df in frames:
+            hashes.append(row_hashes(df))
+            deltas.append(df[~np.isin(hashes[-1], previous_hashes)])
+        delta = pd.concat(deltas, ignore_index=True) if deltas else pd.DataFrame()
+        if delta.empty:
+            print(f"Table {table_name} Has No New or Changed Rows.")
+        else:
+            staging_ref = dataset_ref.table(f'{table_name}_staging')
+            job_config = bigquery.LoadJobConfig(
+                write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+                **schema_config(table_name, delta.columns)
+            )
+            client.load_table_from_dataframe(delta, staging_ref, job_config=job_config).result()
+            client.query(merge_sql(table_name, list(delta.columns))).result()
+            client.delete_table(staging_ref, not_found_ok=True)
+            print(f"Table {table_name} Merged {len(delta)} New or Changed Rows.")
+
+    all_hashes = np.concatenate(hashes) if hashes else np.array([], dtype='uint64')
+    save_upload_state(table_name, fingerprint, all_hashes)
+    elapsed = time.perf_counter() - started
+    print(f"Table {table_name} Uploaded Incrementally in {elapsed:.2f}s.")
+    return elapsed
+
+def upload_tables(client, dataset_ref, table_names, source_format='parquet', max_concurrency=1, incremental=False,
+                  chunksize=None):
+    # BigQuery runs load jobs independently, so with max_concurrency > 1 the
+    # tables are serialized, submitted and waited on side by side. A failed
+    # table does not stop the others; the first error is raised at the end.
+    timings = {}
+    errors = {}
+    upload = upload_table_incremental if incremental else upload_table
+
+    def run(table_name):
+        try:
+            timings[table_name] = upload(client, dataset_ref, table_name, source_format, chunksize)
+        except Exception as e:
+            print(f"Table {table_name} Failed: {str(e)}")
+            errors[table_name] = e
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        list(pool.map(run, table_names))
+    if errors:
+        raise next(iter(errors.values()))
+    return timings
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Upload the processed tables to BigQuery.')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet',
+                        help='Which processed files to load (Parquet falls back to CSV when missing).')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Number of table load jobs to run at once.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Skip unchanged tables and MERGE only new or changed rows through a staging table.')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='Read and load sources this many rows at a time (bounded memory).')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    client = bigquery.Client()
+    dataset_ref = get_dataset(client)
+    upload_tables(client, dataset_ref, list(table_paths), args.format, args.concurrency, args.incremental,
+                  args.chunksize)
+    # Lets any running dashboard drop cached results computed before this upload.
+    mark_upload_finished(os.environ.get('QUERY_CACHE_UPLOAD_MARKER'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+CHART_KINDS = ('bar', 'line', 'scatter', 'hist', 'pie')
+
+def data_hash(data, columns):
+    hashes = pd.util.hash_pandas_object(data[list(columns)], index=False).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
+
+def chart_key(kind, data, x, y=None, **options):
+    # The same rows drawn the same way give the same key, whichever page or
+    # session asked for them.
+    columns = [x] if y is None else [x, y]
+    return kind, data_hash(data, columns), json.dumps({'x': x, 'y': y, **options}, sort_keys=True, default=str)
+
+def render_chart(kind, data, x, y=None, title='', xlabel=None, ylabel=None, color=None, figsize=(10, 6),
+                 rotate_labels=True):
+    # Built on a standalone Figure rather than through pyplot, so it is never
+    # registered as an open figure; it is closed and freed as soon as the PNG
+    # bytes are written.
+    if kind not in CHART_KINDS:
+        raise ValueError(f"Unknown chart kind: {kind}")
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if kind == 'bar':
+        ax.bar(data[x], data[y], color=color)
+    elif kind == 'line':
+        ax.plot(data[x], data[y], marker='o', color=color)
+    elif kind == 'scatter':
+        ax.scatter(data[x], data[y], color=color)
+    elif kind == 'hist':
+        ax.hist(data[x], bins=20, color=color, edgecolor='black')
+    else:
+        ax.pie(data[y], labels=data[x], autopct='%1.1f%%', startangle=140)
+    if kind != 'pie':
+        ax.set_xlabel(xlabel or x)
+        ax.set_ylabel(ylabel or y)
+        if rotate_labels:
+            ax.tick_params(axis='x', labelrotation=90)
+    ax.set_title(title)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    fig.clear()
+    return buffer.getvalue()
+
+class ChartCache:
+    """LRU of rendered chart PNGs, bounded by total bytes."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= len(self._entries.pop(key))
+            self._entries[key] = png
+            self.total_bytes += len(png)
+            while self.total_bytes > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self.total_bytes -= len(oldest)
+                self.evictions += 1
+
+    def chart(self, kind, data, x, y=None, **options):
+        key = chart_key(kind, data, x, y, **options)
+        png = self.get(key)
+        if png is None:
+            png = render_chart(kind, data, x, y, **options)
+            self.put(key, png)
+        return png
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+            }
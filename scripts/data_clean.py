@@ -1,13 +1,188 @@
+import argparse
+import glob
+import io
+import json
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.api.types import union_categoricals
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.append(str(Path(__file__).parent.parent))
+from scripts.file_hashes import file_sha256, file_sha256_with_prefix
+from scripts.summarize import run_summaries
+
+base_dir = Path(__file__).parent.parent
+patients_path = base_dir / 'data' / 'synthea_dataset' / 'patients.csv'
+appointments_path = base_dir / 'data' / 'synthea_dataset' / 'appointments.csv'
+doctors_path = base_dir / 'data' / 'synthea_dataset' / 'doctors.csv'
+cms_path = base_dir / 'data' / 'cms_dataset' / 'hospital_readmissions_reduction_program_hospital.csv'
+processed_dir = base_dir / 'data' / 'processed'
+
+patients_output = 'patients_data_cleaned.csv'
+appointments_output = 'appointments_data_cleaned.csv'
+cms_output = 'cms_data_cleaned.csv'
+manifest_name = 'manifest.json'
+patient_hashes_name = 'patients_row_hashes.csv'
 
-patients_data = pd.read_csv('data/synthea_dataset/patients.csv')
-appointments_data = pd.read_csv('data/synthea_dataset/appointments.csv')
-doctors_data = pd.read_csv('data/synthea_dataset/doctors.csv')
-cms_data = pd.read_csv('data/cms_dataset/hospital_readmissions_reduction_program_hospital.csv')
+# Declared read types, so every chunk of a streamed file parses the same way
+# the whole file does (a chunk that happens to be all-null must not flip a
+# text column to float). UUIDs repeated across rows and low-cardinality text
+# are read straight into categoricals, so each distinct value is stored once;
+# per-row unique IDs, names, addresses and timestamps are Arrow-backed
+# strings, held in one buffer rather than as a Python object per value.
+TEXT = pd.StringDtype('pyarrow')
+PATIENTS_DTYPES = {
+    'Id': TEXT,
+    'BIRTHDATE': TEXT,
+    'DEATHDATE': TEXT,
+    'SSN': TEXT,
+    'DRIVERS': TEXT,
+    'PASSPORT': TEXT,
+    'PREFIX': 'category',
+    'FIRST': TEXT,
+    'MIDDLE': TEXT,
+    'LAST': TEXT,
+    'SUFFIX': 'category',
+    'MAIDEN': TEXT,
+    'MARITAL': 'category',
+    'RACE': 'category',
+    'ETHNICITY': 'category',
+    'GENDER': 'category',
+    'BIRTHPLACE': 'category',
+    'ADDRESS': TEXT,
+    'CITY': 'category',
+    'STATE': 'category',
+    'COUNTY': 'category',
+    'FIPS': 'float64',
+    'ZIP': 'category',
+    'LAT': 'float64',
+    'LON': 'float64',
+    'HEALTHCARE_EXPENSES': 'float64',
+    'HEALTHCARE_COVERAGE': 'float64',
+}
+APPOINTMENTS_DTYPES = {
+    'Id': TEXT,
+    'START': TEXT,
+    'STOP': TEXT,
+    'PATIENT': 'category',
+    'ORGANIZATION': 'category',
+    'PROVIDER': 'category',
+    'PAYER': 'category',
+    'ENCOUNTERCLASS': 'category',
+    'CODE': 'int64',
+    'DESCRIPTION': 'category',
+    'BASE_ENCOUNTER_COST': 'float64',
+    'TOTAL_CLAIM_COST': 'float64',
+    'PAYER_COVERAGE': 'float64',
+    'REASONCODE': 'float64',
+    'REASONDESCRIPTION': 'category',
+}
+CMS_DTYPES = {
+    'Facility Name': 'category',
+    'Facility ID': 'category',
+    'State': 'category',
+    'Measure Name': 'category',
+    'Number of Discharges': 'float64',
+    'Footnote': 'float64',
+    'Excess Readmission Ratio': 'float64',
+    'Predicted Readmission Rate': 'float64',
+    'Expected Readmission Rate': 'float64',
+    'Number of Readmissions': str,
+    'Start Date': 'category',
+    'End Date': 'category',
+}
 
-patients_data = patients_data.rename(columns={'Id': 'patient_id'})
-appointments_data = appointments_data.rename(columns={'PATIENT': 'patient_id', 'PROVIDER': 'provider_id'})
-doctors_data = doctors_data.rename(columns={'Id': 'provider_id'})[['provider_id', 'NAME']]
+# Typed layout of the processed tables for the Parquet copies. Repeated IDs
+# and low-cardinality text are dictionary-encoded; dates and timestamps are
+# parsed once here instead of by every reader.
+ID = pa.dictionary(pa.int32(), pa.string())
+PATIENTS_SCHEMA = pa.schema([
+    ('patient_id', pa.string()),
+    ('BIRTHDATE', pa.date32()),
+    ('DEATHDATE', pa.date32()),
+    ('SSN', pa.string()),
+    ('DRIVERS', pa.string()),
+    ('PASSPORT', pa.string()),
+    ('PREFIX', ID),
+    ('FIRST', pa.string()),
+    ('MIDDLE', pa.string()),
+    ('LAST', pa.string()),
+    ('SUFFIX', ID),
+    ('MAIDEN', pa.string()),
+    ('MARITAL', ID),
+    ('RACE', ID),
+    ('ETHNICITY', ID),
+    ('GENDER', ID),
+    ('BIRTHPLACE', ID),
+    ('ADDRESS', pa.string()),
+    ('CITY', ID),
+    ('STATE', ID),
+    ('COUNTY', ID),
+    ('FIPS', pa.float64()),
+    ('ZIP', ID),
+    ('LAT', pa.float64()),
+    ('LON', pa.float64()),
+    ('HEALTHCARE_EXPENSES', pa.float64()),
+    ('HEALTHCARE_COVERAGE', pa.float64()),
+    ('INCOME', pa.int64()),
+    ('patient_name', pa.string()),
+])
+APPOINTMENTS_SCHEMA = pa.schema([
+    ('Id', pa.string()),
+    ('START', pa.timestamp('us', tz='UTC')),
+    ('STOP', pa.timestamp('us', tz='UTC')),
+    ('patient_id', ID),
+    ('ORGANIZATION', ID),
+    ('provider_id', ID),
+    ('PAYER', ID),
+    ('ENCOUNTERCLASS', ID),
+    ('CODE', pa.int64()),
+    ('DESCRIPTION', ID),
+    ('BASE_ENCOUNTER_COST', pa.float64()),
+    ('TOTAL_CLAIM_COST', pa.float64()),
+    ('PAYER_COVERAGE', pa.float64()),
+    ('REASONCODE', pa.int64()),
+    ('REASONDESCRIPTION', ID),
+    ('NAME', ID),
+])
+CMS_SCHEMA = pa.schema([
+    ('Facility Name', ID),
+    ('Facility ID', ID),
+    ('State', ID),
+    ('Measure Name', ID),
+    ('Number of Discharges', pa.float64()),
+    ('Footnote', pa.float64()),
+    ('Excess Readmission Ratio', pa.float64()),
+    ('Predicted Readmission Rate', pa.float64()),
+    ('Expected Readmission Rate', pa.float64()),
+    ('Number of Readmissions', pa.int64()),
+    ('Start Date', pa.date32()),
+    ('End Date', pa.date32()),
+])
+READ_BLOCK_ROWS = 100_000
+# The join keys and provider name repeat on every appointment; after the
+# rename and the provider join they are made categorical like the columns
+# that were read that way.
+APPOINTMENT_CATEGORIES = ['patient_id', 'provider_id', 'NAME']
+DATE_FORMATS = {'Start Date': '%m/%d/%Y', 'End Date': '%m/%d/%Y'}
+# Date and timestamp columns keep their nulls (a living patient has no
+# DEATHDATE); every other column still gets the 0 fill.
+DATE_COLUMNS = ['BIRTHDATE', 'DEATHDATE', 'START', 'STOP', 'Start Date', 'End Date']
+PARQUET_OUTPUTS = {
+    patients_output: PATIENTS_SCHEMA,
+    appointments_output: APPOINTMENTS_SCHEMA,
+    cms_output: CMS_SCHEMA,
+}
 
 def combine_names(row):
     first = str(row['FIRST']).strip() if pd.notna(row['FIRST']) else ''
@@ -18,27 +193,640 @@ def combine_names(row):
     if middle:
         name_parts.append(middle)
     name_parts.append(last)
-    
+
     return ' '.join(name_parts).strip()
 
-patients_data['patient_name'] = patients_data.apply(combine_names, axis=1)
+def combine_names_vectorized(df):
+    # Columnar equivalent of combine_names: same null handling and stripping,
+    # but built from whole-column string ops instead of a per-row apply.
+    first = df['FIRST'].fillna('').astype(str).str.strip()
+    middle = df['MIDDLE'].fillna('').astype(str).str.strip()
+    last = df['LAST'].fillna('').astype(str).str.strip()
+
+    names = first.where(middle == '', first + ' ' + middle)
+    return (names + ' ' + last).str.strip()
+
+def concat_compact(frames):
+    # pd.concat turns a categorical back into object strings when the frames'
+    # categories differ, so those columns are unioned instead. Each column is
+    # dropped from the blocks once joined, so the two copies never coexist.
+    frames = list(frames)
+    columns = {}
+    for column in list(frames[0].columns):
+        parts = [frame.pop(column) for frame in frames]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            columns[column] = pd.Series(union_categoricals(parts, ignore_order=True), name=column)
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+        del parts
+    return pd.DataFrame(columns)
+
+def read_compact(path, dtypes, chunksize=None, **kwargs):
+    # A whole-file read_csv holds every value as a Python string before the
+    # declared types apply, peaking at several times the finished frame;
+    # parsing a block at a time and joining the compact blocks doesn't.
+    if chunksize:
+        return pd.read_csv(path, dtype=dtypes, chunksize=chunksize, **kwargs)
+    return concat_compact(pd.read_csv(path, dtype=dtypes, chunksize=READ_BLOCK_ROWS, **kwargs))
+
+def read_patients(path=None):
+    return read_compact(path or patients_path, PATIENTS_DTYPES)
+
+def read_appointments(path=None, **kwargs):
+    return read_compact(path or appointments_path, APPOINTMENTS_DTYPES, **kwargs)
+
+def read_doctors(path=None):
+    doctors_data = pd.read_csv(path or doctors_path, usecols=['Id', 'NAME'])
+    return doctors_data.rename(columns={'Id': 'provider_id'})[['provider_id', 'NAME']]
+
+def read_cms(path=None, **kwargs):
+    return read_compact(path or cms_path, CMS_DTYPES, **kwargs)
+
+def fill_missing(df):
+    # A categorical only takes the 0 fill once 0 is one of its categories,
+    # and an Arrow string column only takes it as text; both reject a value
+    # they can't hold even with nothing to fill. Either way the CSV reads 0.
+    df = df.copy(deep=False)
+    fills = {}
+    for column in df.columns:
+        if column in DATE_COLUMNS:
+            continue
+        dtype = df[column].dtype
+        if isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype)) and not df[column].hasnans:
+            continue
+        if isinstance(dtype, pd.CategoricalDtype) and 0 not in dtype.categories:
+            df[column] = df[column].cat.add_categories([0])
+        fills[column] = '0' if isinstance(dtype, pd.StringDtype) else 0
+    # Object columns (all-null ones, say) are retyped explicitly after the
+    # fill rather than by fillna's deprecated implicit downcast.
+    with pd.option_context('future.no_silent_downcasting', True):
+        return df.fillna(fills).infer_objects(copy=False)
+
+def narrow_numbers(df):
+    # Integers take the smallest type that holds them; floats drop to float32
+    # only when every value survives the round trip, so nothing written out
+    # changes.
+    for column in df.select_dtypes('integer').columns:
+        df[column] = pd.to_numeric(df[column], downcast='integer')
+    for column in df.select_dtypes('float64').columns:
+        narrow = df[column].astype('float32')
+        if narrow.astype('float64').equals(df[column]):
+            df[column] = narrow
+    return df
+
+def compact(df, categories=()):
+    for column in categories:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return narrow_numbers(df)
+
+def frame_mb(df):
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def report_memory(stage, mb):
+    peak = peak_rss_mb()
+    peak_text = f", process peak {peak:.0f} MB" if peak is not None else ''
+    print(f"{stage} memory: {mb:.1f} MB of frames{peak_text}.")
+
+def build_provider_lookup(doctors_data):
+    return doctors_data.set_index('provider_id')['NAME']
+
+def clean_patients(patients_data):
+    patients_data = patients_data.rename(columns={'Id': 'patient_id'})
+    patients_data['patient_name'] = combine_names_vectorized(patients_data)
+    return compact(fill_missing(patients_data))
+
+def fill_provider_name(appointments_data):
+    names = appointments_data['NAME']
+    if not names.hasnans:
+        return appointments_data
+    if 'Unknown Provider' not in names.cat.categories:
+        names = names.cat.add_categories(['Unknown Provider'])
+    appointments_data['NAME'] = names.fillna('Unknown Provider')
+    return appointments_data
+
+def clean_appointments(appointments_data, doctors_data):
+    # The left join on provider_id is a lookup map rather than pd.merge,
+    # which would copy every column of the frame to add one.
+    return clean_appointments_chunk(appointments_data, build_provider_lookup(doctors_data))
+
+def clean_appointments_chunk(chunk, provider_lookup):
+    # clean_appointments for one slice of rows, joined against a lookup built
+    # once instead of once per chunk.
+    chunk = chunk.rename(columns={'PATIENT': 'patient_id', 'PROVIDER': 'provider_id'})
+    chunk['NAME'] = chunk['provider_id'].map(provider_lookup)
+    chunk = compact(chunk, APPOINTMENT_CATEGORIES)
+    chunk = fill_provider_name(chunk)
+    return fill_missing(chunk)
+
+def clean_cms(cms_data):
+    cms_data = cms_data.copy()
+    cms_data['Number of Readmissions'] = cms_data['Number of Readmissions'].replace("Too Few to Report", 0)
+    return compact(fill_missing(cms_data))
+
+def write_chunks(chunks, output_path):
+    rows = 0
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(output_path, index=False, mode='w' if i == 0 else 'a', header=i == 0)
+        rows += len(chunk)
+    return rows
+
+def to_arrow(chunk, schema):
+    # chunk is processed CSV text; each column is parsed into its declared
+    # type, and empty dates and timestamps become nulls.
+    arrays = []
+    for field in schema:
+        values = chunk[field.name]
+        if pa.types.is_timestamp(field.type):
+            array = pa.array(pd.to_datetime(values, utc=True, errors='coerce'), type=field.type, from_pandas=True)
+        elif pa.types.is_date32(field.type):
+            dates = pd.to_datetime(values, format=DATE_FORMATS.get(field.name, '%Y-%m-%d'), errors='coerce')
+            array = pa.array(dates, from_pandas=True).cast(pa.date32())
+        elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            array = pa.array(pd.to_numeric(values, errors='coerce'), from_pandas=True).cast(field.type)
+        elif pa.types.is_dictionary(field.type):
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                array = pa.array(values, from_pandas=True).cast(field.type)
+            else:
+                array = pa.array(values, type=pa.string(), from_pandas=True).dictionary_encode()
+        else:
+            array = pa.array(values, type=field.type, from_pandas=True)
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def text_dtypes(schema):
+    # Compact read types for a whole processed CSV: dictionary fields straight
+    # into categoricals, everything else as strings for to_arrow to parse.
+    return {field.name: 'category' if pa.types.is_dictionary(field.type) else TEXT for field in schema}
+
+def write_parquet(csv_path, schema, chunksize=100_000):
+    parquet_path = Path(csv_path).with_suffix('.parquet')
+    with pq.ParquetWriter(parquet_path, schema, compression='zstd') as writer:
+        for chunk in pd.read_csv(csv_path, dtype=str, chunksize=chunksize):
+            writer.write_table(to_arrow(chunk, schema))
+    return parquet_path
+
+def write_parquet_outputs(output_dir, chunksize=100_000, names=None):
+    for name, schema in PARQUET_OUTPUTS.items():
+        if names is None or name in names:
+            write_parquet(Path(output_dir) / name, schema, chunksize)
+
+def source_hashes(appointments_prefix_size=None):
+    # Also returns the appointments source's size and, from the same read, the
+    # hash of its first appointments_prefix_size bytes: when that matches the
+    # previous run's hash, rows were only appended since.
+    appointments_size = appointments_path.stat().st_size
+    appointments_prefix, appointments_hash = file_sha256_with_prefix(appointments_path, appointments_prefix_size)
+    hashes = {
+        'patients': file_sha256(patients_path),
+        'appointments': appointments_hash,
+        'doctors': file_sha256(doctors_path),
+        'cms': file_sha256(cms_path),
+    }
+    return hashes, appointments_size, appointments_prefix
+
+def patient_row_hashes(patients_data):
+    return pd.DataFrame({
+        'patient_id': patients_data['Id'],
+        'row_hash': pd.util.hash_pandas_object(patients_data, index=False).astype(str).values,
+    })
+
+def latest_start(starts):
+    return pd.to_datetime(starts, utc=True).max()
+
+def advance_watermark(watermark, watermark_ids, ids, starts):
+    # The latest START seen, with the Ids of every row starting exactly then.
+    # More rows can arrive at the watermark later, so the next run keeps rows
+    # at the watermark and skips only the Ids listed here.
+    latest = starts.max() if len(starts) else pd.NaT
+    if pd.isna(latest) or (watermark is not None and latest < watermark):
+        return watermark, watermark_ids
+    latest_ids = set(ids[(starts == latest).to_numpy()].astype(str))
+    if latest == watermark:
+        latest_ids.update(watermark_ids)
+    return latest, sorted(latest_ids)
+
+def load_manifest(output_dir=processed_dir):
+    path = Path(output_dir) / manifest_name
+    if not path.exists():
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def write_manifest(output_dir, watermark, watermark_ids, hashes, appointments_size):
+    output_dir = Path(output_dir)
+    manifest = {
+        'watermark': None if pd.isna(watermark) else watermark.isoformat(),
+        'watermark_ids': watermark_ids,
+        'appointments_size': appointments_size,
+        'sources': hashes,
+    }
+    tmp_path = output_dir / (manifest_name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(output_dir / manifest_name)
+
+def write_patient_hashes(output_dir, patient_hashes):
+    patient_hashes.to_csv(Path(output_dir) / patient_hashes_name, index=False)
+
+def stream_appointments(output_path, chunksize, provider_lookup, watermark=None, watermark_ids=(), append=False,
+                        chunks=None):
+    # Returns (rows written, latest START seen, Ids of the rows starting
+    # then). With a watermark only rows starting at or after it are cleaned,
+    # less the watermark_ids already written; with append the output is
+    # extended rather than rewritten. chunks defaults to the whole source.
+    rows = 0
+    latest, latest_ids = watermark, sorted(watermark_ids)
+    written = set(watermark_ids)
+    largest = 0
+    for chunk in read_appointments(chunksize=chunksize) if chunks is None else chunks:
+        starts = pd.to_datetime(chunk['START'], utc=True)
+        if watermark is not None:
+            keep = (starts > watermark) | ((starts == watermark) & ~chunk['Id'].astype(str).isin(written))
+            chunk = chunk[keep.to_numpy()]
+            starts = starts[keep.to_numpy()]
+        if chunk.empty:
+            continue
+        write_header = rows == 0 and not append
+        cleaned = clean_appointments_chunk(chunk, provider_lookup)
+        cleaned.to_csv(output_path, index=False, mode='w' if write_header else 'a', header=write_header)
+        largest = max(largest, frame_mb(cleaned))
+        rows += len(chunk)
+        latest, latest_ids = advance_watermark(latest, latest_ids, chunk['Id'], starts)
+    report_memory('Appointments (largest chunk)', largest)
+    return rows, latest, latest_ids
+
+def appended_appointments(offset, chunksize):
+    # Rows appended to the appointments source after `offset` bytes, read in
+    # chunks with the file's header.
+    with open(appointments_path, 'rb') as f:
+        header = f.readline()
+        f.seek(max(offset, len(header)))
+        tail = io.BytesIO(header + f.read())
+    return read_appointments(tail, chunksize=chunksize)
+
+# Per-table stages. Each one reads its own sources, cleans them and writes
+# its CSV and Parquet outputs, so the stages share nothing and can run in
+# separate processes. chunksize=None cleans the whole file in one frame.
+
+def patients_stage(output_dir, chunksize=None):
+    # Patients are one row per person and stay small next to the encounter
+    # history, so they are cleaned in one pass even when streaming.
+    output_dir = Path(output_dir)
+    raw_patients = read_patients()
+    patients_data = clean_patients(raw_patients)
+    patients_data.to_csv(output_dir / patients_output, index=False)
+    report_memory('Patients', frame_mb(raw_patients) + frame_mb(patients_data))
+    write_parquet(output_dir / patients_output, PATIENTS_SCHEMA, chunksize or 100_000)
+    write_patient_hashes(output_dir, patient_row_hashes(raw_patients))
+    print(f"Patients: {len(raw_patients)} rows cleaned.")
+
+def appointments_stage(output_dir, chunksize=None):
+    output_dir = Path(output_dir)
+    if chunksize:
+        provider_lookup = build_provider_lookup(read_doctors())
+        rows, watermark, watermark_ids = stream_appointments(output_dir / appointments_output, chunksize, provider_lookup)
+        print(f"Appointments: {rows} rows streamed in chunks of {chunksize}.")
+    else:
+        appointments_data = clean_appointments(read_appointments(), read_doctors())
+        appointments_data.to_csv(output_dir / appointments_output, index=False)
+        report_memory('Appointments', frame_mb(appointments_data))
+        watermark, watermark_ids = advance_watermark(
+            None, [], appointments_data['Id'], pd.to_datetime(appointments_data['START'], utc=True)
+        )
+        print(f"Appointments: {len(appointments_data)} rows cleaned.")
+    write_parquet(output_dir / appointments_output, APPOINTMENTS_SCHEMA, chunksize or 100_000)
+    return watermark, watermark_ids
+
+def cms_stage(output_dir, chunksize=None):
+    output_dir = Path(output_dir)
+    if chunksize:
+        cms_chunks = (clean_cms(chunk) for chunk in read_cms(chunksize=chunksize))
+        rows = write_chunks(cms_chunks, output_dir / cms_output)
+        print(f"CMS: {rows} rows streamed in chunks of {chunksize}.")
+    else:
+        cms_data = clean_cms(read_cms())
+        cms_data.to_csv(output_dir / cms_output, index=False)
+        report_memory('CMS', frame_mb(cms_data))
+        print(f"CMS: {len(cms_data)} rows cleaned.")
+    write_parquet(output_dir / cms_output, CMS_SCHEMA, chunksize or 100_000)
+
+def run_stages(output_dir=processed_dir, chunksize=None, workers=1):
+    output_dir = Path(output_dir)
+    stages = [appointments_stage, patients_stage, cms_stage]
+    if workers > 1:
+        # Only the appointments stage joins against another table (doctors),
+        # and it does so inside its own stage, so the three tables clean
+        # side by side and wall time tracks the slowest one.
+        with ProcessPoolExecutor(max_workers=min(workers, len(stages))) as pool:
+            futures = [pool.submit(stage, output_dir, chunksize) for stage in stages]
+            hashes, appointments_size, _ = source_hashes()
+            watermark, watermark_ids = futures[0].result()
+            for future in futures[1:]:
+                future.result()
+    else:
+        hashes, appointments_size, _ = source_hashes()
+        watermark, watermark_ids = appointments_stage(output_dir, chunksize)
+        patients_stage(output_dir, chunksize)
+        cms_stage(output_dir, chunksize)
+    write_manifest(output_dir, watermark, watermark_ids, hashes, appointments_size)
+
+def run_batch(output_dir=processed_dir, workers=1):
+    run_stages(output_dir, workers=workers)
+
+def run_streaming(output_dir=processed_dir, chunksize=100_000, workers=1):
+    run_stages(output_dir, chunksize, workers)
+
+def as_text(df):
+    # Round-trip through CSV so upserted rows are formatted exactly like the
+    # rows already in the processed file.
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)), dtype=str, keep_default_na=False)
+
+def upsert_patients(output_path, cleaned_delta):
+    existing = pd.read_csv(output_path, dtype=str, keep_default_na=False).set_index('patient_id', drop=False)
+    delta = as_text(cleaned_delta).set_index('patient_id', drop=False)
+    changed = delta.index.intersection(existing.index)
+    existing.loc[changed] = delta.loc[changed]
+    added = delta[~delta.index.isin(existing.index)]
+    pd.concat([existing, added]).to_csv(output_path, index=False)
+    return len(changed), len(added)
+
+def run_incremental(output_dir=processed_dir, chunksize=100_000):
+    output_dir = Path(output_dir)
+    manifest = load_manifest(output_dir)
+    outputs = [output_dir / name for name in (patients_output, appointments_output, cms_output, patient_hashes_name)]
+    if manifest is None or 'watermark_ids' not in manifest or not all(path.exists() for path in outputs):
+        print("No manifest from a previous run, cleaning everything.")
+        run_streaming(output_dir, chunksize)
+        return
+
+    hashes, appointments_size, appointments_prefix = source_hashes(manifest['appointments_size'])
+    previous = manifest['sources']
+    watermark = pd.Timestamp(manifest['watermark']) if manifest['watermark'] else None
+    watermark_ids = manifest['watermark_ids']
+
+    changed = set()
+    raw_patients = read_patients()
+    patient_hashes = patient_row_hashes(raw_patients)
+    if hashes['patients'] != previous.get('patients'):
+        changed.add(patients_output)
+        known = pd.read_csv(output_dir / patient_hashes_name, dtype=str)
+        merged = patient_hashes.merge(known, on='patient_id', how='left', suffixes=('', '_previous'))
+        delta = raw_patients[(merged['row_hash'] != merged['row_hash_previous']).values]
+        updated, added = upsert_patients(output_dir / patients_output, clean_patients(delta))
+        print(f"Patients: {updated} updated, {added} added.")
+    else:
+        print("Patients: source unchanged.")
+
+    provider_lookup = build_provider_lookup(read_doctors())
+    if hashes['doctors'] != previous.get('doctors'):
+        changed.add(appointments_output)
+        # Provider names are joined onto every appointment, so a changed
+        # doctors file invalidates rows below the watermark too.
+        rows, watermark, watermark_ids = stream_appointments(output_dir / appointments_output, chunksize,
+                                                             provider_lookup)
+        print(f"Appointments: doctors changed, rebuilt {rows} rows.")
+    elif hashes['appointments'] != previous.get('appointments'):
+        changed.add(appointments_output)
+        # When the source only grew, the rows already cleaned are skipped
+        # unparsed; otherwise every row is checked against the watermark.
+        appended = appointments_prefix is not None and appointments_prefix == previous.get('appointments')
+        chunks = appended_appointments(manifest['appointments_size'], chunksize) if appended else None
+        rows, watermark, watermark_ids = stream_appointments(
+            output_dir / appointments_output, chunksize, provider_lookup, watermark=watermark,
+            watermark_ids=watermark_ids, append=True, chunks=chunks
+        )
+        print(f"Appointments: appended {rows} rows after the watermark.")
+    else:
+        print("Appointments: source unchanged.")
+
+    # The CMS release has no incremental key, so a changed file is re-cleaned whole.
+    if hashes['cms'] != previous.get('cms'):
+        changed.add(cms_output)
+        cms_chunks = (clean_cms(chunk) for chunk in read_cms(chunksize=chunksize))
+        rows = write_chunks(cms_chunks, output_dir / cms_output)
+        print(f"CMS: source changed, rewrote {rows} rows.")
+    else:
+        print("CMS: source unchanged.")
+
+    # Parquet files can't be appended to, so only the tables that changed
+    # (or whose copy is missing) are converted again.
+    stale = {name for name in PARQUET_OUTPUTS if name in changed or not (output_dir / name).with_suffix('.parquet').exists()}
+    write_parquet_outputs(output_dir, chunksize, names=stale)
+    write_patient_hashes(output_dir, patient_hashes)
+    write_manifest(output_dir, watermark, watermark_ids, hashes, appointments_size)
+
+# Sharded mode. Synthea runs write one set of files per population run; the
+# shards' patients and appointments are spilled into partitions by a hash of
+# patient_id, so every patient lands in the same partition as all of their
+# appointments whichever shard they came from. Each partition is then cleaned
+# on its own worker, holding only that partition in memory.
+
+SHARD_STEMS = {'patients': 'patients', 'appointments': 'appointments', 'doctors': 'doctors'}
+SHARD_KEYS = {'patients': 'Id', 'appointments': 'PATIENT'}
+partitions_dirname = 'partitions'
+spill_dirname = '.spill'
+
+def shard_files(source, table):
+    # source is a directory (searched recursively) or a glob matching shard
+    # files or shard directories; files are named like the single-file
+    # sources (patients*.csv, appointments*.csv, doctors*.csv).
+    stem = SHARD_STEMS[table]
+    path = Path(source)
+    matches = [path] if path.is_dir() else [Path(p) for p in glob.glob(str(source), recursive=True)]
+    files = set()
+    for match in matches:
+        if match.is_dir():
+            files.update(match.rglob(f'{stem}*.csv'))
+        elif match.name.startswith(stem) and match.suffix == '.csv':
+            files.add(match)
+    return sorted(files)
+
+def partition_of(keys, partitions):
+    # hash_pandas_object uses a fixed key, so a patient maps to the same
+    # partition on every run and in every process.
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy() % partitions
+
+def spill_path(spill_dir, table, partition, shard):
+    return Path(spill_dir) / table / f'part-{partition:05d}' / f'shard-{shard:05d}.csv'
+
+def spill_shard(path, table, shard, spill_dir, partitions, chunksize=100_000):
+    # Rows are copied as text, untouched, so each partition parses exactly as
+    # the source file would have. Each shard writes its own spill files, so
+    # shards can spill side by side.
+    written = set()
+    rows = 0
+    for chunk in pd.read_csv(path, dtype=str, na_filter=False, chunksize=chunksize):
+        for partition, part in chunk.groupby(partition_of(chunk[SHARD_KEYS[table]], partitions), sort=True):
+            target = spill_path(spill_dir, table, partition, shard)
+            if target not in written:
+                target.parent.mkdir(parents=True, exist_ok=True)
+            part.to_csv(target, index=False, mode='a' if target in written else 'w', header=target not in written)
+            written.add(target)
+        rows += len(chunk)
+    return rows
+
+def read_partition(spill_dir, table, partition, dtypes):
+    paths = sorted((Path(spill_dir) / table / f'part-{partition:05d}').glob('shard-*.csv'))
+    if not paths:
+        return None
+    return concat_compact(read_compact(path, dtypes) for path in paths)
+
+def sorted_categories(series):
+    # Categoricals sort by category order, which follows first appearance;
+    # lexical categories make the sort the same however the rows arrived.
+    return series.cat.reorder_categories(sorted(series.cat.categories))
+
+def read_shard_doctors(doctor_files):
+    if not doctor_files:
+        return read_doctors()
+    doctors_data = pd.concat([read_doctors(path) for path in doctor_files], ignore_index=True)
+    return doctors_data.drop_duplicates('provider_id', ignore_index=True)
+
+def partition_output(output_dir, name, partition):
+    return Path(output_dir) / partitions_dirname / Path(name).stem / f'part-{partition:05d}.csv'
+
+def clean_partition(partition, spill_dir, output_dir, doctor_files, chunksize=100_000):
+    # Rows come out sorted by key (patients by patient_id; appointments by
+    # patient_id, START, Id), so a partition's output doesn't depend on how
+    # its rows were split across shards or which worker cleaned it.
+    result = {'partition': partition, 'patients': 0, 'appointments': 0, 'latest_start': None, 'frames_mb': 0.0}
+    raw_patients = read_partition(spill_dir, 'patients', partition, PATIENTS_DTYPES)
+    if raw_patients is not None:
+        raw_patients = raw_patients.sort_values('Id', kind='stable', ignore_index=True)
+        patients_data = clean_patients(raw_patients)
+        output_path = partition_output(output_dir, patients_output, partition)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        patients_data.to_csv(output_path, index=False)
+        write_parquet(output_path, PATIENTS_SCHEMA, chunksize)
+        result['patients'] = len(patients_data)
+        result['frames_mb'] += frame_mb(patients_data)
+        del raw_patients, patients_data
+
+    raw_appointments = read_partition(spill_dir, 'appointments', partition, APPOINTMENTS_DTYPES)
+    if raw_appointments is not None:
+        raw_appointments['PATIENT'] = sorted_categories(raw_appointments['PATIENT'])
+        raw_appointments = raw_appointments.sort_values(['PATIENT', 'START', 'Id'], kind='stable', ignore_index=True)
+        provider_lookup = build_provider_lookup(read_shard_doctors(doctor_files))
+        appointments_data = clean_appointments_chunk(raw_appointments, provider_lookup)
+        output_path = partition_output(output_dir, appointments_output, partition)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        appointments_data.to_csv(output_path, index=False)
+        write_parquet(output_path, APPOINTMENTS_SCHEMA, chunksize)
+        result['appointments'] = len(appointments_data)
+        latest = latest_start(appointments_data['START'])
+        result['latest_start'] = None if pd.isna(latest) else latest.isoformat()
+        result['frames_mb'] += frame_mb(appointments_data)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+def assemble_partitions(output_dir, name, schema, partitions):
+    # The single processed files the summaries, uploader and dashboard read
+    # are the partitions joined in partition order: CSV bodies copied after
+    # one header, Parquet row groups copied one partition at a time.
+    output_dir = Path(output_dir)
+    parts = [partition_output(output_dir, name, p) for p in range(partitions)]
+    parts = [part for part in parts if part.exists()]
+    if not parts:
+        return
+    with open(output_dir / name, 'wb') as out:
+        for i, part in enumerate(parts):
+            with open(part, 'rb') as f:
+                header = f.readline()
+                if i == 0:
+                    out.write(header)
+                shutil.copyfileobj(f, out)
+    with pq.ParquetWriter((output_dir / name).with_suffix('.parquet'), schema, compression='zstd') as writer:
+        for part in parts:
+            writer.write_table(pq.read_table(part.with_suffix('.parquet'), schema=schema))
+
+def run_sharded(source, output_dir=processed_dir, partitions=None, workers=1, chunksize=100_000):
+    output_dir = Path(output_dir)
+    partitions = partitions or 4 * max(workers, 1)
+    files = {table: shard_files(source, table) for table in SHARD_STEMS}
+    if not files['patients'] and not files['appointments']:
+        raise FileNotFoundError(f"No patients or appointments shards found in {source}")
+    spill_dir = output_dir / spill_dirname
+    for stale in (spill_dir, output_dir / partitions_dirname):
+        shutil.rmtree(stale, ignore_errors=True)
 
-appointments_data = pd.merge(
-    appointments_data,
-    doctors_data,
-    on='provider_id',
-    how='left'
-)
+    spills = [(path, table, shard) for table in SHARD_KEYS for shard, path in enumerate(files[table])]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(spill_shard, *zip(*spills), [spill_dir] * len(spills),
+                                 [partitions] * len(spills), [chunksize] * len(spills)))
+            results = list(pool.map(clean_partition, range(partitions), [spill_dir] * partitions,
+                                    [output_dir] * partitions, [files['doctors']] * partitions,
+                                    [chunksize] * partitions))
+    else:
+        rows = [spill_shard(*spill, spill_dir, partitions, chunksize) for spill in spills]
+        results = [clean_partition(p, spill_dir, output_dir, files['doctors'], chunksize) for p in range(partitions)]
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    print(f"Sharded: spilled {sum(rows)} rows from {len(spills)} shard files into {partitions} partitions.")
 
-appointments_data.fillna({'NAME': 'Unknown Provider'}, inplace=True)
+    assemble_partitions(output_dir, patients_output, PATIENTS_SCHEMA, partitions)
+    assemble_partitions(output_dir, appointments_output, APPOINTMENTS_SCHEMA, partitions)
+    cms_stage(output_dir)
+    for result in results:
+        peak = result['peak_rss_mb']
+        peak_text = f", worker peak {peak:.0f} MB" if peak is not None else ''
+        print(f"Partition {result['partition']}: {result['patients']} patients, {result['appointments']} appointments, "
+              f"{result['frames_mb']:.1f} MB of frames{peak_text}.")
+    # The manifest and patient row hashes describe single-file sources; an
+    # incremental run after a sharded one starts over instead of trusting them.
+    for name in (manifest_name, patient_hashes_name):
+        (output_dir / name).unlink(missing_ok=True)
+    return results
 
-cms_data['Number of Readmissions'] = cms_data['Number of Readmissions'].replace("Too Few to Report", 0)
+def __getattr__(name):
+    # The cleaned frames used to be module globals built at import time; keep
+    # them reachable for existing callers, but only load them when asked for.
+    loaders = {
+        'patients_data': lambda: clean_patients(read_patients()),
+        'appointments_data': lambda: clean_appointments(read_appointments(), read_doctors()),
+        'doctors_data': read_doctors,
+        'cms_data': lambda: clean_cms(read_cms()),
+    }
+    if name not in loaders:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = loaders[name]()
+    globals()[name] = value
+    return value
 
-patients_data.fillna(0, inplace=True)
-appointments_data.fillna(0, inplace=True)
-cms_data.fillna(0, inplace=True)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Clean the Synthea and CMS source files into data/processed.')
+    parser.add_argument('--output-dir', type=Path, default=processed_dir)
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='Stream appointments and CMS rows in chunks of this many rows (bounded memory).')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Clean the patients, appointments and CMS tables in parallel on this many processes.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only clean appointments after the manifest watermark and new or changed patients.')
+    parser.add_argument('--shards', default=None,
+                        help='Directory or glob of Synthea shards (patients*.csv, appointments*.csv, doctors*.csv); '
+                             'rows are hash-partitioned by patient and cleaned one partition per worker.')
+    parser.add_argument('--partitions', type=int, default=None,
+                        help='Number of patient partitions in sharded mode (default: 4 per worker).')
+    return parser.parse_args(argv)
 
-patients_data.to_csv('data/processed/patients_data_cleaned.csv', index=False)
-appointments_data.to_csv('data/processed/appointments_data_cleaned.csv', index=False)
-cms_data.to_csv('data/processed/cms_data_cleaned.csv', index=False)
+def main(argv=None):
+    args = parse_args(argv)
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    if args.shards:
+        run_sharded(args.shards, args.output_dir, args.partitions, args.workers, args.chunksize or 100_000)
+    elif args.incremental:
+        run_incremental(args.output_dir, args.chunksize or 100_000)
+    else:
+        run_stages(args.output_dir, args.chunksize, args.workers)
+    # The dashboard reads these instead of aggregating the raw tables.
+    run_summaries(args.output_dir)
 
+if __name__ == '__main__':
+    main()
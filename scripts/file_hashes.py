@@ -0,0 +1,25 @@
+import hashlib
+
+def file_sha256(path, block_size=1 << 20):
+    return file_sha256_with_prefix(path, None, block_size)[1]
+
+def file_sha256_with_prefix(path, prefix_size, block_size=1 << 20):
+    # (hash of the first prefix_size bytes, hash of the whole file) from one
+    # read. The prefix hash is None when prefix_size is None or the file is
+    # shorter than that.
+    digest = hashlib.sha256()
+    prefix = None
+    read = 0
+    with open(path, 'rb') as f:
+        while True:
+            if prefix_size is not None and prefix is None and read == prefix_size:
+                prefix = digest.hexdigest()
+            if prefix_size is not None and prefix is None:
+                block = f.read(min(block_size, prefix_size - read))
+            else:
+                block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+            read += len(block)
+    return prefix, digest.hexdigest()
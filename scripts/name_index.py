@@ -0,0 +1,209 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+base_dir = Path(__file__).parent.parent
+processed_dir = base_dir / 'data' / 'processed'
+index_dirname = 'name_index'
+
+# Each index is built from the summary table its dashboard analysis reads.
+# Names are stored best-ranked first, so among equally good matches the
+# busier doctor or facility comes first.
+INDEX_SOURCES = {
+    'doctors': 'doctor_appointment_volume.csv',
+    'patients': 'patient_appointment_gaps.csv',
+    'facilities': 'facility_readmissions.csv',
+}
+SEPARATOR = '\n'
+
+def normalize(text):
+    # Lowercased and nothing else, so a match here is a match for the
+    # dashboard's STRPOS(LOWER(name), LOWER(search)) filter.
+    return str(text).lower()
+
+def trigram_codes(codes):
+    # codes: code points of one or more SEPARATOR-joined strings. Returns the
+    # start position and a packed uint64 key of every trigram that doesn't
+    # span a separator.
+    if len(codes) < 3:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.uint64)
+    codes = codes.astype(np.uint64)
+    keys = (codes[:-2] << np.uint64(42)) | (codes[1:-1] << np.uint64(21)) | codes[2:]
+    separator = codes == ord(SEPARATOR)
+    valid = ~(separator[:-2] | separator[1:-1] | separator[2:])
+    return np.flatnonzero(valid), keys[valid]
+
+def code_points(text):
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+class NameIndex:
+    """Trigram and prefix index over one column of names.
+
+    search() returns every name containing the query, best match first:
+    names starting with it, then names with a word starting with it, then
+    the rest, each group in rank order. Queries of three or more characters
+    are answered from trigram postings; shorter ones scan the joined names.
+    """
+
+    def __init__(self, names, gram_keys, gram_offsets, gram_ids):
+        self.names = names
+        self.normalized = [normalize(name) for name in names]
+        self.blob = SEPARATOR.join(self.normalized)
+        lengths = np.fromiter((len(name) + 1 for name in self.normalized), dtype=np.int64, count=len(names))
+        self.starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(names) else np.array([], dtype=np.int64)
+        self.gram_keys = gram_keys
+        self.gram_offsets = gram_offsets
+        self.gram_ids = gram_ids
+
+    @classmethod
+    def build(cls, names):
+        names = list(dict.fromkeys(str(name).replace(SEPARATOR, ' ') for name in names))
+        index = cls(names, None, None, None)
+        positions, keys = trigram_codes(code_points(index.blob))
+        ids = (np.searchsorted(index.starts, positions, side='right') - 1).astype(np.uint32)
+        order = np.lexsort((ids, keys))
+        keys, ids = keys[order], ids[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]) | (ids[1:] != ids[:-1])
+        keys, ids = keys[first], ids[first]
+        index.gram_keys, starts = np.unique(keys, return_index=True)
+        index.gram_offsets = np.append(starts, len(keys)).astype(np.int64)
+        index.gram_ids = ids
+        return index
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + '.tmp.npz')
+        np.savez(
+            tmp_path,
+            names=np.frombuffer(SEPARATOR.join(self.names).encode('utf-8'), dtype=np.uint8),
+            count=np.array([len(self.names)]),
+            gram_keys=self.gram_keys,
+            gram_offsets=self.gram_offsets,
+            gram_ids=self.gram_ids,
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            names = data['names'].tobytes().decode('utf-8').split(SEPARATOR) if data['count'][0] else []
+            return cls(names, data['gram_keys'], data['gram_offsets'], data['gram_ids'])
+
+    def __len__(self):
+        return len(self.names)
+
+    def postings(self, key):
+        i = np.searchsorted(self.gram_keys, key)
+        if i == len(self.gram_keys) or self.gram_keys[i] != key:
+            return np.array([], dtype=np.uint32)
+        return self.gram_ids[self.gram_offsets[i]:self.gram_offsets[i + 1]]
+
+    def candidates(self, query):
+        # Ids of names holding every trigram of the query, rarest first so
+        # the intersection shrinks as fast as possible.
+        _, keys = trigram_codes(code_points(query))
+        lists = sorted((self.postings(key) for key in np.unique(keys)), key=len)
+        ids = lists[0]
+        for other in lists[1:]:
+            if not len(ids):
+                break
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    def tier(self, name, query):
+        if name.startswith(query):
+            return 0
+        if ' ' + query in name:
+            return 1
+        return 2
+
+    @property
+    def codes(self):
+        # Code points of the joined names, only needed for one- and
+        # two-character queries, so only built when one arrives.
+        if getattr(self, '_codes', None) is None:
+            self._codes = code_points(self.blob)
+        return self._codes
+
+    def matches(self, query):
+        # (tiers, ids) of every name containing the query, one entry per name.
+        if len(query) >= 3:
+            ids = [i for i in self.candidates(query).tolist() if query in self.normalized[i]]
+            tiers = [self.tier(self.normalized[i], query) for i in ids]
+            return np.array(tiers, dtype=np.int8), np.array(ids, dtype=np.int64)
+        codes = self.codes
+        wanted = code_points(query)
+        end = len(codes) - len(wanted) + 1
+        if end <= 0:
+            return np.array([], dtype=np.int8), np.array([], dtype=np.int64)
+        hit = codes[:end] == wanted[0]
+        for offset in range(1, len(wanted)):
+            hit &= codes[offset:end + offset] == wanted[offset]
+        positions = np.flatnonzero(hit)
+        ids = np.searchsorted(self.starts, positions, side='right') - 1
+        after_space = codes[np.maximum(positions - 1, 0)] == ord(' ')
+        tiers = np.where(positions == self.starts[ids], 0, np.where(after_space, 1, 2)).astype(np.int8)
+        order = np.lexsort((tiers, ids))
+        ids, tiers = ids[order], tiers[order]
+        first = np.ones(len(ids), dtype=bool)
+        first[1:] = ids[1:] != ids[:-1]
+        return tiers[first], ids[first]
+
+    def ranked(self, query, best_tier=2):
+        query = normalize(query)
+        # No stored name holds SEPARATOR; build() replaced it with a space.
+        if not query or SEPARATOR in query or not self.names:
+            return np.array([], dtype=np.int64)
+        tiers, ids = self.matches(query)
+        keep = tiers <= best_tier
+        tiers, ids = tiers[keep], ids[keep]
+        return ids[np.lexsort((ids, tiers))]
+
+    def search(self, query, limit=None):
+        return [self.names[i] for i in self.ranked(query)[:limit].tolist()]
+
+    def suggest(self, prefix, limit=5):
+        # Type-ahead: names where the typed text starts the name or one of
+        # its words.
+        return [self.names[i] for i in self.ranked(prefix, best_tier=1)[:limit].tolist()]
+
+def ranked_names(name, path):
+    if name == 'patients':
+        # Several patients can share a name; the dashboard ranks the name by
+        # its combined average gap.
+        gaps = pd.read_csv(path, usecols=['patient_name', 'gap_days_total', 'gap_count'])
+        totals = gaps.groupby('patient_name')[['gap_days_total', 'gap_count']].sum()
+        totals = totals[totals['gap_count'] > 0]
+        average = (totals['gap_days_total'] / totals['gap_count']).rename('average').reset_index()
+        return average.sort_values(['average', 'patient_name'], ascending=[False, True])['patient_name']
+    # The doctor and facility summaries are written already ranked.
+    return pd.read_csv(path).iloc[:, 0]
+
+def index_path(name, output_dir=processed_dir):
+    return Path(output_dir) / index_dirname / f'{name}.npz'
+
+def build_name_indexes(output_dir=processed_dir):
+    output_dir = Path(output_dir)
+    for name, source in INDEX_SOURCES.items():
+        path = output_dir / source
+        if not path.exists():
+            continue
+        index = NameIndex.build(ranked_names(name, path).dropna())
+        index.save(index_path(name, output_dir))
+        print(f"Name index {name}: {len(index)} names, {len(index.gram_keys)} trigrams.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Build the dashboard name search indexes from the summary tables.')
+    parser.add_argument('--output-dir', type=Path, default=processed_dir)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    build_name_indexes(args.output_dir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+base_dir = Path(__file__).parent.parent
+processed_dir = base_dir / 'data' / 'processed'
+
+appointments_input = 'appointments_data_cleaned.csv'
+patients_input = 'patients_data_cleaned.csv'
+timeline_name = 'patient_timeline.npz'
+
+# Appointment columns kept per encounter, as (source column, display name).
+TEXT_COLUMNS = {'NAME': 'Doctor', 'ENCOUNTERCLASS': 'Encounter Class', 'DESCRIPTION': 'Description'}
+COST_COLUMNS = {
+    'BASE_ENCOUNTER_COST': 'Base Encounter Cost',
+    'TOTAL_CLAIM_COST': 'Total Claim Cost',
+    'PAYER_COVERAGE': 'Payer Coverage',
+}
+COLUMNS = ['patient_id', 'START', 'STOP', *TEXT_COLUMNS, *COST_COLUMNS]
+COLUMN_TYPES = {
+    'patient_id': pa.dictionary(pa.int32(), pa.string()),
+    'START': pa.timestamp('s', tz='UTC'),
+    'STOP': pa.timestamp('s', tz='UTC'),
+    **{column: pa.dictionary(pa.int32(), pa.string()) for column in TEXT_COLUMNS},
+    **{column: pa.float64() for column in COST_COLUMNS},
+}
+SECONDS_PER_DAY = 86400
+
+def encode(values):
+    return pd.Series(values, dtype=object).astype(str).str.encode('utf-8').to_numpy().astype(bytes)
+
+def decode(values):
+    return [value.decode('utf-8') for value in values.tolist()]
+
+def dictionary(values):
+    # Sorted UTF-8 uniques and each row's position in them; -1 for nulls.
+    categorical = pd.Categorical(values)
+    uniques = encode(categorical.categories)
+    order = np.argsort(uniques, kind='stable')
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    codes = np.asarray(categorical.codes, dtype=np.int32)
+    return uniques[order], np.where(codes >= 0, rank[np.maximum(codes, 0)], -1).astype(np.int32)
+
+def recode(values, old_values, codes):
+    # Codes into old_values as codes into values, a sorted superset.
+    if not len(old_values):
+        return np.full(len(codes), -1, dtype=np.int32)
+    positions = np.searchsorted(values, old_values)
+    return np.where(codes >= 0, positions[np.maximum(codes, 0)], -1).astype(np.int32)
+
+def seconds(values):
+    times = pd.to_datetime(pd.Series(values), utc=True)
+    return times.to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+def timestamps(values):
+    return pd.to_datetime(values, unit='s', utc=True)
+
+class PatientTimeline:
+    """Every appointment sorted by (patient_id, START), with each patient's
+    rows at offsets[i]:offsets[i + 1] for patient_ids[i].
+
+    A patient's encounters are one binary search and a slice away, and the
+    gap statistics for every patient come from one pass over the arrays.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def from_rows(cls, patient_ids, patient_codes, start, stop, texts, costs):
+        keep = patient_codes >= 0
+        order = np.lexsort((start[keep], patient_codes[keep]))
+        rows = np.flatnonzero(keep)[order]
+        counts = np.bincount(patient_codes[rows], minlength=len(patient_ids))
+        data = {
+            'patient_ids': patient_ids[counts > 0],
+            'offsets': np.concatenate([[0], np.cumsum(counts[counts > 0])]).astype(np.int64),
+            'start': start[rows],
+            'stop': stop[rows],
+        }
+        for column, (values, codes) in texts.items():
+            data[f'{column}_values'] = values
+            data[f'{column}_codes'] = codes[rows]
+        for column, values in costs.items():
+            data[column] = values[rows]
+        return cls(data)
+
+    @classmethod
+    def build(cls, appointments):
+        patient_ids, patient_codes = dictionary(appointments['patient_id'])
+        return cls.from_rows(
+            patient_ids, patient_codes, seconds(appointments['START']), seconds(appointments['STOP']),
+            {column: dictionary(appointments[column]) for column in TEXT_COLUMNS},
+            {column: pd.to_numeric(appointments[column]).to_numpy(dtype=np.float64) for column in COST_COLUMNS},
+        )
+
+    def extend(self, appointments):
+        # Same result as rebuilding from every row, without reparsing the rows
+        # already indexed: new rows follow the old ones, so ties on START keep
+        # file order either way.
+        new = PatientTimeline.build(appointments)
+        patient_ids = np.union1d(self.data['patient_ids'], new.data['patient_ids'])
+        patient_codes = np.concatenate([
+            recode(patient_ids, timeline.data['patient_ids'], timeline.patient_rows()) for timeline in (self, new)
+        ])
+        texts = {}
+        for column in TEXT_COLUMNS:
+            values = np.union1d(self.data[f'{column}_values'], new.data[f'{column}_values'])
+            texts[column] = values, np.concatenate([
+                recode(values, timeline.data[f'{column}_values'], timeline.data[f'{column}_codes'])
+                for timeline in (self, new)
+            ])
+        return PatientTimeline.from_rows(
+            patient_ids, patient_codes,
+            np.concatenate([self.data['start'], new.data['start']]),
+            np.concatenate([self.data['stop'], new.data['stop']]),
+            texts,
+            {column: np.concatenate([self.data[column], new.data[column]]) for column in COST_COLUMNS},
+        )
+
+    def with_names(self, patients):
+        # Patient names for the dashboard drill-down, which starts from a name.
+        names = patients.drop_duplicates('patient_id').set_index('patient_id')['patient_name']
+        names = encode(names.reindex(decode(self.data['patient_ids'])).fillna(''))
+        order = np.argsort(names, kind='stable')
+        self.data['sorted_names'] = names[order]
+        self.data['name_positions'] = order.astype(np.int64)
+        return self
+
+    def save(self, path):
+        path = Path(path)
+        tmp_path = path.with_name(path.stem + '.tmp.npz')
+        np.savez(tmp_path, **self.data)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def __len__(self):
+        return len(self.data['patient_ids'])
+
+    def patient_rows(self):
+        # Each row's patient position.
+        return np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.data['offsets']))
+
+    def position(self, patient_id):
+        patient_ids = self.data['patient_ids']
+        key = str(patient_id).encode('utf-8')
+        i = np.searchsorted(patient_ids, key)
+        return int(i) if i < len(patient_ids) and patient_ids[i] == key else None
+
+    def patients_named(self, name):
+        # Several patients can share a name.
+        names = self.data['sorted_names']
+        key = str(name).encode('utf-8')
+        lo, hi = np.searchsorted(names, key, side='left'), np.searchsorted(names, key, side='right')
+        return decode(self.data['patient_ids'][np.sort(self.data['name_positions'][lo:hi])])
+
+    def encounters(self, patient_id):
+        i = self.position(patient_id)
+        lo, hi = (self.data['offsets'][i], self.data['offsets'][i + 1]) if i is not None else (0, 0)
+        start = self.data['start'][lo:hi]
+        stop = self.data['stop'][lo:hi]
+        gaps = pd.array(np.floor_divide(start, SECONDS_PER_DAY) - np.floor_divide(np.roll(stop, 1), SECONDS_PER_DAY),
+                        dtype='Int64')
+        gaps[:1] = pd.NA
+        frame = {'Start': timestamps(start), 'Stop': timestamps(stop)}
+        for column, label in TEXT_COLUMNS.items():
+            values = self.data[f'{column}_values']
+            frame[label] = [values[code].decode('utf-8') if code >= 0 else None
+                            for code in self.data[f'{column}_codes'][lo:hi].tolist()]
+        for column, label in COST_COLUMNS.items():
+            frame[label] = self.data[column][lo:hi]
+        frame['Days Since Previous'] = gaps
+        return pd.DataFrame(frame)
+
+    def gap_stats(self):
+        # Days between each visit's START date and the previous visit's STOP
+        # date for the same patient, summed per patient in one pass; the same
+        # totals as the dashboard's LAG window.
+        offsets = self.data['offsets']
+        start_days = np.floor_divide(self.data['start'], SECONDS_PER_DAY)
+        stop_days = np.floor_divide(self.data['stop'], SECONDS_PER_DAY)
+        gaps = np.zeros(len(start_days), dtype=np.int64)
+        gaps[1:] = start_days[1:] - stop_days[:-1]
+        gaps[offsets[:-1]] = 0
+        last = offsets[1:] - 1
+        return pd.DataFrame({
+            'patient_id': decode(self.data['patient_ids']),
+            'gap_days_total': np.add.reduceat(gaps, offsets[:-1]) if len(self) else np.array([], dtype=np.int64),
+            'gap_count': np.diff(offsets) - 1,
+            'last_start': timestamps(self.data['start'][last]),
+            'last_stop': timestamps(self.data['stop'][last]),
+        })
+
+def timeline_path(output_dir=processed_dir):
+    return Path(output_dir) / timeline_name
+
+def read_appointments(path):
+    # Parsed by Arrow straight into dictionary-encoded text and timestamps:
+    # about a quarter of the time and half the memory of the pandas parser.
+    options = pacsv.ConvertOptions(include_columns=COLUMNS, column_types=COLUMN_TYPES)
+    return pacsv.read_csv(path, convert_options=options).to_pandas()
+
+def build_timeline(output_dir=processed_dir):
+    output_dir = Path(output_dir)
+    timeline = PatientTimeline.build(read_appointments(output_dir / appointments_input))
+    timeline.with_names(pd.read_csv(output_dir / patients_input, usecols=['patient_id', 'patient_name']))
+    timeline.save(timeline_path(output_dir))
+    return timeline
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Build the per-patient appointment timeline from data/processed.')
+    parser.add_argument('--output-dir', type=Path, default=processed_dir)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    timeline = build_timeline(args.output_dir)
+    print(f"Patient timeline: {len(timeline)} patients, {len(timeline.data['start'])} appointments.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from scripts.query_metrics import query_fingerprint
+
+class Prefetch:
+    """Runs a batch of queries in the background and stores them in a QueryCache.
+
+    Nothing here touches Streamlit, so it is safe off the script thread. The
+    batch gets its own pool of at most `max_workers` threads, which is the
+    per-session bound; the threads exit once the batch is done.
+    """
+
+    def __init__(self, backend, cache, queries, max_workers=3, metrics=None):
+        self.backend = backend
+        self.cache = cache
+        self.metrics = metrics
+        self.cancelled = threading.Event()
+        self.futures = {}
+        pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='prefetch')
+        for query, params in queries:
+            key = cache.make_key(query, params)
+            if key not in self.futures:
+                self.futures[key] = pool.submit(self._run, key, query, params)
+        pool.shutdown(wait=False)
+
+    def _run(self, key, query, params):
+        if self.cancelled.is_set() or self.cache.contains(key):
+            return
+        started = time.perf_counter()
+        entry = {'view': 'prefetch', 'query_hash': query_fingerprint(query), 'query': ' '.join(query.split())[:200],
+                 'cache_hit': False}
+        try:
+            result, stats = self.backend.execute(query, params)
+            entry.update(stats, rows=len(result))
+        except Exception as e:
+            entry['error'] = str(e)
+            logging.warning(f"Prefetch failed for {query[:100]}...: {str(e)}")
+            return
+        finally:
+            if self.metrics is not None:
+                self.metrics.record(wall_ms=round((time.perf_counter() - started) * 1000, 1), **entry)
+        if not self.cancelled.is_set():
+            self.cache.put(key, result)
+
+    def wait(self, key, timeout=None):
+        # Lets a foreground query that is already being prefetched wait for
+        # that result instead of sending the same query again.
+        future = self.futures.get(key)
+        if future is None or future.cancelled():
+            return
+        try:
+            future.result(timeout)
+        except Exception:
+            pass
+
+    def cancel(self):
+        self.cancelled.set()
+        for future in self.futures.values():
+            future.cancel()
+
+    def done(self):
+        return all(future.done() for future in self.futures.values())
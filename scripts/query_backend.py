@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+base_dir = Path(__file__).parent.parent
+processed_dir = base_dir / 'data' / 'processed'
+
+dataset_id = 'healthcare_analytics'
+local_tables = {
+    'patients_data': 'patients_data_cleaned',
+    'appointments_data': 'appointments_data_cleaned',
+    'cms_data': 'cms_data_cleaned',
+    'doctor_appointment_volume': 'doctor_appointment_volume',
+    'patient_appointment_gaps': 'patient_appointment_gaps',
+    'facility_readmissions': 'facility_readmissions',
+}
+local_indexes = {
+    'appointments_data': ['patient_id, START', 'NAME'],
+    'patients_data': ['patient_id'],
+    'cms_data': ['`Facility Name`'],
+    'patient_appointment_gaps': ['patient_name'],
+}
+
+def __getattr__(name):
+    # The BigQuery client library is imported on first use, so the local
+    # backend (and anything that only imports this module) doesn't load it.
+    if name == 'bigquery':
+        from google.cloud import bigquery
+        globals()[name] = bigquery
+        return bigquery
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def query_parameters(params):
+    from google.cloud import bigquery
+    types = {bool: 'BOOL', int: 'INT64', float: 'FLOAT64', str: 'STRING'}
+    return [
+        bigquery.ArrayQueryParameter(name, 'STRING', value) if isinstance(value, list)
+        else bigquery.ScalarQueryParameter(name, types[type(value)], value)
+        for name, value in (params or {}).items()
+    ]
+
+def sqlite_parameters(params):
+    # SQLite has no array parameters; lists are bound as JSON text and read
+    # back with json_each().
+    return {name: json.dumps(value) if isinstance(value, list) else value for name, value in (params or {}).items()}
+
+class BigQueryBackend:
+    dialect = 'bigquery'
+
+    def __init__(self, client=None, storage_client=None, maximum_bytes_billed=None):
+        self._client = client
+        self._storage_client = storage_client
+        self.maximum_bytes_billed = maximum_bytes_billed
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Built on first query, not at import, so nothing needs credentials
+        # until BigQuery is actually used.
+        with self._lock:
+            if self._client is None:
+                from google.cloud import bigquery
+                self._client = bigquery.Client()
+            return self._client
+
+    @property
+    def storage_client(self):
+        # BigQuery Storage Read API client for large results; None (plain
+        # REST paging) if the library isn't installed.
+        with self._lock:
+            if self._storage_client is None:
+                try:
+                    from google.cloud import bigquery_storage
+                except ImportError:
+                    return None
+                self._storage_client = bigquery_storage.BigQueryReadClient()
+            return self._storage_client
+
+    def job_config(self, params=None, **kwargs):
+        # Every query carries the bytes-billed cap, so a runaway query fails
+        # in BigQuery instead of being billed.
+        from google.cloud import bigquery
+        return bigquery.QueryJobConfig(
+            query_parameters=query_parameters(params),
+            maximum_bytes_billed=self.maximum_bytes_billed,
+            **kwargs
+        )
+
+    @staticmethod
+    def job_stats(job):
+        return {
+            'job_id': job.job_id,
+            'bytes_processed': job.total_bytes_processed,
+            'bytes_billed': job.total_bytes_billed,
+            'slot_ms': job.slot_millis,
+            'bigquery_cache_hit': job.cache_hit,
+        }
+
+    def execute(self, query, params=None):
+        job = self.client.query(query, job_config=self.job_config(params))
+        result = job.to_dataframe()
+        return result, self.job_stats(job)
+
+    def run(self, query, params=None):
+        return self.execute(query, params)[0]
+
+    def dry_run(self, query, params=None):
+        job = self.client.query(query, job_config=self.job_config(params, dry_run=True, use_query_cache=False))
+        return job.total_bytes_processed
+
+    def iter_batches(self, query, params=None, batch_size=10_000, stats=None):
+        # Arrow record batches, streamed over the Storage Read API when the
+        # result is large enough to be worth it, so no caller has to hold the
+        # whole result as a DataFrame. The finished job's stats go into
+        # `stats` before the first batch.
+        job = self.client.query(query, job_config=self.job_config(params))
+        rows = job.result(page_size=batch_size)
+        if stats is not None:
+            stats.update(self.job_stats(job))
+        yield from rows.to_arrow_iterable(bqstorage_client=self.storage_client)
+
+    def has_table(self, table_name):
+        from google.api_core.exceptions import NotFound
+        try:
+            self.client.get_table(f'{dataset_id}.{table_name}')
+        except NotFound:
+            return False
+        return True
+
+def strpos(value, substring):
+    if value is None or substring is None:
+        return None
+    return str(value).find(substring) + 1
+
+class SQLiteBackend:
+    """In-process SQLite copy of data/processed that answers the dashboard's SQL.
+
+    Tables are registered under their BigQuery names (`healthcare_analytics.cms_data`
+    is one quoted identifier here), so the backtick-quoted table references in
+    the dashboard queries resolve unchanged.
+    """
+    dialect = 'sqlite'
+
+    def __init__(self, data_dir=processed_dir):
+        self.data_dir = Path(data_dir)
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.conn.create_function('STRPOS', 2, strpos, deterministic=True)
+        self._lock = threading.Lock()
+        for table_name, stem in local_tables.items():
+            self.load_table(table_name, stem)
+        self._create_information_schema()
+
+    def load_table(self, table_name, stem):
+        parquet_path = self.data_dir / f'{stem}.parquet'
+        csv_path = self.data_dir / f'{stem}.csv'
+        if parquet_path.exists():
+            df = pd.read_parquet(parquet_path)
+        elif csv_path.exists():
+            df = pd.read_csv(csv_path)
+        else:
+            logging.warning(f"No processed file for {table_name} in {self.data_dir}")
+            return
+        # Categoricals and tz-aware timestamps go in as plain text; ISO
+        # timestamps still sort and parse with SQLite's date functions.
+        for column in df.columns:
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype(object)
+            elif isinstance(df[column].dtype, pd.DatetimeTZDtype):
+                df[column] = df[column].dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+        name = f'{dataset_id}.{table_name}'
+        df.to_sql(name, self.conn, index=False, if_exists='replace')
+        for i, columns in enumerate(local_indexes.get(table_name, [])):
+            self.conn.execute(f'CREATE INDEX "{table_name}_idx_{i}" ON "{name}" ({columns})')
+        logging.info(f"Loaded {len(df)} rows into local table {name}")
+
+    def _create_information_schema(self):
+        prefix = f'{dataset_id}.'
+        self.conn.execute(f"""
+            CREATE VIEW "{dataset_id}.INFORMATION_SCHEMA.TABLES" AS
+            SELECT substr(name, {len(prefix) + 1}) AS table_name, 'BASE TABLE' AS table_type
+            FROM sqlite_master
+            WHERE type = 'table' AND name LIKE '{prefix}%'
+        """)
+        self.conn.execute(f"""
+            CREATE VIEW "{dataset_id}.INFORMATION_SCHEMA.COLUMNS" AS
+            SELECT substr(m.name, {len(prefix) + 1}) AS table_name,
+                   p.name AS column_name,
+                   p.type AS data_type,
+                   CASE p."notnull" WHEN 1 THEN 'NO' ELSE 'YES' END AS is_nullable
+            FROM sqlite_master m
+            JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table' AND m.name LIKE '{prefix}%'
+        """)
+
+    def run(self, query, params=None):
+        with self._lock:
+            return pd.read_sql_query(query, self.conn, params=sqlite_parameters(params) or None)
+
+    def execute(self, query, params=None):
+        # Nothing is billed locally; only the timings around this call apply.
+        return self.run(query, params), {}
+
+    def dry_run(self, query, params=None):
+        return None
+
+    def iter_batches(self, query, params=None, batch_size=10_000, stats=None):
+        # Nothing is billed locally, so `stats` stays empty. The connection is
+        # shared, so it stays locked until the last batch is read or the
+        # generator is closed.
+        with self._lock:
+            cursor = self.conn.execute(query, sqlite_parameters(params))
+            columns = [column[0] for column in cursor.description]
+            first = True
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows and not first:
+                    break
+                first = False
+                df = pd.DataFrame.from_records(rows, columns=columns)
+                yield pa.RecordBatch.from_pandas(df, preserve_index=False)
+                if len(rows) < batch_size:
+                    break
+
+    def has_table(self, table_name):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f'{dataset_id}.{table_name}',)
+            ).fetchone()
+        return row is not None
+
+def create_backend(name=None, data_dir=None):
+    name = (name or os.environ.get('DASHBOARD_QUERY_BACKEND', 'bigquery')).lower()
+    if name == 'bigquery':
+        maximum_bytes_billed = os.environ.get('BIGQUERY_MAXIMUM_BYTES_BILLED')
+        return BigQueryBackend(maximum_bytes_billed=int(maximum_bytes_billed) if maximum_bytes_billed else None)
+    if name in ('local', 'sqlite'):
+        return SQLiteBackend(data_dir or os.environ.get('LOCAL_DATA_DIR', processed_dir))
+    raise ValueError(f"Unknown query backend: {name}")
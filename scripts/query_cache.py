@@ -0,0 +1,126 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+base_dir = Path(__file__).parent.parent
+upload_marker_path = base_dir / 'data' / 'processed' / '.last_upload'
+
+def mark_upload_finished(path=None):
+    # Touched by bigquery_upload.py after a successful upload; every
+    # QueryCache watching the same path drops its entries on the next read.
+    path = Path(path or upload_marker_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(str(time.time()))
+
+# String literals, quoted identifiers and comments (with the newline ending a
+# line comment): the parts of a query whose whitespace is significant.
+VERBATIM_SQL = re.compile('(' + '|'.join([
+    r"'''.*?'''", r'""".*?"""', r"'(?:\\.|[^'\\])*'", r'"(?:\\.|[^"\\])*"', r'`[^`]*`',
+    r'--[^\n]*\n?', r'#[^\n]*\n?', r'/\*.*?\*/',
+]) + ')', re.S)
+
+def normalize_sql(query):
+    # Runs of whitespace become one space everywhere except inside
+    # VERBATIM_SQL matches, which are kept as written.
+    parts = VERBATIM_SQL.split(query)
+    parts[::2] = [re.sub(r'\s+', ' ', part) for part in parts[::2]]
+    return ''.join(parts).strip()
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+class QueryCache:
+    """Process-wide LRU of query results, bounded by age and total bytes."""
+
+    def __init__(self, ttl=300, max_bytes=256 * 1024 * 1024, marker_path=None, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.marker_path = Path(marker_path or upload_marker_path)
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._marker_mtime = self._read_marker()
+
+    @staticmethod
+    def make_key(query, params=None):
+        # Whitespace outside literals and parameter order don't change the
+        # result, so they don't change the key either.
+        return normalize_sql(query), json.dumps(params or {}, sort_keys=True, default=str)
+
+    def _read_marker(self):
+        try:
+            return os.stat(self.marker_path).st_mtime
+        except OSError:
+            return None
+
+    def _check_marker(self):
+        mtime = self._read_marker()
+        if mtime != self._marker_mtime:
+            self._marker_mtime = mtime
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            self._check_marker()
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Callers reindex and filter what they get back; a shallow copy
+            # keeps that from leaking into the cached frame.
+            return entry[2].copy(deep=False)
+
+    def contains(self, key):
+        # Like get, but without touching the counters or the LRU order.
+        with self._lock:
+            self._check_marker()
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > self.clock()
+
+    def put(self, key, df):
+        nbytes = frame_nbytes(df)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (self.clock() + self.ttl, nbytes, df)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self.total_bytes -= nbytes
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+            }
@@ -0,0 +1,66 @@
+from contextlib import closing
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+EXPORT_FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+def preview_batches(batches, limit):
+    # First `limit` rows as a DataFrame, and whether the result had more.
+    # Only the batches needed for the preview are read.
+    taken = []
+    rows = 0
+    truncated = False
+    with closing(iter(batches)) as batches:
+        for batch in batches:
+            if rows + batch.num_rows > limit:
+                taken.append(batch.slice(0, limit - rows))
+                truncated = True
+                break
+            taken.append(batch)
+            rows += batch.num_rows
+            if rows == limit:
+                truncated = any(batch.num_rows for batch in batches)
+                break
+    if not taken:
+        return pa.table({}).to_pandas(), False
+    return pa.Table.from_batches(taken).to_pandas(), truncated
+
+def write_batches(batches, path, export_format='CSV'):
+    # Writes one batch at a time, so memory is bounded by the batch size,
+    # not the result size.
+    rows = 0
+    parquet_writer = None
+    with closing(iter(batches)) as batches, open(path, 'wb') as sink:
+        for i, batch in enumerate(batches):
+            if export_format == 'CSV':
+                pacsv.write_csv(batch, sink, pacsv.WriteOptions(include_header=i == 0))
+            else:
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(sink, batch.schema, compression='zstd')
+                elif batch.schema != parquet_writer.schema:
+                    batch = batch.cast(parquet_writer.schema)
+                parquet_writer.write_batch(batch)
+            rows += batch.num_rows
+        if parquet_writer is not None:
+            parquet_writer.close()
+    return rows
+
+def export_query(backend, query, export_format='CSV', params=None, export_dir=None, batch_size=10_000, stats=None):
+    # Runs the query again and streams the whole result to a temporary file,
+    # which the caller removes once read. `stats` receives the job's stats.
+    suffix, _ = EXPORT_FORMATS[export_format]
+    with tempfile.NamedTemporaryFile(suffix=suffix, prefix='query_results_', dir=export_dir, delete=False) as f:
+        path = Path(f.name)
+    try:
+        rows = write_batches(backend.iter_batches(query, params, batch_size, stats), path, export_format)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path, rows
@@ -0,0 +1,58 @@
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import pandas as pd
+
+base_dir = Path(__file__).parent.parent
+metrics_path = base_dir / 'data' / 'metrics' / 'query_metrics.jsonl'
+
+def query_fingerprint(query):
+    return hashlib.sha1(' '.join(query.split()).encode('utf-8')).hexdigest()[:12]
+
+class QueryMetrics:
+    """Append-only JSONL log with one record per query: timings, cache use and cost."""
+
+    def __init__(self, path=None):
+        self.path = Path(path or metrics_path)
+        self._lock = threading.Lock()
+
+    def record(self, **fields):
+        entry = {'timestamp': time.time(), **fields}
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+        return entry
+
+    def read(self, limit=None):
+        # The most recent `limit` records (all of them by default).
+        if not self.path.exists():
+            return pd.DataFrame()
+        with self._lock, open(self.path, 'r') as f:
+            lines = deque(f, maxlen=limit) if limit else list(f)
+        return pd.DataFrame([json.loads(line) for line in lines])
+
+def summarize(records):
+    # Per-view totals, most expensive first.
+    if records.empty:
+        return records
+    records = records.copy()
+    for column in ('wall_ms', 'bytes_processed', 'bytes_billed', 'slot_ms'):
+        records[column] = pd.to_numeric(records[column], errors='coerce') if column in records else float('nan')
+    records['cache_hit'] = records['cache_hit'].fillna(False).astype(bool) if 'cache_hit' in records else False
+    grouped = records.groupby('view')
+    summary = pd.DataFrame({
+        'queries': grouped.size(),
+        'cache_hit_rate': grouped['cache_hit'].mean(),
+        'mean_wall_ms': grouped['wall_ms'].mean(),
+        'p95_wall_ms': grouped['wall_ms'].quantile(0.95),
+        'bytes_processed': grouped['bytes_processed'].sum(),
+        'bytes_billed': grouped['bytes_billed'].sum(),
+        'slot_ms': grouped['slot_ms'].sum(),
+    })
+    return summary.sort_values(['bytes_billed', 'mean_wall_ms'], ascending=False)
@@ -1,22 +1,52 @@
 import os
+import sys
+from pathlib import Path
 import streamlit as st
-from google.cloud import bigquery
 import pandas as pd
-import matplotlib.pyplot as plt
-from streamlit_lottie import st_lottie
 import json
 import logging
+import time
+
+sys.path.append(str(Path(__file__).parent.parent))
+from scripts.name_index import NameIndex, index_path
+from scripts.patient_timeline import PatientTimeline, timeline_path
+from scripts.prefetch import Prefetch
+from scripts.query_backend import create_backend
+from scripts.query_cache import QueryCache
+from scripts.query_export import EXPORT_FORMATS, export_query, preview_batches
+from scripts.query_metrics import QueryMetrics, query_fingerprint, summarize
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logging.info("Healthcare Analytics Dashboard started successfully!")
 
-client = bigquery.Client()
+base_dir = Path(__file__).parent.parent
+lottie_path = Path(os.environ.get("LOTTIE_ANIMATION_PATH", base_dir / "data" / "animation.json"))
+
+ADMIN_PREVIEW_ROWS = int(os.environ.get("ADMIN_PREVIEW_ROWS", 1000))
+# Admin queries whose dry run exceeds this are not run. Defaults to the
+# BigQuery bytes-billed cap, which BigQuery enforces on every query anyway.
+ADMIN_MAX_QUERY_BYTES = int(
+    os.environ.get("ADMIN_MAX_QUERY_BYTES") or os.environ.get("BIGQUERY_MAXIMUM_BYTES_BILLED") or 0
+)
+# Exports up to this size are served through the download button, which holds
+# the whole file in memory; larger ones stay on disk under ADMIN_EXPORT_DIR.
+ADMIN_EXPORT_MAX_INLINE_MB = int(os.environ.get("ADMIN_EXPORT_MAX_INLINE_MB", 50))
+QUERY_METRICS_WINDOW = int(os.environ.get("QUERY_METRICS_WINDOW", 5000))
+# The search indexes and patient timeline are read from the local processed
+# data even when the queries go to BigQuery.
+processed_data_dir = Path(os.environ.get("LOCAL_DATA_DIR", base_dir / "data" / "processed"))
+# Searches matching more names than this are left to STRPOS in the query
+# rather than sent as a list of names.
+SEARCH_INDEX_MAX_NAMES = int(os.environ.get("SEARCH_INDEX_MAX_NAMES", 10000))
 
 dataset_id = 'healthcare_analytics'
 patients_data_table = 'patients_data'
 appointments_data_table = 'appointments_data'
 cms_data_table = 'cms_data'
+doctor_volume_table = 'doctor_appointment_volume'
+patient_gaps_table = 'patient_appointment_gaps'
+facility_readmissions_table = 'facility_readmissions'
 
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
@@ -40,25 +70,133 @@ def load_lottie(filepath):
         logging.error(f"Error loading Lottie animation: {str(e)}")
         return None
 
-def run_query(query):
+def __getattr__(name):
+    # matplotlib, the BigQuery client library and streamlit_lottie are only
+    # needed by some views, so they are imported when first used instead of
+    # on every cold start. The old module attributes still resolve.
+    if name == "plt":
+        import matplotlib.pyplot as value
+    elif name == "bigquery":
+        from google.cloud import bigquery as value
+    elif name == "st_lottie":
+        from streamlit_lottie import st_lottie as value
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+@st.cache_resource(show_spinner=False)
+def get_lottie_animation(filepath):
+    # Read from disk once per process, not on every rerun.
+    return load_lottie(filepath)
+
+def show_lottie(key):
+    animation = get_lottie_animation(str(lottie_path))
+    if animation:
+        from streamlit_lottie import st_lottie
+        st_lottie(animation, height=200, key=key)
+
+@st.cache_resource
+def get_query_cache():
+    # One cache for every session in this process, so a result fetched by
+    # one user's rerun is served to everyone until it expires or an upload
+    # finishes.
+    return QueryCache(
+        ttl=int(os.environ.get("QUERY_CACHE_TTL_SECONDS", 300)),
+        max_bytes=int(os.environ.get("QUERY_CACHE_MAX_MB", 256)) * 1024 * 1024,
+        # Must be the same file the uploader touches, e.g. on a shared volume
+        # when the dashboard runs on another machine.
+        marker_path=os.environ.get("QUERY_CACHE_UPLOAD_MARKER"),
+    )
+
+@st.cache_resource
+def get_query_metrics():
+    return QueryMetrics(os.environ.get("QUERY_METRICS_PATH"))
+
+@st.cache_resource
+def get_chart_cache():
+    # Rendered PNGs keyed by chart type and a hash of the plotted rows, shared
+    # across sessions like the query cache.
+    from scripts.charts import ChartCache
+    return ChartCache(max_bytes=int(os.environ.get("CHART_CACHE_MAX_MB", 64)) * 1024 * 1024)
+
+@st.cache_resource(show_spinner=False)
+def load_name_index(path, mtime):
+    # Keyed on the file's mtime, so a rebuilt index replaces the old one.
+    return NameIndex.load(path)
+
+@st.cache_resource(show_spinner=False)
+def load_patient_timeline(path, mtime):
+    return PatientTimeline.load(path)
+
+def load_local_file(loader, path):
+    # None until the file has been built, so callers fall back to queries.
     try:
+        return loader(str(path), path.stat().st_mtime)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Could not load {path}: {str(e)}")
+        return None
+
+def get_name_index(name):
+    return load_local_file(load_name_index, index_path(name, processed_data_dir))
+
+def get_patient_timeline():
+    return load_local_file(load_patient_timeline, timeline_path(processed_data_dir))
+
+def show_chart(kind, data, x, y=None, **options):
+    st.image(get_chart_cache().chart(kind, data, x, y, **options))
+
+@st.cache_resource
+def get_backend():
+    # BigQuery by default; DASHBOARD_QUERY_BACKEND=local serves the same
+    # analyses from an in-process SQLite copy of data/processed.
+    backend = create_backend()
+    logging.info(f"Using {backend.dialect} query backend")
+    return backend
+
+def run_query(query, params=None, use_cache=True, view="other"):
+    # Every call is logged to the metrics file with its timing, whether the
+    # cache answered it and, for BigQuery jobs, bytes and slot time. `view`
+    # names the dashboard section so costs can be compared per view.
+    started = time.perf_counter()
+    metrics = {"view": view, "query_hash": query_fingerprint(query), "query": " ".join(query.split())[:200],
+               "cache_hit": False}
+    try:
+        cache = get_query_cache()
+        key = cache.make_key(query, params)
+        if use_cache:
+            prefetch = st.session_state.get("prefetch")
+            if prefetch is not None:
+                prefetch.wait(key)
+            cached = cache.get(key)
+            if cached is not None:
+                logging.info(f"Query cache hit: {query[:100]}...")
+                metrics.update(cache_hit=True, rows=len(cached))
+                return cached
         logging.info(f"Executing query: {query[:100]}...") 
-        result = client.query(query).to_dataframe()
+        result, stats = get_backend().execute(query, params)
+        metrics.update(stats, rows=len(result))
         logging.info(f"Query executed successfully, returned {len(result)} rows")
+        if use_cache:
+            cache.put(key, result)
         return result
     except Exception as e:
+        metrics["error"] = str(e)
         logging.error(f"Error executing query: {str(e)}")
         st.error(f"Error executing query: {str(e)}")
         return pd.DataFrame()
+    finally:
+        metrics["wall_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        get_query_metrics().record(**metrics)
 
 def login_page():
     logging.info("Rendering login page")
     st.title("Healthcare Analytics Dashboard - Login")
     st.markdown("---")
     
-    lottie_animation = load_lottie(r"E:\healthcare_analytics\data\animation.json")
-    if lottie_animation:
-        st_lottie(lottie_animation, height=200, key="login")
+    show_lottie("login")
     
     st.subheader("User Login")
     if st.button("Login as User"):
@@ -82,6 +220,71 @@ def login_page():
             logging.warning("Incorrect admin password attempt")
             st.error("Incorrect admin password")
 
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{int(n)} B"
+        n /= 1024
+
+def estimate_query_bytes(query):
+    # BigQuery dry run: validates the SQL and reports the bytes it would
+    # scan without running it or billing anything. The local backend has no
+    # estimate.
+    try:
+        estimate = get_backend().dry_run(query)
+    except Exception as e:
+        logging.error(f"Dry run failed: {str(e)}")
+        st.error(f"Dry run failed: {str(e)}")
+        return False
+    if estimate is None:
+        st.info("No cost estimate for the local backend.")
+    else:
+        st.info(f"This query will process {format_bytes(estimate)}.")
+    return estimate
+
+def admin_query_allowed(estimate):
+    if estimate is False:
+        return False
+    if estimate is not None and ADMIN_MAX_QUERY_BYTES and estimate > ADMIN_MAX_QUERY_BYTES:
+        logging.warning(f"Admin query refused: {estimate} bytes over the {ADMIN_MAX_QUERY_BYTES} byte limit")
+        st.error(
+            f"Query would process {format_bytes(estimate)}, over the {format_bytes(ADMIN_MAX_QUERY_BYTES)} limit. "
+            "Narrow it down (fewer columns, a date filter) and try again."
+        )
+        return False
+    return True
+
+def run_admin_query(query, estimate=None):
+    # Logged like run_query, with the dry run's estimate next to the job's
+    # own bytes and slot time.
+    started = time.perf_counter()
+    metrics = {"view": "admin: custom query", "query_hash": query_fingerprint(query),
+               "query": " ".join(query.split())[:200], "cache_hit": False, "estimated_bytes": estimate}
+    with st.spinner("Executing query..."):
+        # Ad-hoc results can be far larger than anything worth
+        # rendering, so only a bounded preview is read here; the
+        # export below streams the full result to a file.
+        stats = {}
+        try:
+            result, truncated = preview_batches(get_backend().iter_batches(query, stats=stats), ADMIN_PREVIEW_ROWS)
+            st.session_state.admin_query = query
+        except Exception as e:
+            metrics["error"] = str(e)
+            logging.error(f"Error executing query: {str(e)}")
+            st.error(f"Error executing query: {str(e)}")
+            result, truncated = pd.DataFrame(), False
+        metrics.update(stats, rows=len(result), wall_ms=round((time.perf_counter() - started) * 1000, 1))
+        get_query_metrics().record(**metrics)
+        if not result.empty:
+            logging.info(f"Query preview has {len(result)} rows")
+            st.success("Query executed successfully!")
+            st.dataframe(result)
+            if truncated:
+                st.caption(f"Showing the first {ADMIN_PREVIEW_ROWS} rows. Export to get the full result.")
+        else:
+            logging.warning("Query executed but returned no results")
+            st.warning("Query executed but returned no results.")
+
 def admin_panel():
     logging.info("Rendering admin panel")
     st.title("Admin Panel")
@@ -90,29 +293,66 @@ def admin_panel():
     st.subheader("Execute Custom Query")
     query = st.text_area("Enter your SQL query:", height=200)
     
-    if st.button("Execute Query"):
-        logging.info("Execute Query button clicked")
+    estimate_clicked = st.button("Estimate Cost")
+    execute_clicked = st.button("Execute Query")
+    if estimate_clicked or execute_clicked:
+        logging.info("Execute Query button clicked" if execute_clicked else "Estimate Cost button clicked")
         if query.strip():
-            with st.spinner("Executing query..."):
-                result = run_query(query)
-                if not result.empty:
-                    logging.info(f"Query returned {len(result)} rows")
-                    st.success("Query executed successfully!")
-                    st.dataframe(result)
-                    
-                    csv = result.to_csv(index=False).encode('utf-8')
-                    st.download_button(
-                        label="Download as CSV",
-                        data=csv,
-                        file_name='query_results.csv',
-                        mime='text/csv'
-                    )
-                else:
-                    logging.warning("Query executed but returned no results")
-                    st.warning("Query executed but returned no results.")
+            estimate = estimate_query_bytes(query)
+            if execute_clicked and admin_query_allowed(estimate):
+                run_admin_query(query, estimate)
         else:
             logging.warning("Attempt to execute empty query")
             st.warning("Please enter a query to execute.")
+
+    if st.session_state.get("admin_query"):
+        export_format = st.radio("Export Format", list(EXPORT_FORMATS), horizontal=True)
+        st.caption("Exporting runs the query again to fetch the full result; on BigQuery it is billed again.")
+        if st.button("Export Full Result"):
+            logging.info(f"Exporting query result as {export_format}")
+            query = st.session_state.admin_query
+            started = time.perf_counter()
+            metrics = {"view": "admin: export", "query_hash": query_fingerprint(query),
+                       "query": " ".join(query.split())[:200], "cache_hit": False}
+            stats = {}
+            data = None
+            kept_path = None
+            with st.spinner("Exporting..."):
+                try:
+                    path, rows = export_query(get_backend(), query, export_format,
+                                              export_dir=os.environ.get("ADMIN_EXPORT_DIR"), stats=stats)
+                    size = path.stat().st_size
+                    if size > ADMIN_EXPORT_MAX_INLINE_MB * 1024 * 1024:
+                        kept_path = path
+                    else:
+                        # The download button keeps its own copy of the
+                        # bytes, so the file is removed as soon as they are read.
+                        try:
+                            data = path.read_bytes()
+                        finally:
+                            path.unlink(missing_ok=True)
+                    metrics.update(rows=rows, export_bytes=size)
+                except Exception as e:
+                    metrics["error"] = str(e)
+                    logging.error(f"Error exporting query: {str(e)}")
+                    st.error(f"Error exporting query: {str(e)}")
+            metrics.update(stats, wall_ms=round((time.perf_counter() - started) * 1000, 1))
+            get_query_metrics().record(**metrics)
+            if kept_path is not None:
+                st.write(f"Exported {rows} rows ({format_bytes(size)}).")
+                st.info(
+                    f"Too large to download through the browser (over {ADMIN_EXPORT_MAX_INLINE_MB} MB). "
+                    f"The file was kept on the server at `{kept_path}`."
+                )
+            if data is not None:
+                suffix, mime = EXPORT_FORMATS[export_format]
+                st.write(f"Exported {rows} rows.")
+                st.download_button(
+                    label=f"Download as {export_format}",
+                    data=data,
+                    file_name=f"query_results{suffix}",
+                    mime=mime
+                )
     
     st.markdown("---")
     st.subheader("Table Information")
@@ -127,7 +367,7 @@ def admin_panel():
                 WHERE table_type = 'BASE TABLE'
                 ORDER BY table_name
             """
-            tables_df = run_query(query)
+            tables_df = run_query(query, view="admin: tables")
             tables_dict = {name.replace('_', ' ').title(): f"{dataset_id}.{name}" 
                          for name in tables_df['table_name']}
             logging.info(f"Found {len(tables_dict)} tables")
@@ -146,7 +386,9 @@ def admin_panel():
     if st.button("Refresh Table List"):
         logging.info("Refresh Table List button clicked")
         st.cache_data.clear()
+        get_query_cache().invalidate()
         st.rerun()
+
     
     selected_table = st.selectbox("Select a table to view schema:", list(tables.keys()))
     logging.info(f"Selected table: {selected_table}")
@@ -156,9 +398,9 @@ def admin_panel():
         schema_query = f"""
             SELECT column_name, data_type, is_nullable
             FROM `{dataset_id}.INFORMATION_SCHEMA.COLUMNS`
-            WHERE table_name = '{tables[selected_table].split('.')[-1]}'
+            WHERE table_name = @table_name
         """
-        schema = run_query(schema_query)
+        schema = run_query(schema_query, {"table_name": tables[selected_table].split('.')[-1]}, view="admin: schema")
         if not schema.empty:
             st.dataframe(schema)
         else:
@@ -168,58 +410,267 @@ def admin_panel():
     if st.button("Preview Data"):
         logging.info(f"Previewing data for table: {selected_table}")
         preview_query = f"SELECT * FROM `{tables[selected_table]}` LIMIT 10"
-        preview_data = run_query(preview_query)
+        preview_data = run_query(preview_query, view="admin: preview")
         if not preview_data.empty:
             st.dataframe(preview_data)
         else:
             logging.warning(f"Could not retrieve data for table {selected_table}")
             st.warning(f"Could not retrieve data/The table '{selected_table}' exists but contains no data from {tables[selected_table]}")
 
+    st.markdown("---")
+    st.subheader("Query Cache")
+    cache_stats = get_query_cache().stats()
+    st.write(
+        f"Hits: {cache_stats['hits']} | Misses: {cache_stats['misses']} | "
+        f"Entries: {cache_stats['entries']} | Size: {cache_stats['bytes'] / (1024 * 1024):.1f} MB | "
+        f"Evictions: {cache_stats['evictions']}"
+    )
+    if st.button("Clear Query Cache"):
+        logging.info("Clear Query Cache button clicked")
+        get_query_cache().invalidate()
+        st.rerun()
+
+    st.markdown("---")
+    st.subheader("Query Metrics")
+    records = get_query_metrics().read(limit=QUERY_METRICS_WINDOW)
+    if records.empty:
+        st.write("No queries recorded yet.")
+    else:
+        st.write(f"Last {len(records)} queries by view, most expensive first:")
+        st.dataframe(summarize(records))
+        with st.expander("Recent Queries"):
+            st.dataframe(records.iloc[::-1].head(100), hide_index=True)
+
+PAGE_SIZE = 10
+
+def search_filter(name_column):
+    return f"(@search = '' OR STRPOS(LOWER(`{name_column}`), LOWER(@search)) > 0)"
+
+def name_filter(name_column, dialect):
+    # The names an index search matched, in place of scanning every name.
+    if dialect == "sqlite":
+        return f"`{name_column}` IN (SELECT value FROM json_each(@names))"
+    return f"`{name_column}` IN UNNEST(@names)"
+
+def search_params(name_column, search, names, dialect):
+    if names is None:
+        return search_filter(name_column), {"search": search}
+    return name_filter(name_column, dialect), {"names": names}
+
+def count_query(base_query, name_column, search, names=None, dialect="bigquery"):
+    where, params = search_params(name_column, search, names, dialect)
+    query = f"""
+        WITH results AS ({base_query})
+        SELECT COUNT(*) AS total
+        FROM results
+        WHERE {where}
+    """
+    return query, params
+
+def count_results(base_query, name_column, search, view="other", names=None):
+    df = run_query(*count_query(base_query, name_column, search, names, get_backend().dialect), view=view)
+    return int(df["total"].iloc[0]) if not df.empty else 0
+
+def page_query(base_query, name_column, metric_column, search, page_number, page_size=PAGE_SIZE, names=None,
+               dialect="bigquery"):
+    # Ranks are assigned over the whole aggregate before searching, so a
+    # filtered row keeps the position it has in the unfiltered list, and
+    # only the requested page is sent back.
+    where, params = search_params(name_column, search, names, dialect)
+    query = f"""
+        WITH results AS ({base_query}),
+        ranked AS (
+            SELECT *, ROW_NUMBER() OVER (ORDER BY `{metric_column}` DESC, `{name_column}`) AS `Rank`
+            FROM results
+        )
+        SELECT *
+        FROM ranked
+        WHERE {where}
+        ORDER BY `Rank`
+        LIMIT @limit OFFSET @offset
+    """
+    return query, {**params, "limit": page_size, "offset": (page_number - 1) * page_size}
+
+def fetch_page(base_query, name_column, metric_column, search, page_number, page_size=PAGE_SIZE, view="other",
+               names=None):
+    query, params = page_query(
+        base_query, name_column, metric_column, search, page_number, page_size, names, get_backend().dialect
+    )
+    df = run_query(query, params, view=view)
+    if "Rank" in df.columns:
+        df = df.set_index("Rank")
+        df.index.name = None
+    return df
+
+def paged_results(base_query, name_column, metric_column, search_label, view="other", search_index=None):
+    search_query = st.text_input(search_label, "")
+    names = None
+    if search_query:
+        logging.info(f"Searching for {name_column} containing: {search_query}")
+        if search_index is not None:
+            suggestions = search_index.suggest(search_query)
+            if suggestions:
+                st.caption("Suggestions: " + " · ".join(suggestions))
+            matches = search_index.search(search_query, SEARCH_INDEX_MAX_NAMES + 1)
+            if len(matches) <= SEARCH_INDEX_MAX_NAMES:
+                names = matches
+
+    total = count_results(base_query, name_column, search_query, view=view, names=names)
+    page_number = st.number_input("Page Number", min_value=1, max_value=(total // PAGE_SIZE) + 1, value=1)
+    logging.info(f"Displaying page {page_number} of results")
+    page = fetch_page(base_query, name_column, metric_column, search_query, page_number, view=view, names=names)
+    return page, lambda: fetch_page(base_query, name_column, metric_column, search_query, 1, view=view,
+                                    names=names)
+
+@st.cache_data(ttl=300)
+def summary_available(table_name):
+    # The summary tables are built by scripts/summarize.py and uploaded with
+    # the rest; until they exist the analyses aggregate the raw tables.
+    try:
+        return get_backend().has_table(table_name)
+    except Exception as e:
+        logging.warning(f"Could not check for summary table {table_name}: {str(e)}")
+        return False
+
+def doctor_volume_query():
+    if summary_available(doctor_volume_table):
+        return f"""
+            SELECT doctor_name AS `Doctor Name`, appointments_count AS `Appointments Count`
+            FROM `{dataset_id}.{doctor_volume_table}`
+        """
+    return f"""
+        SELECT NAME AS `Doctor Name`, COUNT(*) AS `Appointments Count`
+        FROM `{dataset_id}.{appointments_data_table}`
+        GROUP BY `Doctor Name`
+    """
+
+def raw_patient_gaps_query(dialect):
+    # START/STOP are TIMESTAMP columns in BigQuery, so they are compared and
+    # ordered as loaded and only truncated to dates for the day count. The
+    # local SQLite copy keeps them as ISO-8601 text, which its date
+    # functions read directly.
+    if dialect == "sqlite":
+        days_between = "CAST(julianday(date(start_time)) - julianday(date(prev_stop_time)) AS INTEGER)"
+    else:
+        days_between = "DATE_DIFF(DATE(start_time), DATE(prev_stop_time), DAY)"
+    return f"""
+        WITH appointment_dates AS (
+            SELECT 
+                p.patient_name AS `Patient Name`,
+                a.START AS start_time,
+                a.STOP AS stop_time,
+                LAG(a.STOP) OVER (PARTITION BY a.patient_id ORDER BY a.START) AS prev_stop_time
+            FROM `{dataset_id}.{appointments_data_table}` a
+            JOIN `{dataset_id}.{patients_data_table}` p ON a.patient_id = p.patient_id
+        ),
+        appointment_gaps AS (
+            SELECT 
+                `Patient Name`,
+                {days_between} AS days_between_appointments
+            FROM appointment_dates
+            WHERE prev_stop_time IS NOT NULL
+        )
+        SELECT 
+            `Patient Name`,
+            AVG(days_between_appointments) AS `Average Days Between Appointments`
+        FROM appointment_gaps
+        GROUP BY `Patient Name`
+    """
+
+def patient_gaps_query(dialect):
+    # The summary keeps each patient's gap total and count, so the average
+    # per name comes out the same as AVG over the individual gaps.
+    if summary_available(patient_gaps_table):
+        return f"""
+            SELECT
+                patient_name AS `Patient Name`,
+                SUM(gap_days_total) * 1.0 / SUM(gap_count) AS `Average Days Between Appointments`
+            FROM `{dataset_id}.{patient_gaps_table}`
+            GROUP BY patient_name
+            HAVING SUM(gap_count) > 0
+        """
+    return raw_patient_gaps_query(dialect)
+
+def facility_readmissions_query():
+    if summary_available(facility_readmissions_table):
+        return f"""
+            SELECT facility_name AS `Facility Name`, total_readmissions AS `Total Readmissions`
+            FROM `{dataset_id}.{facility_readmissions_table}`
+        """
+    return f"""
+        SELECT `Facility Name`, SUM(`Number of Readmissions`) AS `Total Readmissions`
+        FROM `{dataset_id}.{cms_data_table}`
+        GROUP BY `Facility Name`
+    """
+
+# Each analysis as (base query builder, name column, metric column, search label).
+ANALYSES = {
+    "Doctor Appointment Volume": (
+        doctor_volume_query, "Doctor Name", "Appointments Count", "Search by Doctor Name"
+    ),
+    "Patient Appointment Patterns": (
+        lambda: patient_gaps_query(get_backend().dialect), "Patient Name", "Average Days Between Appointments",
+        "Search by Patient Name"
+    ),
+    "Facility Readmission Rates": (
+        facility_readmissions_query, "Facility Name", "Total Readmissions", "Search by Facility Name"
+    ),
+}
+
+# The scripts/name_index.py index behind each analysis's search box.
+SEARCH_INDEXES = {
+    "Doctor Appointment Volume": "doctors",
+    "Patient Appointment Patterns": "patients",
+    "Facility Readmission Rates": "facilities",
+}
+
+def start_prefetch():
+    # Fills the query cache with the unfiltered first page (and its count) of
+    # every analysis, so switching analyses after login doesn't wait on the
+    # backend. One batch per login, cancelled on logout.
+    if st.session_state.get("prefetch") is not None:
+        return
+    queries = []
+    for build_query, name_column, metric_column, _ in ANALYSES.values():
+        base_query = build_query()
+        queries.append(count_query(base_query, name_column, ""))
+        queries.append(page_query(base_query, name_column, metric_column, "", 1))
+    st.session_state.prefetch = Prefetch(
+        get_backend(), get_query_cache(), queries, max_workers=int(os.environ.get("PREFETCH_MAX_WORKERS", 3)),
+        metrics=get_query_metrics()
+    )
+    logging.info(f"Prefetching {len(queries)} dashboard queries")
+
+def cancel_prefetch():
+    prefetch = st.session_state.get("prefetch")
+    if prefetch is not None:
+        prefetch.cancel()
+        st.session_state.prefetch = None
+
 def user_dashboard():
     logging.info("Rendering user dashboard")
     st.title("Healthcare Provider Analytics Dashboard")
     st.markdown("---")
 
-    lottie_animation = load_lottie(r"E:\healthcare_analytics\data\animation.json")
-    if lottie_animation:
-        st_lottie(lottie_animation, height=200, key="dashboard")
+    show_lottie("dashboard")
+    start_prefetch()
 
     st.sidebar.title("Explore Insights")
-    analysis_option = st.sidebar.selectbox(
-        "Choose Analysis",
-        ["Doctor Appointment Volume", 
-         "Patient Appointment Patterns",
-         "Facility Readmission Rates"]
-    )
+    analysis_option = st.sidebar.selectbox("Choose Analysis", list(ANALYSES))
     logging.info(f"Selected analysis option: {analysis_option}")
 
     if analysis_option == "Doctor Appointment Volume":
         logging.info("Displaying Doctor Appointment Volume analysis")
         st.header("Doctor Appointment Volume")
         
-        query = f"""
-            SELECT NAME AS `Doctor Name`, COUNT(*) AS `Appointments Count`
-            FROM `{dataset_id}.{appointments_data_table}`
-            GROUP BY `Doctor Name`
-            ORDER BY `Appointments Count` DESC
-        """
-        df = run_query(query)
-
-        df.index = df.index + 1
-
-        search_query = st.text_input("Search by Doctor Name", "")
-        if search_query:
-            logging.info(f"Searching for doctor names containing: {search_query}")
-            df = df[df['Doctor Name'].astype(str).str.contains(search_query, case=False)]
-
-        page_size = 10
-        page_number = st.number_input("Page Number", min_value=1, max_value=(len(df) // page_size) + 1, value=1)
-        start_idx = (page_number - 1) * page_size
-        end_idx = start_idx + page_size
-        logging.info(f"Displaying page {page_number} of results")
+        build_query, name_column, metric_column, search_label = ANALYSES["Doctor Appointment Volume"]
+        page, first_page = paged_results(
+            build_query(), name_column, metric_column, search_label, view=analysis_option,
+            search_index=get_name_index(SEARCH_INDEXES[analysis_option])
+        )
 
         st.write("Appointments per Doctor")
-        st.dataframe(df.iloc[start_idx:end_idx])
+        st.dataframe(page)
 
         visualization_option = st.radio(
             "Select Visualization Type",
@@ -228,82 +679,34 @@ def user_dashboard():
         logging.info(f"Selected visualization: {visualization_option}")
 
         if visualization_option == "Page-Level Insights":
-            data_to_visualize = df.iloc[start_idx:end_idx]
+            data_to_visualize = page
         else:
-            data_to_visualize = df.head(10)
+            data_to_visualize = first_page()
 
         st.write("Bar Chart: Doctors by Appointment Count")
-        plt.figure(figsize=(10, 6))
-        plt.bar(data_to_visualize['Doctor Name'], data_to_visualize['Appointments Count'], color='skyblue')
-        plt.xlabel('Doctor Name')
-        plt.ylabel('Appointments Count')
-        plt.title(f'Doctors by Appointment Count ({visualization_option})')
-        plt.xticks(rotation=90)
-        st.pyplot(plt)
+        show_chart("bar", data_to_visualize, "Doctor Name", "Appointments Count",
+                   title=f"Doctors by Appointment Count ({visualization_option})", color="skyblue")
 
         st.write("Line Plot: Appointment Trends")
-        plt.figure(figsize=(10, 6))
-        plt.plot(data_to_visualize['Doctor Name'], data_to_visualize['Appointments Count'], marker='o', color='green')
-        plt.xlabel('Doctor Name')
-        plt.ylabel('Appointments Count')
-        plt.title(f'Appointment Trends ({visualization_option})')
-        plt.xticks(rotation=90)
-        st.pyplot(plt)
+        show_chart("line", data_to_visualize, "Doctor Name", "Appointments Count",
+                   title=f"Appointment Trends ({visualization_option})", color="green")
 
         st.write("Scatter Plot: Appointment Distribution")
-        plt.figure(figsize=(10, 6))
-        plt.scatter(data_to_visualize['Doctor Name'], data_to_visualize['Appointments Count'], color='orange')
-        plt.xlabel('Doctor Name')
-        plt.ylabel('Appointments Count')
-        plt.title(f'Appointment Distribution ({visualization_option})')
-        plt.xticks(rotation=90)
-        st.pyplot(plt)
+        show_chart("scatter", data_to_visualize, "Doctor Name", "Appointments Count",
+                   title=f"Appointment Distribution ({visualization_option})", color="orange")
 
     elif analysis_option == "Patient Appointment Patterns":
         logging.info("Displaying Patient Appointment Patterns analysis")
         st.header("Patient Appointment Patterns")
         
-        query = f"""
-            WITH appointment_dates AS (
-                SELECT 
-                    p.patient_name AS `Patient Name`,
-                    PARSE_TIMESTAMP('%Y-%m-%dT%H:%M:%SZ', a.START) AS start_time,
-                    PARSE_TIMESTAMP('%Y-%m-%dT%H:%M:%SZ', a.STOP) AS stop_time,
-                    LAG(PARSE_TIMESTAMP('%Y-%m-%dT%H:%M:%SZ', a.STOP)) OVER (PARTITION BY a.patient_id ORDER BY PARSE_TIMESTAMP('%Y-%m-%dT%H:%M:%SZ', a.START)) AS prev_stop_time
-                FROM `{dataset_id}.{appointments_data_table}` a
-                JOIN `{dataset_id}.{patients_data_table}` p ON a.patient_id = p.patient_id
-            ),
-            appointment_gaps AS (
-                SELECT 
-                    `Patient Name`,
-                    DATE_DIFF(start_time, prev_stop_time, DAY) AS days_between_appointments
-                FROM appointment_dates
-                WHERE prev_stop_time IS NOT NULL
-            )
-            SELECT 
-                `Patient Name`,
-                AVG(days_between_appointments) AS `Average Days Between Appointments`
-            FROM appointment_gaps
-            GROUP BY `Patient Name`
-            ORDER BY `Average Days Between Appointments` DESC
-        """
-        df = run_query(query)
-
-        df.index = df.index + 1
-
-        search_query = st.text_input("Search by Patient Name", "")
-        if search_query:
-            logging.info(f"Searching for patient names containing: {search_query}")
-            df = df[df['Patient Name'].astype(str).str.contains(search_query, case=False)]
-
-        page_size = 10
-        page_number = st.number_input("Page Number", min_value=1, max_value=(len(df) // page_size) + 1, value=1)
-        start_idx = (page_number - 1) * page_size
-        end_idx = start_idx + page_size
-        logging.info(f"Displaying page {page_number} of results")
+        build_query, name_column, metric_column, search_label = ANALYSES["Patient Appointment Patterns"]
+        page, first_page = paged_results(
+            build_query(), name_column, metric_column, search_label, view=analysis_option,
+            search_index=get_name_index(SEARCH_INDEXES[analysis_option])
+        )
 
         st.write("Average Days Between Appointments")
-        st.dataframe(df.iloc[start_idx:end_idx])
+        st.dataframe(page)
 
         visualization_option = st.radio(
             "Select Visualization Type",
@@ -312,63 +715,50 @@ def user_dashboard():
         logging.info(f"Selected visualization: {visualization_option}")
 
         if visualization_option == "Page-Level Insights":
-            data_to_visualize = df.iloc[start_idx:end_idx]
+            data_to_visualize = page
         else:
-            data_to_visualize = df.head(10)
+            data_to_visualize = first_page()
 
         st.write("Histogram: Distribution of Average Days Between Appointments")
-        plt.figure(figsize=(10, 6))
-        plt.hist(data_to_visualize['Average Days Between Appointments'], bins=20, color='lightgreen', edgecolor='black')
-        plt.xlabel('Average Days Between Appointments')
-        plt.ylabel('Frequency')
-        plt.title(f'Distribution of Average Days Between Appointments ({visualization_option})')
-        st.pyplot(plt)
+        show_chart("hist", data_to_visualize, "Average Days Between Appointments", ylabel="Frequency",
+                   title=f"Distribution of Average Days Between Appointments ({visualization_option})",
+                   color="lightgreen", rotate_labels=False)
 
         st.write("Scatter Plot: Average Days Between Appointments")
-        plt.figure(figsize=(10, 6))
-        plt.scatter(data_to_visualize['Patient Name'], data_to_visualize['Average Days Between Appointments'], color='purple')
-        plt.xlabel('Patient Name')
-        plt.ylabel('Average Days Between Appointments')
-        plt.title(f'Scatter Plot: Average Days Between Appointments ({visualization_option})')
-        plt.xticks(rotation=90)
-        st.pyplot(plt)
+        show_chart("scatter", data_to_visualize, "Patient Name", "Average Days Between Appointments",
+                   title=f"Scatter Plot: Average Days Between Appointments ({visualization_option})", color="purple")
 
         st.write("Line Plot: Appointment Trends Over Time")
-        plt.figure(figsize=(10, 6))
-        plt.plot(data_to_visualize['Patient Name'], data_to_visualize['Average Days Between Appointments'], marker='o', color='blue')
-        plt.xlabel('Patient Name')
-        plt.ylabel('Average Days Between Appointments')
-        plt.title(f'Appointment Trends Over Time ({visualization_option})')
-        plt.xticks(rotation=90)
-        st.pyplot(plt)
+        show_chart("line", data_to_visualize, "Patient Name", "Average Days Between Appointments",
+                   title=f"Appointment Trends Over Time ({visualization_option})", color="blue")
+
+        timeline = get_patient_timeline()
+        if timeline is not None and not page.empty:
+            st.subheader("Patient Timeline")
+            patient_name = st.selectbox("Select a Patient", page["Patient Name"].tolist())
+            logging.info(f"Showing timeline for patient: {patient_name}")
+            for patient_id in timeline.patients_named(patient_name):
+                encounters = timeline.encounters(patient_id)
+                gap = encounters["Days Since Previous"].mean()
+                st.write(
+                    f"Patient {patient_id}: {len(encounters)} encounters, "
+                    f"{'no gaps' if pd.isna(gap) else f'{gap:.1f} days between appointments on average'}, "
+                    f"total claim cost {encounters['Total Claim Cost'].sum():,.2f}"
+                )
+                st.dataframe(encounters, hide_index=True)
 
     elif analysis_option == "Facility Readmission Rates":
         logging.info("Displaying Facility Readmission Rates analysis")
         st.header("Facility Readmission Rates")
         
-        query = f"""
-            SELECT `Facility Name`, SUM(`Number of Readmissions`) AS `Total Readmissions`
-            FROM `{dataset_id}.{cms_data_table}`
-            GROUP BY `Facility Name`
-            ORDER BY `Total Readmissions` DESC
-        """
-        df = run_query(query)
-
-        df.index = df.index + 1
-
-        search_query = st.text_input("Search by Facility Name", "")
-        if search_query:
-            logging.info(f"Searching for facility names containing: {search_query}")
-            df = df[df['Facility Name'].astype(str).str.contains(search_query, case=False)]
-
-        page_size = 10
-        page_number = st.number_input("Page Number", min_value=1, max_value=(len(df) // page_size) + 1, value=1)
-        start_idx = (page_number - 1) * page_size
-        end_idx = start_idx + page_size
-        logging.info(f"Displaying page {page_number} of results")
+        build_query, name_column, metric_column, search_label = ANALYSES["Facility Readmission Rates"]
+        page, first_page = paged_results(
+            build_query(), name_column, metric_column, search_label, view=analysis_option,
+            search_index=get_name_index(SEARCH_INDEXES[analysis_option])
+        )
 
         st.write("Readmissions by Facility")
-        st.dataframe(df.iloc[start_idx:end_idx])
+        st.dataframe(page)
 
         visualization_option = st.radio(
             "Select Visualization Type",
@@ -377,33 +767,21 @@ def user_dashboard():
         logging.info(f"Selected visualization: {visualization_option}")
 
         if visualization_option == "Page-Level Insights":
-            data_to_visualize = df.iloc[start_idx:end_idx]
+            data_to_visualize = page
         else:
-            data_to_visualize = df.head(10)
+            data_to_visualize = first_page()
 
         st.write("Bar Chart: Facilities by Total Readmissions")
-        plt.figure(figsize=(10, 6))
-        plt.bar(data_to_visualize['Facility Name'], data_to_visualize['Total Readmissions'], color='salmon')
-        plt.xlabel('Facility Name')
-        plt.ylabel('Total Readmissions')
-        plt.title(f'Facilities by Total Readmissions ({visualization_option})')
-        plt.xticks(rotation=90)
-        st.pyplot(plt)
+        show_chart("bar", data_to_visualize, "Facility Name", "Total Readmissions",
+                   title=f"Facilities by Total Readmissions ({visualization_option})", color="salmon")
 
         st.write("Pie Chart: Readmission Distribution by Facility")
-        plt.figure(figsize=(8, 8))
-        plt.pie(data_to_visualize['Total Readmissions'], labels=data_to_visualize['Facility Name'], autopct='%1.1f%%', startangle=140)
-        plt.title(f'Readmission Distribution by Facility ({visualization_option})')
-        st.pyplot(plt)
+        show_chart("pie", data_to_visualize, "Facility Name", "Total Readmissions",
+                   title=f"Readmission Distribution by Facility ({visualization_option})", figsize=(8, 8))
 
         st.write("Line Plot: Readmissions Trend")
-        plt.figure(figsize=(10, 6))
-        plt.plot(data_to_visualize['Facility Name'], data_to_visualize['Total Readmissions'], marker='o', color='red')
-        plt.xlabel('Facility Name')
-        plt.ylabel('Total Readmissions')
-        plt.title(f'Readmissions Trend ({visualization_option})')
-        plt.xticks(rotation=90)
-        st.pyplot(plt)
+        show_chart("line", data_to_visualize, "Facility Name", "Total Readmissions",
+                   title=f"Readmissions Trend ({visualization_option})", color="red")
 
 if not st.session_state.authenticated:
     login_page()
@@ -416,6 +794,7 @@ else:
     st.sidebar.markdown("---")
     if st.sidebar.button("Logout"):
         logging.info("User logged out")
+        cancel_prefetch()
         st.session_state.authenticated = False
         st.session_state.user_type = None
         st.rerun()
\ No newline at end of file
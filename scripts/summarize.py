@@ -0,0 +1,133 @@
+import argparse
+import io
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+from scripts.file_hashes import file_sha256, file_sha256_with_prefix
+from scripts.name_index import build_name_indexes
+from scripts.patient_timeline import PatientTimeline, read_appointments, timeline_path
+
+base_dir = Path(__file__).parent.parent
+processed_dir = base_dir / 'data' / 'processed'
+
+patients_input = 'patients_data_cleaned.csv'
+appointments_input = 'appointments_data_cleaned.csv'
+cms_input = 'cms_data_cleaned.csv'
+
+doctor_volume_output = 'doctor_appointment_volume.csv'
+patient_gaps_output = 'patient_appointment_gaps.csv'
+facility_readmissions_output = 'facility_readmissions.csv'
+summary_state_name = 'summary_state.json'
+
+def load_state(output_dir):
+    path = Path(output_dir) / summary_state_name
+    if not path.exists():
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def write_state(output_dir, state):
+    tmp_path = Path(output_dir) / (summary_state_name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    tmp_path.replace(Path(output_dir) / summary_state_name)
+
+def read_new_appointments(path, offset):
+    # Rows appended after `offset` bytes, parsed with the file's header.
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(max(offset, len(header)))
+        body = f.read()
+    return read_appointments(io.BytesIO(header + body))
+
+def update_doctor_volume(volume, appointments):
+    counts = appointments.groupby('NAME', observed=True).size()
+    counts = counts.rename_axis('doctor_name').rename('appointments_count').reset_index()
+    # NAME is categorical, whose sort order is its categories' order.
+    counts['doctor_name'] = counts['doctor_name'].astype(object)
+    if volume is not None:
+        counts = pd.concat([volume, counts]).groupby('doctor_name', as_index=False)['appointments_count'].sum()
+    return counts.sort_values(['appointments_count', 'doctor_name'], ascending=[False, True], ignore_index=True)
+
+def facility_readmissions(cms_data):
+    totals = cms_data.groupby('Facility Name')['Number of Readmissions'].sum()
+    totals = totals.rename_axis('facility_name').rename('total_readmissions').reset_index()
+    return totals.sort_values(['total_readmissions', 'facility_name'], ascending=[False, True], ignore_index=True)
+
+def write_patient_gaps(gaps, patients, path):
+    # Inner join, like the dashboard query: appointments for patients that
+    # aren't in the patients table don't show up.
+    names = patients[['patient_id', 'patient_name']]
+    gaps = gaps.merge(names, on='patient_id', how='inner')
+    gaps = gaps[['patient_id', 'patient_name', 'gap_days_total', 'gap_count', 'last_start', 'last_stop']]
+    gaps = gaps.sort_values('patient_id', ignore_index=True)
+    gaps.to_csv(path, index=False, date_format='%Y-%m-%dT%H:%M:%SZ')
+
+def run_summaries(output_dir=processed_dir):
+    output_dir = Path(output_dir)
+    appointments_path = output_dir / appointments_input
+    state = load_state(output_dir) or {}
+    size = appointments_path.stat().st_size
+
+    previous = state.get('appointments', {})
+    # One read gives both the hash of what was summarized last time and the
+    # hash to record for next time.
+    prefix_hash, appointments_hash = file_sha256_with_prefix(appointments_path, previous.get('size'))
+    appended = (
+        (output_dir / doctor_volume_output).exists()
+        and timeline_path(output_dir).exists()
+        and 0 < previous.get('size', 0) <= size
+        and prefix_hash == previous.get('prefix_sha256')
+    )
+    if appended:
+        new_appointments = read_new_appointments(appointments_path, previous['size'])
+        volume = pd.read_csv(output_dir / doctor_volume_output)
+        timeline = PatientTimeline.load(timeline_path(output_dir))
+        print(f"Summaries: folding in {len(new_appointments)} new appointments.")
+    else:
+        # First run, or the processed file was rewritten rather than
+        # appended to (e.g. a full clean after doctors.csv changed).
+        new_appointments = read_appointments(appointments_path)
+        volume = None
+        timeline = None
+        print(f"Summaries: rebuilding from {len(new_appointments)} appointments.")
+
+    if not new_appointments.empty or not appended:
+        update_doctor_volume(volume, new_appointments).to_csv(output_dir / doctor_volume_output, index=False)
+        # The patient timeline keeps every appointment by (patient_id, START);
+        # the gap summary is read off it rather than kept as running totals.
+        if timeline is None:
+            timeline = PatientTimeline.build(new_appointments)
+        else:
+            timeline = timeline.extend(new_appointments)
+    patients = pd.read_csv(output_dir / patients_input, usecols=['patient_id', 'patient_name'])
+    timeline.with_names(patients).save(timeline_path(output_dir))
+    write_patient_gaps(timeline.gap_stats(), patients, output_dir / patient_gaps_output)
+
+    cms_hash = file_sha256(output_dir / cms_input)
+    if cms_hash != state.get('cms') or not (output_dir / facility_readmissions_output).exists():
+        cms_data = pd.read_csv(output_dir / cms_input, usecols=['Facility Name', 'Number of Readmissions'])
+        facility_readmissions(cms_data).to_csv(output_dir / facility_readmissions_output, index=False)
+
+    write_state(output_dir, {
+        'appointments': {'size': size, 'prefix_sha256': appointments_hash},
+        'cms': cms_hash,
+    })
+    build_name_indexes(output_dir)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Materialize the dashboard summary tables from data/processed.')
+    parser.add_argument('--output-dir', type=Path, default=processed_dir)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    run_summaries(args.output_dir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+import pytest
+
+@pytest.fixture(autouse=True, scope='session')
+def query_metrics_path(tmp_path_factory):
+    # The dashboard's metrics log is a process-wide cached resource, so every
+    # test shares one log outside the source tree.
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        path = tmp_path_factory.mktemp('metrics') / 'query_metrics.jsonl'
+        monkeypatch.setenv('QUERY_METRICS_PATH', str(path))
+        yield path
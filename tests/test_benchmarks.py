@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+data_dir = Path(__file__).parent.parent / 'data'
+
+def test_benchmarks_import():
+    """Test if the benchmark runner can be imported without errors"""
+    from benchmarks.run_benchmarks import run_benchmarks
+    assert True
+
+def test_generated_files_match_real_schemas(tmp_path):
+    from benchmarks.generate_data import generate, source_paths
+    summary = generate(tmp_path, 2000, seed=1)
+    paths = source_paths(tmp_path)
+    real = {
+        'patients_path': data_dir / 'synthea_dataset' / 'patients.csv',
+        'appointments_path': data_dir / 'synthea_dataset' / 'appointments.csv',
+        'doctors_path': data_dir / 'synthea_dataset' / 'doctors.csv',
+        'cms_path': data_dir / 'cms_dataset' / 'hospital_readmissions_reduction_program_hospital.csv',
+    }
+    for name, path in paths.items():
+        assert list(pd.read_csv(path, nrows=0).columns) == list(pd.read_csv(real[name], nrows=0).columns)
+
+    appointments = pd.read_csv(paths['appointments_path'], dtype=str)
+    patients = pd.read_csv(paths['patients_path'], dtype=str)
+    doctors = pd.read_csv(paths['doctors_path'], dtype=str)
+    cms = pd.read_csv(paths['cms_path'], dtype=str)
+    assert len(appointments) == summary['appointments'] == 2000
+    assert appointments['Id'].str.fullmatch(r'[0-9a-f]{8}-([0-9a-f]{4}-){3}[0-9a-f]{12}').all()
+    assert appointments['START'].str.fullmatch(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ').all()
+    assert (appointments['STOP'] >= appointments['START']).all()
+    assert appointments['PATIENT'].isin(patients['Id']).all()
+    assert appointments['PROVIDER'].isin(doctors['Id']).all()
+    assert patients['MIDDLE'].isna().any() and patients['MIDDLE'].notna().any()
+    assert (cms['Number of Readmissions'] == 'Too Few to Report').any()
+    assert cms['Facility ID'].str.fullmatch(r'\d{6}').all()
+
+def test_stages_run_on_generated_data(tmp_path, monkeypatch):
+    from benchmarks.generate_data import generate
+    from benchmarks.run_benchmarks import run_stage
+    from scripts import data_clean
+    for name in ('patients_path', 'appointments_path', 'doctors_path', 'cms_path'):
+        monkeypatch.setattr(data_clean, name, getattr(data_clean, name))
+    generate(tmp_path / 'source', 1000, seed=2)
+    work_dir = tmp_path / 'processed'
+    work_dir.mkdir()
+
+    for stage in ('clean_patients', 'clean_appointments_streaming', 'clean_cms', 'summaries', 'upload_csv_chunked'):
+        result = run_stage(stage, tmp_path / 'source', work_dir, 300)
+        assert result['rows'] > 0
+        assert result['peak_rss_mb'] >= result['baseline_rss_mb']
+    assert len(pd.read_csv(work_dir / 'appointments_data_cleaned.csv')) == 1000
+
+    queries = run_stage('queries', tmp_path / 'source', work_dir, 300)['queries']
+    assert set(queries) == {
+        f'{name}_{variant}' for name in ('doctor_volume', 'patient_gaps', 'facility_readmissions')
+        for variant in ('raw', 'summary')
+    }
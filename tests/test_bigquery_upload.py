@@ -2,6 +2,8 @@ import sys
 from pathlib import Path
 from unittest.mock import patch
 
+import pytest
+
 sys.path.append(str(Path(__file__).parent.parent))
 
 def test_bigquery_upload_import():
@@ -32,3 +34,236 @@ def test_schema_autodetection():
     from scripts.bigquery_upload import cms_data
     assert 'Facility Name' in cms_data.columns
     assert 'Number of Readmissions' in cms_data.columns
+
+def test_parquet_upload_uses_parquet_source(tmp_path, monkeypatch):
+    from unittest.mock import MagicMock
+    import pandas as pd
+    from google.cloud import bigquery
+    from scripts.bigquery_upload import upload_table, table_paths
+    pd.DataFrame({'Facility ID': ['010001']}).to_parquet(tmp_path / 'cms_data_cleaned.parquet')
+    monkeypatch.setitem(table_paths, 'cms_data', tmp_path / 'cms_data_cleaned.csv')
+    client = MagicMock()
+    dataset_ref = MagicMock()
+    upload_table(client, dataset_ref, 'cms_data', source_format='parquet')
+    job_config = client.load_table_from_file.call_args.kwargs['job_config']
+    assert job_config.source_format == bigquery.SourceFormat.PARQUET
+    client.load_table_from_file.return_value.result.assert_called_once()
+
+class FakeJob:
+    def __init__(self, latency, error=None):
+        self.latency = latency
+        self.error = error
+
+    def result(self):
+        import time
+        time.sleep(self.latency)
+        if self.error:
+            raise self.error
+        return self
+
+class FakeClient:
+    """Local stand-in for bigquery.Client whose load jobs take `latency` seconds."""
+    project = 'test-project'
+
+    def __init__(self, latency=0.2, failing=()):
+        self.latency = latency
+        self.failing = failing
+        self.loaded = []
+        self.load_configs = {}
+        self.queries = []
+        self.tables = {}
+        self.schemas = {}
+        self.chunks = []
+        self.deleted = []
+
+    def _job(self, table_ref, job_config=None, rows=None):
+        self.loaded.append(table_ref.table_id)
+        self.load_configs[table_ref.table_id] = job_config
+        self.tables[table_ref.table_id] = rows
+        error = RuntimeError(f"load failed for {table_ref.table_id}") if table_ref.table_id in self.failing else None
+        return FakeJob(self.latency, error)
+
+    def load_table_from_file(self, file_obj, table_ref, job_config=None):
+        file_obj.read()
+        return self._job(table_ref, job_config)
+
+    def load_table_from_dataframe(self, df, table_ref, job_config=None):
+        from google.cloud.bigquery import SchemaField
+        self.chunks.append((table_ref.table_id, len(df), job_config.write_disposition))
+        if job_config.write_disposition == 'WRITE_APPEND':
+            self.tables[table_ref.table_id] += len(df)
+            return FakeJob(self.latency)
+        self.schemas[table_ref.table_id] = [SchemaField(column, 'STRING') for column in df.columns]
+        return self._job(table_ref, job_config, len(df))
+
+    def get_table(self, table_ref):
+        from unittest.mock import MagicMock
+        from google.api_core.exceptions import NotFound
+        if table_ref.table_id not in self.tables:
+            raise NotFound(table_ref.table_id)
+        job_config = self.load_configs[table_ref.table_id]
+        return MagicMock(time_partitioning=job_config.time_partitioning, schema=self.schemas.get(table_ref.table_id))
+
+    def delete_table(self, table_ref, not_found_ok=False):
+        self.deleted.append(table_ref.table_id)
+        self.tables.pop(table_ref.table_id, None)
+
+    def query(self, sql, job_config=None):
+        self.queries.append(sql)
+        return FakeJob(0)
+
+def test_concurrent_upload_is_faster_than_serial():
+    import time
+    from google.cloud.bigquery import DatasetReference
+    from scripts.bigquery_upload import upload_tables, table_paths
+    dataset_ref = DatasetReference('test-project', 'healthcare_analytics')
+
+    started = time.perf_counter()
+    upload_tables(FakeClient(), dataset_ref, list(table_paths), max_concurrency=1)
+    serial = time.perf_counter() - started
+
+    started = time.perf_counter()
+    timings = upload_tables(FakeClient(), dataset_ref, list(table_paths), max_concurrency=3)
+    concurrent = time.perf_counter() - started
+
+    assert set(timings) == set(table_paths)
+    assert concurrent < serial * 0.75
+
+def test_concurrent_upload_reports_failures(capsys):
+    import pytest
+    from google.cloud.bigquery import DatasetReference
+    from scripts.bigquery_upload import upload_tables, table_paths
+    dataset_ref = DatasetReference('test-project', 'healthcare_analytics')
+    client = FakeClient(latency=0.01, failing=('cms_data',))
+    with pytest.raises(RuntimeError, match='cms_data'):
+        upload_tables(client, dataset_ref, list(table_paths), max_concurrency=3)
+    assert set(client.loaded) == set(table_paths)
+    output = capsys.readouterr().out
+    assert 'Table cms_data Failed' in output
+    assert 'Table patients_data Created and Data Uploaded' in output
+
+def test_incremental_upload_merges_only_changed_rows(tmp_path, monkeypatch):
+    import pandas as pd
+    from google.cloud.bigquery import DatasetReference
+    import scripts.bigquery_upload as bigquery_upload
+    monkeypatch.setattr(bigquery_upload, 'upload_state_dir', tmp_path / 'state')
+    monkeypatch.setitem(bigquery_upload.table_paths, 'appointments_data', tmp_path / 'appointments_data_cleaned.csv')
+    dataset_ref = DatasetReference('test-project', 'healthcare_analytics')
+    appointments = pd.DataFrame({
+        'Id': ['a1', 'a2'],
+        'START': ['2012-04-01T09:04:48Z', '2013-04-07T09:04:48Z'],
+        'STOP': ['2012-04-01T10:02:47Z', '2013-04-07T09:55:49Z'],
+        'patient_id': ['p1', 'p1'],
+        'provider_id': ['d1', 'd2'],
+        'TOTAL_CLAIM_COST': [1567.0, 704.2],
+    })
+    appointments.to_csv(tmp_path / 'appointments_data_cleaned.csv', index=False)
+    client = FakeClient(latency=0)
+
+    bigquery_upload.upload_table_incremental(client, dataset_ref, 'appointments_data', 'csv')
+    job_config = client.load_configs['appointments_data']
+    assert job_config.time_partitioning.field == 'START'
+    assert job_config.time_partitioning.type_ == 'MONTH'
+    assert job_config.clustering_fields == ['patient_id', 'provider_id']
+    assert client.tables['appointments_data'] == 2
+
+    client.loaded.clear()
+    bigquery_upload.upload_table_incremental(client, dataset_ref, 'appointments_data', 'csv')
+    assert client.loaded == []
+
+    appointments.loc[1, 'TOTAL_CLAIM_COST'] = 800.0
+    appointments.loc[2] = ['a3', '2014-01-01T09:00:00Z', '2014-01-01T10:00:00Z', 'p2', 'd1', 99.0]
+    appointments.to_csv(tmp_path / 'appointments_data_cleaned.csv', index=False)
+    bigquery_upload.upload_table_incremental(client, dataset_ref, 'appointments_data', 'csv', chunksize=2)
+    assert client.loaded == ['appointments_data_staging']
+    assert client.chunks[-1] == ('appointments_data_staging', 2, 'WRITE_TRUNCATE')
+    assert 'appointments_data_staging' not in client.tables
+    assert 'MERGE `healthcare_analytics.appointments_data`' in client.queries[-1]
+    assert 'ON T.`Id` = S.`Id`' in client.queries[-1]
+
+def test_merge_sql_quotes_composite_keys():
+    from scripts.bigquery_upload import merge_sql
+    sql = merge_sql('cms_data', ['Facility Name', 'Facility ID', 'Measure Name', 'Number of Readmissions'])
+    assert 'T.`Facility ID` = S.`Facility ID` AND T.`Measure Name` = S.`Measure Name`' in sql
+    assert '`Number of Readmissions` = S.`Number of Readmissions`' in sql
+    assert '`Facility ID` = S.`Facility ID`,' not in sql
+
+def test_chunked_upload_holds_one_chunk_at_a_time(tmp_path, monkeypatch):
+    import pandas as pd
+    from google.cloud.bigquery import DatasetReference
+    import scripts.bigquery_upload as bigquery_upload
+    pd.DataFrame({'patient_id': [f'p{i}' for i in range(25)], 'INCOME': range(25)}).to_csv(
+        tmp_path / 'patients_data_cleaned.csv', index=False)
+    monkeypatch.setitem(bigquery_upload.table_paths, 'patients_data', tmp_path / 'patients_data_cleaned.csv')
+    client = FakeClient(latency=0)
+    dataset_ref = DatasetReference('test-project', 'healthcare_analytics')
+    bigquery_upload.upload_table(client, dataset_ref, 'patients_data', 'csv', chunksize=10)
+    assert [rows for _, rows, _ in client.chunks] == [10, 10, 5]
+    assert [disposition for _, _, disposition in client.chunks] == ['WRITE_TRUNCATE', 'WRITE_APPEND', 'WRITE_APPEND']
+    assert client.tables['patients_data'] == 25
+
+def test_csv_upload_sends_declared_schema(tmp_path, monkeypatch):
+    import pandas as pd
+    from google.cloud.bigquery import DatasetReference
+    import scripts.bigquery_upload as bigquery_upload
+    pd.DataFrame({
+        'patient_id': ['p1', 'p2'],
+        'BIRTHDATE': ['1990-01-01', '1950-05-05'],
+        'DEATHDATE': ['', '2020-02-02'],
+        'ZIP': ['02134', '0'],
+    }).to_csv(tmp_path / 'patients_data_cleaned.csv', index=False)
+    monkeypatch.setitem(bigquery_upload.table_paths, 'patients_data', tmp_path / 'patients_data_cleaned.csv')
+    frames = []
+    client = FakeClient(latency=0)
+    load = client.load_table_from_dataframe
+    client.load_table_from_dataframe = lambda df, *args, **kwargs: frames.append(df) or load(df, *args, **kwargs)
+    dataset_ref = DatasetReference('test-project', 'healthcare_analytics')
+    bigquery_upload.upload_table(client, dataset_ref, 'patients_data', 'csv')
+    schema = {field.name: field.field_type for field in client.load_configs['patients_data'].schema}
+    assert schema == {'patient_id': 'STRING', 'BIRTHDATE': 'DATE', 'DEATHDATE': 'DATE', 'ZIP': 'STRING'}
+    assert frames[0]['DEATHDATE'].isna().tolist() == [True, False]
+    assert frames[0]['ZIP'].tolist() == ['02134', '0']
+
+def test_csv_upload_frames_stay_compact(tmp_path, monkeypatch):
+    import pandas as pd
+    import scripts.bigquery_upload as bigquery_upload
+    path = tmp_path / 'appointments_data_cleaned.csv'
+    pd.DataFrame({
+        'Id': ['a1', 'a2', 'a3'],
+        'patient_id': ['p1', 'p1', 'p2'],
+        'CODE': [1, 2, 3],
+    }).to_csv(path, index=False)
+    df = next(bigquery_upload.read_csv_frames(path, 'appointments_data'))
+    assert isinstance(df['patient_id'].dtype, pd.CategoricalDtype)
+    plain = df.astype({'patient_id': object})
+    assert (bigquery_upload.row_hashes(df) == bigquery_upload.row_hashes(plain)).all()
+
+@pytest.mark.parametrize('source_format, chunksize', [('parquet', None), ('csv', None), ('csv', 500)])
+def test_full_upload_creates_the_incremental_layout(tmp_path, monkeypatch, source_format, chunksize):
+    from google.cloud.bigquery import DatasetReference
+    import scripts.bigquery_upload as bigquery_upload
+    monkeypatch.setattr(bigquery_upload, 'upload_state_dir', tmp_path / 'state')
+    dataset_ref = DatasetReference('test-project', 'healthcare_analytics')
+    client = FakeClient(latency=0)
+    bigquery_upload.upload_table(client, dataset_ref, 'appointments_data', source_format, chunksize)
+    job_config = client.load_configs['appointments_data']
+    assert job_config.time_partitioning.type_ == 'MONTH'
+    assert job_config.time_partitioning.field == 'START'
+    assert job_config.clustering_fields == ['patient_id', 'provider_id']
+    bigquery_upload.upload_table_incremental(client, dataset_ref, 'appointments_data', source_format, chunksize)
+    assert 'appointments_data' not in client.deleted
+    assert 'MERGE `healthcare_analytics.appointments_data`' in client.queries[-1]
+
+def test_day_partitioned_table_is_recreated_by_month(tmp_path, monkeypatch):
+    from google.cloud import bigquery
+    from google.cloud.bigquery import DatasetReference
+    import scripts.bigquery_upload as bigquery_upload
+    dataset_ref = DatasetReference('test-project', 'healthcare_analytics')
+    client = FakeClient(latency=0)
+    client.tables['appointments_data'] = 1
+    client.load_configs['appointments_data'] = bigquery.LoadJobConfig(
+        time_partitioning=bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY, field='START')
+    )
+    table_ref = dataset_ref.table('appointments_data')
+    assert bigquery_upload.needs_full_load(client, table_ref, 'appointments_data')
+    assert client.deleted == ['appointments_data']
@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+def sample(counts):
+    return pd.DataFrame({'Doctor Name': [f'Doctor {i}' for i in range(len(counts))], 'Appointments Count': counts})
+
+def test_charts_import():
+    """Test if charts.py can be imported without errors"""
+    from scripts.charts import ChartCache
+    assert True
+
+@pytest.mark.parametrize('kind', ['bar', 'line', 'scatter', 'hist', 'pie'])
+def test_render_chart_returns_png_and_leaves_no_open_figures(kind):
+    import matplotlib.pyplot as plt
+    from scripts.charts import render_chart
+    before = len(plt.get_fignums())
+    png = render_chart(kind, sample([5, 3, 1]), 'Doctor Name', 'Appointments Count', title='Test')
+    assert png.startswith(b'\x89PNG')
+    assert len(plt.get_fignums()) == before
+
+def test_unknown_chart_kind():
+    from scripts.charts import render_chart
+    with pytest.raises(ValueError):
+        render_chart('radar', sample([1]), 'Doctor Name', 'Appointments Count')
+
+def test_chart_cache_keys_on_data_and_kind():
+    from scripts.charts import ChartCache
+    cache = ChartCache()
+    first = cache.chart('bar', sample([5, 3, 1]), 'Doctor Name', 'Appointments Count', title='A')
+    again = cache.chart('bar', sample([5, 3, 1]).set_index('Doctor Name', drop=False), 'Doctor Name',
+                        'Appointments Count', title='A')
+    assert again is first
+    cache.chart('line', sample([5, 3, 1]), 'Doctor Name', 'Appointments Count', title='A')
+    cache.chart('bar', sample([5, 3, 2]), 'Doctor Name', 'Appointments Count', title='A')
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 3
+
+def test_chart_cache_evicts_least_recently_used():
+    from scripts.charts import ChartCache
+    cache = ChartCache(max_bytes=25)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 10)
+    cache.get('a')
+    cache.put('c', b'x' * 10)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 20
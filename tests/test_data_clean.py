@@ -30,4 +30,243 @@ def test_csv_output_exists():
 
 def test_columns_renamed():
     from scripts.data_clean import patients_data
-    assert 'patient_id' in patients_data.columns
\ No newline at end of file
+    assert 'patient_id' in patients_data.columns
+
+def test_combine_names_vectorized_matches_reference():
+    import pandas as pd
+    from scripts.data_clean import combine_names, combine_names_vectorized
+    df = pd.DataFrame({
+        'FIRST': ['John', ' Jane ', '', None, 'Ann'],
+        'MIDDLE': ['Q', None, '', 'M', '  '],
+        'LAST': ['Doe', 'Smith', '', 'Lee', None],
+    })
+    expected = df.apply(combine_names, axis=1)
+    assert combine_names_vectorized(df).tolist() == expected.tolist()
+
+def test_combine_names_vectorized_sample_data():
+    import pandas as pd
+    from scripts.data_clean import combine_names, combine_names_vectorized
+    path = Path(__file__).parent.parent / 'data' / 'synthea_dataset' / 'patients.csv'
+    patients = pd.read_csv(path)
+    expected = patients.apply(combine_names, axis=1)
+    assert combine_names_vectorized(patients).equals(expected)
+
+def test_streaming_matches_batch(tmp_path):
+    from scripts.data_clean import run_batch, run_streaming
+    batch_dir = tmp_path / 'batch'
+    stream_dir = tmp_path / 'stream'
+    batch_dir.mkdir()
+    stream_dir.mkdir()
+    run_batch(batch_dir)
+    run_streaming(stream_dir, chunksize=250)
+    for name in ['patients_data_cleaned.csv', 'appointments_data_cleaned.csv', 'cms_data_cleaned.csv']:
+        assert (stream_dir / name).read_bytes() == (batch_dir / name).read_bytes()
+
+def test_appointments_chunk_unknown_provider():
+    import pandas as pd
+    from scripts.data_clean import clean_appointments_chunk
+    chunk = pd.DataFrame({'Id': ['a1'], 'PATIENT': ['p1'], 'PROVIDER': ['missing'], 'REASONCODE': [None]})
+    lookup = pd.Series({'d1': 'Ted955 Reilly981'})
+    cleaned = clean_appointments_chunk(chunk, lookup)
+    assert cleaned.loc[0, 'NAME'] == 'Unknown Provider'
+    assert cleaned.loc[0, 'REASONCODE'] == 0
+
+def test_incremental_run_matches_full_rebuild(tmp_path, monkeypatch):
+    import pandas as pd
+    import scripts.data_clean as data_clean
+    source_dir = Path(__file__).parent.parent / 'data' / 'synthea_dataset'
+    patients = pd.read_csv(source_dir / 'patients.csv', dtype=str)
+    appointments = pd.read_csv(source_dir / 'appointments.csv', dtype=str).sort_values('START', kind='stable')
+
+    monkeypatch.setattr(data_clean, 'patients_path', tmp_path / 'patients.csv')
+    monkeypatch.setattr(data_clean, 'appointments_path', tmp_path / 'appointments.csv')
+    incremental_dir = tmp_path / 'incremental'
+    full_dir = tmp_path / 'full'
+    incremental_dir.mkdir()
+    full_dir.mkdir()
+
+    patients.iloc[:-1].to_csv(tmp_path / 'patients.csv', index=False)
+    appointments.iloc[:6000].to_csv(tmp_path / 'appointments.csv', index=False)
+    data_clean.run_incremental(incremental_dir, chunksize=1000)
+    assert data_clean.load_manifest(incremental_dir)['watermark'] is not None
+
+    patients.loc[patients.index[0], 'ADDRESS'] = '1 Changed Street'
+    patients.to_csv(tmp_path / 'patients.csv', index=False)
+    appointments.to_csv(tmp_path / 'appointments.csv', index=False)
+    data_clean.run_incremental(incremental_dir, chunksize=1000)
+    data_clean.run_batch(full_dir)
+
+    for name in ['patients_data_cleaned.csv', 'appointments_data_cleaned.csv', 'cms_data_cleaned.csv']:
+        assert (incremental_dir / name).read_bytes() == (full_dir / name).read_bytes()
+    assert data_clean.load_manifest(incremental_dir) == data_clean.load_manifest(full_dir)
+
+def test_incremental_run_reads_only_appended_rows(tmp_path, monkeypatch):
+    import io
+    import pandas as pd
+    import scripts.data_clean as data_clean
+    source_dir = Path(__file__).parent.parent / 'data' / 'synthea_dataset'
+    appointments = pd.read_csv(source_dir / 'appointments.csv', dtype=str).sort_values('START', kind='stable')
+    # Rows appended later that start at the same moment as the last row
+    # cleaned so far.
+    appointments.iloc[3000:3002, appointments.columns.get_loc('START')] = appointments['START'].iloc[2999]
+
+    monkeypatch.setattr(data_clean, 'appointments_path', tmp_path / 'appointments.csv')
+    incremental_dir = tmp_path / 'incremental'
+    full_dir = tmp_path / 'full'
+    incremental_dir.mkdir()
+    full_dir.mkdir()
+    appointments.iloc[:3000].to_csv(tmp_path / 'appointments.csv', index=False)
+    data_clean.run_incremental(incremental_dir, chunksize=1000)
+    cleaned_size = (tmp_path / 'appointments.csv').stat().st_size
+
+    sources = []
+    read_appointments = data_clean.read_appointments
+    def spy(path=None, **kwargs):
+        sources.append(path)
+        return read_appointments(path, **kwargs)
+    monkeypatch.setattr(data_clean, 'read_appointments', spy)
+    appointments.to_csv(tmp_path / 'appointments.csv', index=False)
+    data_clean.run_incremental(incremental_dir, chunksize=1000)
+    assert len(sources) == 1 and isinstance(sources[0], io.BytesIO)
+    header = len(appointments.iloc[:0].to_csv(index=False))
+    assert len(sources[0].getvalue()) == header + (tmp_path / 'appointments.csv').stat().st_size - cleaned_size
+
+    data_clean.run_batch(full_dir)
+    name = 'appointments_data_cleaned.csv'
+    assert (incremental_dir / name).read_bytes() == (full_dir / name).read_bytes()
+    assert data_clean.load_manifest(incremental_dir) == data_clean.load_manifest(full_dir)
+
+def test_parquet_output_is_typed(tmp_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from scripts.data_clean import run_batch
+    run_batch(tmp_path)
+    appointments = pq.read_table(tmp_path / 'appointments_data_cleaned.parquet')
+    assert pa.types.is_timestamp(appointments.schema.field('START').type)
+    assert pa.types.is_dictionary(appointments.schema.field('patient_id').type)
+    assert appointments.schema.field('TOTAL_CLAIM_COST').type == pa.float64()
+    patients = pq.read_table(tmp_path / 'patients_data_cleaned.parquet').to_pandas()
+    assert patients['ZIP'].astype(str).str.startswith('0').any()
+    assert patients['DEATHDATE'].isna().any()
+    cms = pq.read_table(tmp_path / 'cms_data_cleaned.parquet').to_pandas()
+    assert (cms['Facility ID'].astype(str) == '010001').any()
+
+def test_parallel_stages_match_sequential(tmp_path):
+    from scripts.data_clean import run_stages, load_manifest
+    sequential_dir = tmp_path / 'sequential'
+    parallel_dir = tmp_path / 'parallel'
+    sequential_dir.mkdir()
+    parallel_dir.mkdir()
+    run_stages(sequential_dir, workers=1)
+    run_stages(parallel_dir, workers=3)
+    for name in ['patients_data_cleaned.csv', 'appointments_data_cleaned.csv', 'cms_data_cleaned.csv']:
+        assert (parallel_dir / name).read_bytes() == (sequential_dir / name).read_bytes()
+    assert load_manifest(parallel_dir) == load_manifest(sequential_dir)
+
+def test_clean_keeps_missing_dates_null():
+    import pandas as pd
+    from scripts.data_clean import clean_patients
+    patients = pd.DataFrame({
+        'Id': ['p1', 'p2'],
+        'BIRTHDATE': ['1990-01-01', '1950-05-05'],
+        'DEATHDATE': [None, '2020-02-02'],
+        'FIRST': ['Ann', 'Bob'],
+        'MIDDLE': [None, None],
+        'LAST': ['Lee', 'Ray'],
+        'SUFFIX': [None, None],
+    })
+    cleaned = clean_patients(patients)
+    assert cleaned['DEATHDATE'].isna().tolist() == [True, False]
+    assert cleaned['SUFFIX'].tolist() == [0, 0]
+
+def test_cleaned_appointments_are_compact():
+    import pandas as pd
+    from scripts.data_clean import clean_appointments, frame_mb, read_appointments, read_doctors
+    cleaned = clean_appointments(read_appointments(), read_doctors())
+    for column in ['patient_id', 'provider_id', 'ORGANIZATION', 'PAYER', 'ENCOUNTERCLASS', 'DESCRIPTION', 'NAME']:
+        assert isinstance(cleaned[column].dtype, pd.CategoricalDtype), column
+    assert isinstance(cleaned['Id'].dtype, pd.StringDtype)
+    assert frame_mb(cleaned) * 3 < frame_mb(cleaned.astype(object))
+
+def test_read_compact_unions_categories_across_blocks(tmp_path, monkeypatch):
+    import pandas as pd
+    import scripts.data_clean as data_clean
+    path = tmp_path / 'rows.csv'
+    pd.DataFrame({'kind': ['a', 'a', 'b', None, 'c'], 'value': range(5)}).to_csv(path, index=False)
+    monkeypatch.setattr(data_clean, 'READ_BLOCK_ROWS', 2)
+    df = data_clean.read_compact(path, {'kind': 'category', 'value': 'int64'})
+    assert isinstance(df['kind'].dtype, pd.CategoricalDtype)
+    assert df['kind'].astype(object).where(df['kind'].notna(), None).tolist() == ['a', 'a', 'b', None, 'c']
+    assert df['value'].tolist() == list(range(5))
+
+def test_fill_missing_writes_zero_for_compact_columns():
+    import pandas as pd
+    from scripts.data_clean import TEXT, compact, fill_missing
+    df = pd.DataFrame({
+        'kind': pd.Series(['a', None], dtype='category'),
+        'full': pd.Series(['x', 'y'], dtype='category'),
+        'text': pd.Series([None, 'b'], dtype=TEXT),
+        'START': pd.Series([None, '2020-01-01T00:00:00Z'], dtype=TEXT),
+        'code': [1, 2],
+        'cost': [0.5, None],
+    })
+    filled = compact(fill_missing(df))
+    assert filled.to_csv(index=False) == 'kind,full,text,START,code,cost\na,x,0,,1,0.5\n0,y,b,2020-01-01T00:00:00Z,2,0.0\n'
+    assert filled['code'].dtype == 'int8'
+    assert filled['cost'].dtype == 'float32'
+
+def split_shards(shard_dir, shards=3):
+    import shutil
+    import pandas as pd
+    source_dir = Path(__file__).parent.parent / 'data' / 'synthea_dataset'
+    for name in ['patients', 'appointments']:
+        rows = pd.read_csv(source_dir / f'{name}.csv', dtype=str, keep_default_na=False)
+        for i in range(shards):
+            (shard_dir / f'run{i}').mkdir(parents=True, exist_ok=True)
+            rows.iloc[i::shards].to_csv(shard_dir / f'run{i}' / f'{name}.csv', index=False)
+    shutil.copy(source_dir / 'doctors.csv', shard_dir / 'run0' / 'doctors.csv')
+
+def test_sharded_run_matches_batch(tmp_path):
+    import pandas as pd
+    from scripts.data_clean import run_batch, run_sharded
+    split_shards(tmp_path / 'shards')
+    sharded_dir = tmp_path / 'sharded'
+    batch_dir = tmp_path / 'batch'
+    sharded_dir.mkdir()
+    batch_dir.mkdir()
+    results = run_sharded(tmp_path / 'shards', sharded_dir, partitions=4)
+    run_batch(batch_dir)
+
+    assert sum(result['appointments'] for result in results) == 7049
+    for name, key in [('patients_data_cleaned.csv', ['patient_id']),
+                      ('appointments_data_cleaned.csv', ['patient_id', 'START', 'Id'])]:
+        sharded = pd.read_csv(sharded_dir / name, dtype=str)
+        batch = pd.read_csv(batch_dir / name, dtype=str)
+        assert sharded.sort_values(key, ignore_index=True).equals(batch.sort_values(key, ignore_index=True))
+        assert len(pd.read_parquet((sharded_dir / name).with_suffix('.parquet'))) == len(batch)
+        assert len(list((sharded_dir / 'partitions' / Path(name).stem).glob('part-*.csv'))) == 4
+    # Each patient's rows sit in one partition, contiguous and in time order.
+    appointments = pd.read_csv(sharded_dir / 'appointments_data_cleaned.csv', dtype=str)
+    runs = (appointments['patient_id'] != appointments['patient_id'].shift()).sum()
+    assert runs == appointments['patient_id'].nunique()
+    assert (appointments.groupby('patient_id')['START'].apply(lambda starts: starts.is_monotonic_increasing)).all()
+
+def test_sharded_output_is_deterministic(tmp_path):
+    from scripts.data_clean import run_sharded
+    split_shards(tmp_path / 'three', shards=3)
+    split_shards(tmp_path / 'two', shards=2)
+    outputs = []
+    for source, workers in [(tmp_path / 'three', 1), (str(tmp_path / 'two' / 'run*'), 2)]:
+        output_dir = tmp_path / f'out{workers}'
+        output_dir.mkdir()
+        run_sharded(source, output_dir, partitions=3, workers=workers)
+        outputs.append(output_dir)
+    for name in ['patients_data_cleaned.csv', 'appointments_data_cleaned.csv']:
+        assert (outputs[0] / name).read_bytes() == (outputs[1] / name).read_bytes()
+
+def test_main_creates_missing_output_dir(tmp_path):
+    from scripts.data_clean import main
+    output_dir = tmp_path / 'new' / 'processed'
+    main(['--output-dir', str(output_dir)])
+    assert (output_dir / 'appointments_data_cleaned.csv').exists()
+    assert (output_dir / 'doctor_appointment_volume.csv').exists()
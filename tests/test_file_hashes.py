@@ -0,0 +1,22 @@
+import hashlib
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+def test_file_hashes_import():
+    """Test if the file hashes module can be imported without errors"""
+    from scripts.file_hashes import file_sha256
+    assert True
+
+def test_prefix_and_full_hash_from_one_read(tmp_path):
+    from scripts.file_hashes import file_sha256, file_sha256_with_prefix
+    data = bytes(range(256)) * 40
+    path = tmp_path / 'data.bin'
+    path.write_bytes(data)
+    assert file_sha256(path, block_size=7) == hashlib.sha256(data).hexdigest()
+    for size in (0, 1, 1000, len(data)):
+        assert file_sha256_with_prefix(path, size, block_size=7) == (
+            hashlib.sha256(data[:size]).hexdigest(), hashlib.sha256(data).hexdigest())
+    assert file_sha256_with_prefix(path, len(data) + 1)[0] is None
+    assert file_sha256_with_prefix(path, None)[0] is None
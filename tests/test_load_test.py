@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+def test_load_test_import():
+    """Test if the load-test harness can be imported without errors"""
+    from benchmarks.load_test import run_load_test
+    assert True
+
+def test_dashboard_stays_within_query_budgets():
+    from benchmarks.load_test import QUERY_BUDGETS, over_budget, run_load_test
+    results = run_load_test(sessions=2, admin_sessions=1, latency=0.0)
+    assert set(results['steps']) == set(QUERY_BUDGETS)
+    assert over_budget(results) == {}
+    assert results['interactions'] == 2 * 18 + 7
+    assert 0 < results['latency']['p50_ms'] <= results['latency']['p99_ms'] <= results['latency']['max_ms']
+    assert set(results['rss_mb']) == {'baseline', 'after', 'growth_per_session'}
+
+def test_latency_backend_counts_round_trips():
+    from benchmarks.load_test import LatencyBackend
+    from scripts.query_backend import SQLiteBackend
+    backend = LatencyBackend(SQLiteBackend(Path(__file__).parent.parent / 'data' / 'processed'), latency=0.01)
+    result = backend.run("SELECT COUNT(*) AS n FROM `healthcare_analytics.appointments_data`")
+    assert backend.has_table('appointments_data')
+    assert backend.queries == 2 and result['n'].iloc[0] > 0
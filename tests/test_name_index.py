@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+processed_dir = Path(__file__).parent.parent / 'data' / 'processed'
+
+def test_name_index_import():
+    """Test if the name index module can be imported without errors"""
+    from scripts.name_index import NameIndex
+    assert True
+
+def test_search_ranks_prefix_then_word_then_substring():
+    from scripts.name_index import NameIndex
+    index = NameIndex.build(['Rosemary Hill', 'Mary Jones', 'Anna Maryland', 'mary jones', 'Bob'])
+    assert index.search('MARY') == ['Mary Jones', 'mary jones', 'Anna Maryland', 'Rosemary Hill']
+    assert index.search('mary', limit=2) == ['Mary Jones', 'mary jones']
+    assert index.suggest('mar') == ['Mary Jones', 'mary jones', 'Anna Maryland']
+    assert index.search('') == []
+    assert index.search('zzz') == []
+
+def test_search_matches_substring_scan():
+    from scripts.name_index import NameIndex
+    names = pd.read_csv(processed_dir / 'cms_data_cleaned.csv', usecols=['Facility Name'])['Facility Name']
+    names = names.drop_duplicates().tolist()
+    index = NameIndex.build(names)
+    for query in ['m', 'ed', ' ', 'mercy', 'Medical Center', 'Medical  Center', 'st. ', ' st', 'no such hospital']:
+        expected = {name for name in names if query.lower() in name.lower()}
+        assert set(index.search(query)) == expected
+
+def test_search_keeps_whitespace_like_strpos():
+    from scripts.name_index import NameIndex
+    index = NameIndex.build(['Mercy  Hospital', 'Mercy Hospital', 'St Mary'])
+    assert index.search('mercy hospital') == ['Mercy Hospital']
+    assert index.search('mercy  hospital') == ['Mercy  Hospital']
+    assert index.search(' mary') == ['St Mary']
+    assert index.search('y\nh') == []
+
+def test_save_and_load_round_trip(tmp_path):
+    from scripts.name_index import NameIndex
+    index = NameIndex.build(['Zoë Ybarra887', 'Ted955 Reilly981'])
+    index.save(tmp_path / 'names.npz')
+    loaded = NameIndex.load(tmp_path / 'names.npz')
+    assert loaded.names == index.names
+    assert loaded.search('ybarra') == ['Zoë Ybarra887']
+    assert NameIndex.load(tmp_path / 'names.npz').search('zoë') == ['Zoë Ybarra887']
+
+def test_build_name_indexes_from_summaries(tmp_path):
+    from scripts.name_index import INDEX_SOURCES, NameIndex, build_name_indexes, index_path
+    for source in INDEX_SOURCES.values():
+        (tmp_path / source).write_bytes((processed_dir / source).read_bytes())
+    build_name_indexes(tmp_path)
+    doctors = pd.read_csv(processed_dir / 'doctor_appointment_volume.csv')
+    index = NameIndex.load(index_path('doctors', tmp_path))
+    assert index.names == doctors.iloc[:, 0].drop_duplicates().tolist()
+    assert len(NameIndex.load(index_path('patients', tmp_path))) > 0
+    assert len(NameIndex.load(index_path('facilities', tmp_path))) > 0
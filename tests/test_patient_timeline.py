@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+processed_dir = Path(__file__).parent.parent / 'data' / 'processed'
+
+def read_appointments():
+    from scripts.patient_timeline import read_appointments
+    return read_appointments(processed_dir / 'appointments_data_cleaned.csv')
+
+def test_patient_timeline_import():
+    """Test if the patient timeline module can be imported without errors"""
+    from scripts.patient_timeline import PatientTimeline
+    assert True
+
+def test_encounters_match_appointments():
+    from scripts.patient_timeline import PatientTimeline
+    appointments = pd.read_csv(processed_dir / 'appointments_data_cleaned.csv')
+    timeline = PatientTimeline.build(read_appointments())
+    assert len(timeline) == appointments['patient_id'].nunique()
+    for patient_id in appointments['patient_id'].drop_duplicates().sample(5, random_state=0):
+        expected = appointments[appointments['patient_id'] == patient_id].sort_values('START', kind='mergesort')
+        encounters = timeline.encounters(patient_id)
+        assert encounters['Start'].dt.strftime('%Y-%m-%dT%H:%M:%SZ').tolist() == expected['START'].tolist()
+        assert encounters['Doctor'].tolist() == expected['NAME'].tolist()
+        assert encounters['Total Claim Cost'].tolist() == expected['TOTAL_CLAIM_COST'].tolist()
+        days = (pd.to_datetime(expected['START']).dt.normalize()
+                - pd.to_datetime(expected['STOP']).shift().dt.normalize()).dt.days
+        assert encounters['Days Since Previous'].astype('float').tolist()[1:] == days.tolist()[1:]
+        assert pd.isna(encounters['Days Since Previous'].iloc[0])
+    assert timeline.encounters('no-such-patient').empty
+
+def test_gap_stats_match_groupby():
+    from scripts.patient_timeline import PatientTimeline
+    appointments = pd.read_csv(processed_dir / 'appointments_data_cleaned.csv')
+    visits = appointments.assign(
+        start=pd.to_datetime(appointments['START']), stop=pd.to_datetime(appointments['STOP'])
+    ).sort_values(['patient_id', 'start'], kind='mergesort')
+    previous = visits.groupby('patient_id')['stop'].shift()
+    visits['gap'] = (visits['start'].dt.normalize() - previous.dt.normalize()).dt.days
+    expected = visits.groupby('patient_id')['gap'].agg(['sum', 'count'])
+
+    stats = PatientTimeline.build(read_appointments()).gap_stats().set_index('patient_id')
+    assert stats['gap_days_total'].tolist() == expected['sum'].astype('int64').tolist()
+    assert stats['gap_count'].tolist() == expected['count'].tolist()
+
+def test_extend_matches_build():
+    from scripts.patient_timeline import PatientTimeline
+    appointments = read_appointments().sort_values('START', kind='mergesort', ignore_index=True)
+    cutoff = len(appointments) // 2
+    built = PatientTimeline.build(appointments)
+    extended = PatientTimeline.build(appointments.iloc[:cutoff]).extend(appointments.iloc[cutoff:])
+    assert built.data.keys() == extended.data.keys()
+    for name, values in built.data.items():
+        np.testing.assert_array_equal(extended.data[name], values)
+
+def test_names_and_round_trip(tmp_path):
+    from scripts.patient_timeline import PatientTimeline
+    patients = pd.read_csv(processed_dir / 'patients_data_cleaned.csv', usecols=['patient_id', 'patient_name'])
+    timeline = PatientTimeline.build(read_appointments()).with_names(patients)
+    timeline.save(tmp_path / 'timeline.npz')
+    loaded = PatientTimeline.load(tmp_path / 'timeline.npz')
+    patient = patients[patients['patient_id'].isin(loaded.gap_stats()['patient_id'])].iloc[0]
+    assert patient['patient_id'] in loaded.patients_named(patient['patient_name'])
+    assert loaded.patients_named('Nobody') == []
+    pd.testing.assert_frame_equal(loaded.encounters(patient['patient_id']), timeline.encounters(patient['patient_id']))
@@ -0,0 +1,83 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+class SlowBackend:
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.queries = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def run(self, query, params=None):
+        self.release.wait()
+        time.sleep(self.latency)
+        self.queries.append(query)
+        return pd.DataFrame({'query': [query]})
+
+    def execute(self, query, params=None):
+        return self.run(query, params), {}
+
+def test_prefetch_import():
+    """Test if prefetch.py can be imported without errors"""
+    from scripts.prefetch import Prefetch
+    assert True
+
+def test_prefetch_runs_queries_concurrently_into_cache(tmp_path):
+    from scripts.prefetch import Prefetch
+    from scripts.query_cache import QueryCache
+    backend = SlowBackend(latency=0.2)
+    cache = QueryCache(marker_path=tmp_path / '.last_upload')
+    queries = [(f"SELECT {i}", {'search': ''}) for i in range(3)]
+    started = time.perf_counter()
+    prefetch = Prefetch(backend, cache, queries, max_workers=3)
+    for query, params in queries:
+        prefetch.wait(cache.make_key(query, params))
+    assert time.perf_counter() - started < 0.5
+    assert prefetch.done()
+    for query, params in queries:
+        assert cache.get(cache.make_key(query, params))['query'].tolist() == [query]
+
+def test_prefetch_skips_cached_and_duplicate_queries(tmp_path):
+    from scripts.prefetch import Prefetch
+    from scripts.query_cache import QueryCache
+    backend = SlowBackend(latency=0)
+    cache = QueryCache(marker_path=tmp_path / '.last_upload')
+    cache.put(cache.make_key("SELECT 1"), pd.DataFrame({'query': ['cached']}))
+    prefetch = Prefetch(backend, cache, [("SELECT 1", None), ("SELECT 2", None), ("SELECT  2", None)])
+    for key in prefetch.futures:
+        prefetch.wait(key)
+    assert backend.queries == ["SELECT 2"]
+    assert cache.stats()['hits'] == 0
+
+def test_cancel_drops_pending_and_in_flight_results(tmp_path):
+    from scripts.prefetch import Prefetch
+    from scripts.query_cache import QueryCache
+    backend = SlowBackend(latency=0)
+    backend.release.clear()
+    cache = QueryCache(marker_path=tmp_path / '.last_upload')
+    prefetch = Prefetch(backend, cache, [(f"SELECT {i}", None) for i in range(4)], max_workers=1)
+    prefetch.cancel()
+    backend.release.set()
+    for key in prefetch.futures:
+        prefetch.wait(key)
+    assert len(backend.queries) <= 1
+    assert cache.stats()['entries'] == 0
+
+def test_prefetch_records_metrics(tmp_path):
+    from scripts.prefetch import Prefetch
+    from scripts.query_cache import QueryCache
+    from scripts.query_metrics import QueryMetrics
+    metrics = QueryMetrics(tmp_path / 'metrics.jsonl')
+    cache = QueryCache(marker_path=tmp_path / '.last_upload')
+    prefetch = Prefetch(SlowBackend(latency=0), cache, [("SELECT 1", None)], metrics=metrics)
+    for key in prefetch.futures:
+        prefetch.wait(key)
+    records = metrics.read()
+    assert records['view'].tolist() == ['prefetch']
+    assert records['rows'].tolist() == [1]
@@ -0,0 +1,106 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+processed_dir = Path(__file__).parent.parent / 'data' / 'processed'
+
+@pytest.fixture(scope='module')
+def local_backend():
+    from scripts.query_backend import SQLiteBackend
+    return SQLiteBackend(processed_dir)
+
+def test_query_backend_import():
+    """Test if query_backend.py can be imported without errors"""
+    from scripts.query_backend import create_backend
+    assert True
+
+def test_bigquery_client_is_lazy():
+    from scripts.query_backend import BigQueryBackend
+    with patch('scripts.query_backend.bigquery.Client') as mock_client:
+        backend = BigQueryBackend()
+        mock_client.assert_not_called()
+        backend.run("SELECT @x AS x", {'x': 1})
+        mock_client.assert_called_once()
+    job_config = mock_client.return_value.query.call_args.kwargs['job_config']
+    assert job_config.query_parameters[0].name == 'x'
+
+def test_unknown_backend():
+    from scripts.query_backend import create_backend
+    with pytest.raises(ValueError):
+        create_backend('oracle')
+
+def test_local_doctor_volume_matches_pandas(local_backend):
+    appointments = pd.read_csv(processed_dir / 'appointments_data_cleaned.csv')
+    expected = appointments.groupby('NAME').size().sort_values(ascending=False)
+    result = local_backend.run("""
+        SELECT NAME AS `Doctor Name`, COUNT(*) AS `Appointments Count`
+        FROM `healthcare_analytics.appointments_data`
+        GROUP BY `Doctor Name`
+        ORDER BY `Appointments Count` DESC, `Doctor Name`
+        LIMIT @limit
+    """, {'limit': 5})
+    assert result['Appointments Count'].tolist() == expected.head(5).tolist()
+
+def test_local_patient_gap_query(local_backend):
+    from scripts.streamlit_app import raw_patient_gaps_query
+    result = local_backend.run(raw_patient_gaps_query('sqlite')).set_index('Patient Name')
+    appointments = pd.read_csv(processed_dir / 'appointments_data_cleaned.csv')
+    patients = pd.read_csv(processed_dir / 'patients_data_cleaned.csv')
+    patient_id, name = patients.loc[0, ['patient_id', 'patient_name']]
+    visits = appointments[appointments['patient_id'] == patient_id].sort_values('START')
+    starts = pd.to_datetime(visits['START']).dt.normalize()
+    stops = pd.to_datetime(visits['STOP']).dt.normalize()
+    expected = (starts.iloc[1:].values - stops.iloc[:-1].values).astype('timedelta64[D]').astype(int).mean()
+    assert result.loc[name, 'Average Days Between Appointments'] == pytest.approx(expected)
+
+def test_local_information_schema(local_backend):
+    tables = local_backend.run("SELECT table_name FROM `healthcare_analytics.INFORMATION_SCHEMA.TABLES`")
+    assert set(tables['table_name']) == {
+        'patients_data', 'appointments_data', 'cms_data',
+        'doctor_appointment_volume', 'patient_appointment_gaps', 'facility_readmissions',
+    }
+    columns = local_backend.run(
+        "SELECT column_name FROM `healthcare_analytics.INFORMATION_SCHEMA.COLUMNS` WHERE table_name = @table_name",
+        {'table_name': 'cms_data'},
+    )
+    assert 'Facility Name' in columns['column_name'].tolist()
+
+def test_local_has_table(local_backend):
+    assert local_backend.has_table('patient_appointment_gaps')
+    assert not local_backend.has_table('missing_table')
+
+def test_bigquery_iter_batches_uses_storage_client():
+    from unittest.mock import MagicMock
+    from scripts.query_backend import BigQueryBackend
+    client = MagicMock()
+    storage_client = MagicMock()
+    client.query.return_value.result.return_value.to_arrow_iterable.return_value = iter(['batch'])
+    backend = BigQueryBackend(client=client, storage_client=storage_client)
+    assert list(backend.iter_batches("SELECT 1", batch_size=500)) == ['batch']
+    client.query.return_value.result.assert_called_once_with(page_size=500)
+    to_arrow_iterable = client.query.return_value.result.return_value.to_arrow_iterable
+    to_arrow_iterable.assert_called_once_with(bqstorage_client=storage_client)
+
+def test_local_iter_batches_matches_run(local_backend):
+    query = "SELECT NAME, COUNT(*) AS n FROM `healthcare_analytics.appointments_data` GROUP BY NAME ORDER BY n DESC"
+    batches = list(local_backend.iter_batches(query, batch_size=100))
+    assert all(batch.num_rows <= 100 for batch in batches)
+    combined = pd.concat([batch.to_pandas() for batch in batches], ignore_index=True)
+    pd.testing.assert_frame_equal(combined, local_backend.run(query))
+
+def test_list_parameters(local_backend):
+    from scripts.query_backend import query_parameters
+    names = ['Jackelyn13 Pacocha935', 'Santina680 Dicki44', 'No Such Doctor']
+    result = local_backend.run("""
+        SELECT DISTINCT NAME FROM `healthcare_analytics.appointments_data`
+        WHERE NAME IN (SELECT value FROM json_each(@names))
+        ORDER BY NAME
+    """, {'names': names})
+    assert result['NAME'].tolist() == sorted(names[:2])
+    (parameter,) = query_parameters({'names': names})
+    assert parameter.array_type == 'STRING' and parameter.values == names
@@ -0,0 +1,95 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_query_cache_import():
+    """Test if query_cache.py can be imported without errors"""
+    from scripts.query_cache import QueryCache
+    assert True
+
+def test_key_normalizes_whitespace_and_param_order():
+    from scripts.query_cache import QueryCache
+    key = QueryCache.make_key("SELECT  *\n  FROM t WHERE a = @a", {'a': 1, 'b': 'x'})
+    assert key == QueryCache.make_key("SELECT * FROM t WHERE a = @a", {'b': 'x', 'a': 1})
+    assert key != QueryCache.make_key("SELECT * FROM t WHERE a = @a", {'a': 2, 'b': 'x'})
+
+def test_key_keeps_whitespace_inside_literals_and_comments():
+    from scripts.query_cache import QueryCache
+    key = QueryCache.make_key("SELECT * FROM t WHERE name = 'Mercy  Hospital'")
+    assert key == QueryCache.make_key("SELECT *\n  FROM t WHERE name = 'Mercy  Hospital'")
+    assert key != QueryCache.make_key("SELECT * FROM t WHERE name = 'Mercy Hospital'")
+    assert QueryCache.make_key('SELECT `a  b` FROM t') != QueryCache.make_key('SELECT `a b` FROM t')
+    assert QueryCache.make_key("SELECT 'it\\'s  x'") != QueryCache.make_key("SELECT 'it\\'s x'")
+    # A line comment ends at the newline; joining the lines would comment out the FROM.
+    assert QueryCache.make_key("SELECT 1 -- note\nFROM t") != QueryCache.make_key("SELECT 1 -- note FROM t")
+
+def test_hit_miss_counters_and_ttl(tmp_path):
+    from scripts.query_cache import QueryCache
+    clock = FakeClock()
+    cache = QueryCache(ttl=10, marker_path=tmp_path / '.last_upload', clock=clock)
+    key = cache.make_key("SELECT 1")
+    assert cache.get(key) is None
+    cache.put(key, pd.DataFrame({'a': [1]}))
+    assert cache.get(key)['a'].tolist() == [1]
+    clock.now = 11
+    assert cache.get(key) is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+def test_lru_eviction_respects_byte_budget(tmp_path):
+    from scripts.query_cache import QueryCache, frame_nbytes
+    frame = pd.DataFrame({'a': range(100)})
+    cache = QueryCache(max_bytes=frame_nbytes(frame) * 2, marker_path=tmp_path / '.last_upload')
+    cache.put('first', frame)
+    cache.put('second', frame)
+    cache.get('first')
+    cache.put('third', frame)
+    assert cache.get('second') is None
+    assert cache.get('first') is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+def test_upload_marker_invalidates(tmp_path):
+    import os
+    from scripts.query_cache import QueryCache, mark_upload_finished
+    marker = tmp_path / '.last_upload'
+    cache = QueryCache(marker_path=marker)
+    cache.put('key', pd.DataFrame({'a': [1]}))
+    mark_upload_finished(marker)
+    os.utime(marker, (1, 1))
+    assert cache.get('key') is None
+
+def test_cached_frame_is_not_mutated_by_callers(tmp_path):
+    from scripts.query_cache import QueryCache
+    cache = QueryCache(marker_path=tmp_path / '.last_upload')
+    cache.put('key', pd.DataFrame({'a': [1, 2]}))
+    df = cache.get('key')
+    df.index = df.index + 1
+    assert cache.get('key').index.tolist() == [0, 1]
+
+def test_uploader_and_dashboard_share_marker_from_environment(tmp_path):
+    import os
+    from unittest.mock import MagicMock, patch
+    from scripts import bigquery_upload, streamlit_app
+    marker = tmp_path / 'shared' / '.last_upload'
+    with patch.dict(os.environ, {'QUERY_CACHE_UPLOAD_MARKER': str(marker)}):
+        streamlit_app.get_query_cache.clear()
+        cache = streamlit_app.get_query_cache()
+        key = cache.make_key("SELECT 1")
+        cache.put(key, pd.DataFrame({'x': [1]}))
+        with patch.object(bigquery_upload.bigquery, 'Client', MagicMock()), \
+                patch.object(bigquery_upload, 'get_dataset'), patch.object(bigquery_upload, 'upload_tables'):
+            bigquery_upload.main([])
+        assert marker.exists()
+        assert cache.get(key) is None
+    streamlit_app.get_query_cache.clear()
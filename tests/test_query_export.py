@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+def batches(*sizes):
+    start = 0
+    for size in sizes:
+        yield pa.RecordBatch.from_pandas(pd.DataFrame({'n': range(start, start + size)}), preserve_index=False)
+        start += size
+
+def test_query_export_import():
+    """Test if query_export.py can be imported without errors"""
+    from scripts.query_export import export_query
+    assert True
+
+@pytest.mark.parametrize('sizes, limit, rows, truncated', [
+    ((4, 4, 4), 6, 6, True),
+    ((4, 4), 8, 8, False),
+    ((4, 4), 4, 4, True),
+    ((3,), 10, 3, False),
+    ((0,), 10, 0, False),
+])
+def test_preview_is_bounded(sizes, limit, rows, truncated):
+    from scripts.query_export import preview_batches
+    df, more = preview_batches(batches(*sizes), limit)
+    assert df['n'].tolist() == list(range(rows))
+    assert more is truncated
+
+def test_preview_stops_reading_early():
+    from scripts.query_export import preview_batches
+    read = []
+
+    def tracked():
+        for batch in batches(5, 5, 5, 5):
+            read.append(batch.num_rows)
+            yield batch
+
+    preview_batches(tracked(), 7)
+    assert len(read) == 2
+
+@pytest.mark.parametrize('export_format', ['CSV', 'Parquet'])
+def test_export_streams_full_result(tmp_path, export_format):
+    from scripts.query_backend import SQLiteBackend
+    from scripts.query_export import export_query
+    processed_dir = Path(__file__).parent.parent / 'data' / 'processed'
+    backend = SQLiteBackend(processed_dir)
+    query = "SELECT `Facility Name`, `Number of Readmissions` FROM `healthcare_analytics.cms_data`"
+    path, rows = export_query(backend, query, export_format, export_dir=tmp_path, batch_size=1000)
+    exported = pd.read_csv(path) if export_format == 'CSV' else pd.read_parquet(path)
+    expected = backend.run(query)
+    assert rows == len(expected)
+    assert exported['Number of Readmissions'].tolist() == expected['Number of Readmissions'].tolist()
+
+def test_failed_export_removes_its_file(tmp_path):
+    from scripts.query_export import export_query
+
+    class FailingBackend:
+        def iter_batches(self, query, params=None, batch_size=10_000, stats=None):
+            yield from batches(3)
+            raise RuntimeError("job failed")
+
+    with pytest.raises(RuntimeError):
+        export_query(FailingBackend(), "SELECT 1", export_dir=tmp_path)
+    assert list(tmp_path.iterdir()) == []
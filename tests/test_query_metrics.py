@@ -0,0 +1,85 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+def test_query_metrics_import():
+    """Test if query_metrics.py can be imported without errors"""
+    from scripts.query_metrics import QueryMetrics
+    assert True
+
+def test_records_round_trip_and_tail(tmp_path):
+    from scripts.query_metrics import QueryMetrics
+    metrics = QueryMetrics(tmp_path / 'metrics' / 'query_metrics.jsonl')
+    for i in range(5):
+        metrics.record(view='a', wall_ms=i, cache_hit=False)
+    records = metrics.read(limit=2)
+    assert records['wall_ms'].tolist() == [3, 4]
+    assert len(metrics.read()) == 5
+
+def test_summarize_orders_views_by_cost():
+    from scripts.query_metrics import summarize
+    records = pd.DataFrame([
+        {'view': 'cheap', 'wall_ms': 10, 'cache_hit': True},
+        {'view': 'cheap', 'wall_ms': 30, 'cache_hit': False, 'bytes_billed': 10, 'slot_ms': 5},
+        {'view': 'costly', 'wall_ms': 900, 'cache_hit': False, 'bytes_billed': 10_000_000, 'slot_ms': 700},
+    ])
+    summary = summarize(records)
+    assert summary.index.tolist() == ['costly', 'cheap']
+    assert summary.loc['cheap', 'queries'] == 2
+    assert summary.loc['cheap', 'cache_hit_rate'] == 0.5
+    assert summary.loc['costly', 'bytes_billed'] == 10_000_000
+
+def test_run_query_records_cache_hits_and_job_stats(tmp_path):
+    from scripts import streamlit_app
+    from scripts.query_cache import QueryCache
+    from scripts.query_metrics import QueryMetrics
+    backend = MagicMock()
+    backend.execute.return_value = (pd.DataFrame({'x': [1]}), {'bytes_billed': 10485760, 'slot_ms': 42})
+    metrics = QueryMetrics(tmp_path / 'metrics.jsonl')
+    cache = QueryCache(marker_path=tmp_path / '.last_upload')
+    with patch.object(streamlit_app, 'get_backend', return_value=backend), \
+            patch.object(streamlit_app, 'get_query_cache', return_value=cache), \
+            patch.object(streamlit_app, 'get_query_metrics', return_value=metrics):
+        streamlit_app.run_query("SELECT 1", view="Doctor Appointment Volume")
+        streamlit_app.run_query("SELECT 1", view="Doctor Appointment Volume")
+    records = metrics.read()
+    assert records['cache_hit'].tolist() == [False, True]
+    assert records['bytes_billed'].iloc[0] == 10485760
+    assert records['slot_ms'].iloc[0] == 42
+    assert (records['view'] == "Doctor Appointment Volume").all()
+    assert backend.execute.call_count == 1
+
+def test_admin_query_records_estimate_and_job_stats(tmp_path):
+    from scripts import streamlit_app
+    from scripts.query_backend import BigQueryBackend
+    from scripts.query_metrics import QueryMetrics
+    client = MagicMock()
+    job = client.query.return_value
+    job.total_bytes_processed, job.total_bytes_billed, job.slot_millis = 2048, 10485760, 42
+    job.result.return_value.to_arrow_iterable.return_value = iter([])
+    metrics = QueryMetrics(tmp_path / 'metrics.jsonl')
+    with patch.object(streamlit_app, 'get_backend', return_value=BigQueryBackend(client=client)), \
+            patch.object(streamlit_app, 'get_query_metrics', return_value=metrics), \
+            patch.object(streamlit_app, 'st'):
+        streamlit_app.run_admin_query("SELECT 1", estimate=4096)
+    record = metrics.read().iloc[0]
+    assert record['estimated_bytes'] == 4096
+    assert record['bytes_processed'] == 2048
+    assert record['bytes_billed'] == 10485760
+    assert record['slot_ms'] == 42
+
+def test_bigquery_backend_caps_bytes_and_dry_runs():
+    from scripts.query_backend import BigQueryBackend, create_backend
+    client = MagicMock()
+    client.query.return_value.total_bytes_processed = 123
+    backend = BigQueryBackend(client=client, maximum_bytes_billed=1000)
+    assert backend.dry_run("SELECT 1") == 123
+    job_config = client.query.call_args.kwargs['job_config']
+    assert job_config.dry_run is True
+    assert job_config.maximum_bytes_billed == 1000
+    with patch.dict('os.environ', {'BIGQUERY_MAXIMUM_BYTES_BILLED': '5000'}):
+        assert create_backend('bigquery').maximum_bytes_billed == 5000
@@ -44,4 +44,137 @@ def test_plot_generation():
     import matplotlib
     fig, ax = plt.subplots()
     ax.plot([1, 2], [3, 4])
-    assert isinstance(fig, matplotlib.figure.Figure)
\ No newline at end of file
+    assert isinstance(fig, matplotlib.figure.Figure)
+
+def test_search_and_paging_are_query_parameters():
+    """Search text and page window are sent as parameters, not interpolated"""
+    import pandas as pd
+    from scripts import streamlit_app
+    calls = []
+
+    def fake_run_query(query, params=None, use_cache=True, view="other"):
+        calls.append((query, params))
+        return pd.DataFrame({'Doctor Name': ['Ted955 Reilly981'], 'Appointments Count': [66], 'Rank': [11]})
+
+    with patch.object(streamlit_app, 'run_query', fake_run_query):
+        page = streamlit_app.fetch_page("SELECT 1", "Doctor Name", "Appointments Count", "ted'; DROP", 2)
+    query, params = calls[0]
+    assert "ted'; DROP" not in query
+    assert params == {"search": "ted'; DROP", "limit": 10, "offset": 10}
+    assert "LIMIT @limit OFFSET @offset" in query
+    assert page.index.tolist() == [11]
+
+def test_count_results_reads_total():
+    import pandas as pd
+    from scripts import streamlit_app
+    with patch.object(streamlit_app, 'run_query', return_value=pd.DataFrame({'total': [42]})) as run:
+        assert streamlit_app.count_results("SELECT 1", "Facility Name", "mercy") == 42
+    assert run.call_args.args[1] == {"search": "mercy"}
+
+def test_import_does_not_load_heavy_modules():
+    """Plotting and the BigQuery client library load on first use, not at import"""
+    import subprocess
+    probe = (
+        "import sys; sys.path.insert(0, {root!r}); import scripts.streamlit_app; "
+        "print([m for m in ('matplotlib', 'google.cloud.bigquery') if m in sys.modules])"
+    ).format(root=str(Path(__file__).parent.parent))
+    output = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == '[]'
+
+def test_lottie_animation_loaded_once(tmp_path):
+    from scripts import streamlit_app
+    animation = tmp_path / "animation.json"
+    animation.write_text('{"v": 1}')
+    with patch.object(streamlit_app, 'load_lottie', wraps=streamlit_app.load_lottie) as load:
+        assert streamlit_app.get_lottie_animation(str(animation)) == {"v": 1}
+        assert streamlit_app.get_lottie_animation(str(animation)) == {"v": 1}
+    assert load.call_count == 1
+
+def test_index_search_pages_match_strpos():
+    """Pages filtered by the names an index search found match the STRPOS filter"""
+    import pandas as pd
+    from scripts import streamlit_app
+    from scripts.name_index import NameIndex
+    from scripts.query_backend import SQLiteBackend
+    backend = SQLiteBackend(Path(__file__).parent.parent / 'data' / 'processed')
+    base_query = streamlit_app.facility_readmissions_query()
+    names = backend.run(base_query)['Facility Name']
+    index = NameIndex.build(names)
+    assert streamlit_app.name_filter('Facility Name', 'bigquery') == '`Facility Name` IN UNNEST(@names)'
+    for search in ['me', 'medical center', 'mercy']:
+        matched = index.search(search)
+        count = backend.run(*streamlit_app.count_query(base_query, 'Facility Name', search))
+        indexed_count = backend.run(*streamlit_app.count_query(base_query, 'Facility Name', search, matched, 'sqlite'))
+        assert indexed_count['total'].tolist() == count['total'].tolist()
+        page = backend.run(*streamlit_app.page_query(base_query, 'Facility Name', 'Total Readmissions', search, 2))
+        indexed_page = backend.run(*streamlit_app.page_query(
+            base_query, 'Facility Name', 'Total Readmissions', search, 2, names=matched, dialect='sqlite'
+        ))
+        pd.testing.assert_frame_equal(indexed_page, page)
+
+def test_first_page_keeps_index_matches():
+    from scripts import streamlit_app
+    from scripts.name_index import NameIndex
+    index = NameIndex.build(['Mercy Hospital', 'Mercy Clinic', 'St Mary'])
+    with patch.object(streamlit_app, 'st') as mock_st, \
+            patch.object(streamlit_app, 'count_results', return_value=2), \
+            patch.object(streamlit_app, 'fetch_page') as fetch:
+        mock_st.text_input.return_value = 'mercy'
+        mock_st.number_input.return_value = 1
+        _, first_page = streamlit_app.paged_results("SELECT 1", "Facility Name", "n", "Search", search_index=index)
+        first_page()
+    assert fetch.call_args_list[0].kwargs['names'] == ['Mercy Hospital', 'Mercy Clinic']
+    assert fetch.call_args_list[1].kwargs['names'] == ['Mercy Hospital', 'Mercy Clinic']
+
+def test_admin_export_leaves_no_file(tmp_path):
+    """The export is served from memory and its temporary file removed"""
+    import os
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    from benchmarks.load_test import admin_login, admin_query, by_label
+    from scripts import query_backend
+    backend = query_backend.SQLiteBackend(Path(__file__).parent.parent / 'data' / 'processed')
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    app_path = Path(__file__).parent.parent / 'scripts' / 'streamlit_app.py'
+    with patch.object(query_backend, 'create_backend', lambda *args, **kwargs: backend), \
+            patch.dict(os.environ, {'ADMIN_EXPORT_DIR': str(export_dir)}):
+        st.cache_resource.clear()
+        at = AppTest.from_file(str(app_path), default_timeout=60)
+        at.run()
+        admin_login(at).run()
+        admin_query(at).run()
+        by_label(at.button, 'Export Full Result').click().run()
+        st.cache_resource.clear()
+    assert not at.exception
+    assert len(at.get('download_button')) == 1
+    assert list(export_dir.iterdir()) == []
+
+def test_large_admin_export_stays_on_disk(tmp_path):
+    """Exports over ADMIN_EXPORT_MAX_INLINE_MB are never read into memory"""
+    import os
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    from benchmarks.load_test import admin_login, admin_query, by_label
+    from scripts import query_backend
+    backend = query_backend.SQLiteBackend(Path(__file__).parent.parent / 'data' / 'processed')
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    app_path = Path(__file__).parent.parent / 'scripts' / 'streamlit_app.py'
+    read_bytes = Path.read_bytes
+    with patch.object(query_backend, 'create_backend', lambda *args, **kwargs: backend), \
+            patch.dict(os.environ, {'ADMIN_EXPORT_DIR': str(export_dir), 'ADMIN_EXPORT_MAX_INLINE_MB': '0'}), \
+            patch.object(Path, 'read_bytes', autospec=True, side_effect=read_bytes) as reads:
+        st.cache_resource.clear()
+        at = AppTest.from_file(str(app_path), default_timeout=60)
+        at.run()
+        admin_login(at).run()
+        admin_query(at).run()
+        by_label(at.button, 'Export Full Result').click().run()
+        st.cache_resource.clear()
+    assert not at.exception
+    assert len(at.get('download_button')) == 0
+    exported = list(export_dir.iterdir())
+    assert len(exported) == 1 and exported[0].stat().st_size > 0
+    assert not any(Path(call.args[0]).parent == export_dir for call in reads.call_args_list)
+    assert any(str(exported[0]) in info.value for info in at.info)